@@ -0,0 +1,174 @@
+import asyncio
+import heapq
+import itertools
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from outbox import OutItem
+
+POLICIES = ("block", "drop_oldest", "drop_lowest")
+
+
+# ===================== ADMISSION CONTROL =====================
+class AdmissionController:
+    """
+    Navbatga kiradigan xabarlar uchun in-flight byudjet.
+    Byudjet to'lganda siyosat:
+      block        -> handler bo'sh joy kutadi (block_timeout), bo'lmasa yangi xabar tashlanadi
+      drop_oldest  -> navbatdagi eng eski xabar tashlanadi
+      drop_lowest  -> navbatdagi eng past prioritetli xabar tashlanadi (yangisidan past bo'lsa)
+    Tashlangan xabar remove(item) bilan navbatdan haqiqatan o'chiriladi (send_queue.discard),
+    shuning uchun navbat hajmi ham byudjet bilan chegaralanadi. Kalit - item.uid: cache_key
+    dedupe o'chiq bo'lsa takrorlanishi mumkin.
+    """
+
+    def __init__(
+        self,
+        budget: int = 10000,
+        policy: str = "drop_oldest",
+        block_timeout: float = 5.0,
+        remove: Optional[Callable[[OutItem], bool]] = None,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"admission policy {policy!r}: {', '.join(POLICIES)} dan biri bo'lishi kerak")
+        self.budget = max(1, budget)
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.remove = remove
+
+        self.inflight = 0
+        self._queued: "OrderedDict[int, OutItem]" = OrderedDict()
+        self._heap: List[Tuple[int, int, int]] = []
+        self._seq = itertools.count()
+        self._sending = set()
+        self._freed = asyncio.Event()
+
+        self.admitted = 0
+        self.shed = 0
+        self.evicted = 0
+        self.delayed = 0
+        self.shed_by_group: Counter = Counter()
+        self.shed_by_account: Counter = Counter()
+        self.delayed_by_group: Counter = Counter()
+        self.delayed_by_account: Counter = Counter()
+
+    # ----- handler side -----
+    async def admit(self, item: OutItem) -> bool:
+        if self.inflight < self.budget:
+            self._track(item)
+            return True
+
+        if self.policy == "block":
+            self.delayed += 1
+            self.delayed_by_group[item.group_name] += 1
+            self.delayed_by_account[item.phone] += 1
+            if await self._wait_for_slot():
+                self._track(item)
+                return True
+            self._count_shed(item)
+            return False
+
+        victim = self._pick_victim(item)
+        if victim is None:
+            self._count_shed(item)
+            return False
+
+        self._evict(victim)
+        self._track(item)
+        return True
+
+    async def _wait_for_slot(self) -> bool:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.block_timeout
+        while self.inflight >= self.budget:
+            left = deadline - loop.time()
+            if left <= 0:
+                return False
+            self._freed.clear()
+            try:
+                await asyncio.wait_for(self._freed.wait(), left)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    def _track(self, item: OutItem):
+        key = item.uid
+        self._queued[key] = item
+        if self.policy == "drop_lowest":
+            heapq.heappush(self._heap, (item.priority, next(self._seq), key))
+        self.inflight += 1
+        self.admitted += 1
+
+    def _pick_victim(self, incoming: OutItem) -> Optional[int]:
+        if self.policy == "drop_oldest":
+            return next(iter(self._queued), None)
+
+        heap = self._heap
+        while heap and heap[0][2] not in self._queued:
+            heapq.heappop(heap)
+        if not heap or heap[0][0] >= incoming.priority:
+            # navbatdagilar yangisidan muhimroq (yoki teng) -> yangisi tashlanadi
+            return None
+        return heapq.heappop(heap)[2]
+
+    def _evict(self, key: int):
+        item = self._queued.pop(key, None)
+        if item is None:
+            return
+        self.inflight -= 1
+        self.evicted += 1
+        self._count_shed(item)
+        self._compact()
+        if self.remove:
+            self.remove(item)
+
+    def _compact(self):
+        # Heap'dagi eskirgan (olingan/tashlangan) yozuvlar lazy o'chadi; ular tiriklaridan
+        # ikki barobar ko'p bo'lsa heap qayta quriladi -> hajm navbat bilan chegaralangan
+        heap = self._heap
+        if len(heap) > 2 * len(self._queued) + 64:
+            queued = self._queued
+            self._heap = [e for e in heap if e[2] in queued]
+            heapq.heapify(self._heap)
+
+    def _count_shed(self, item: OutItem):
+        self.shed += 1
+        self.shed_by_group[item.group_name] += 1
+        self.shed_by_account[item.phone] += 1
+
+    def reject(self, item: OutItem):
+        """Qabul qilingan, lekin navbatga sig'magan xabar."""
+        if self._queued.pop(item.uid, None) is not None:
+            self.inflight -= 1
+            self._count_shed(item)
+            self._compact()
+
+    # ----- worker side -----
+    def take(self, item: OutItem):
+        """Worker navbatdan olganda chaqiradi."""
+        # Yuborilayotgan xabar endi tashlanmaydi, lekin byudjetni release() gacha band qiladi
+        if self._queued.pop(item.uid, None) is not None:
+            self._sending.add(item.uid)
+            self._compact()
+
+    def release(self, item: OutItem):
+        # /redrive yoki restartdan qaytgan xabarlar byudjetdan o'tmagan -> hisobga olinmaydi
+        if item.uid in self._sending:
+            self._sending.discard(item.uid)
+            self.inflight -= 1
+            self._freed.set()
+
+    def stats(self, top: int = 5) -> Dict[str, object]:
+        return {
+            "policy": self.policy,
+            "budget": self.budget,
+            "inflight": self.inflight,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "evicted": self.evicted,
+            "delayed": self.delayed,
+            "shed_by_group": self.shed_by_group.most_common(top),
+            "shed_by_account": self.shed_by_account.most_common(top),
+            "delayed_by_group": self.delayed_by_group.most_common(top),
+            "delayed_by_account": self.delayed_by_account.most_common(top),
+        }
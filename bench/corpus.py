@@ -0,0 +1,144 @@
+"""
+Benchmarklar uchun sintetik, lekin real guruhlarga o'xshash xabarlar korpusi:
+o'zbek (lotin/kirill) va rus aralash matnlar, uzun captionlar, ko'p URL / TEXT_LINK entity.
+"""
+import random
+from datetime import datetime
+from typing import List, Optional
+
+from pyrogram.enums import ChatType, MessageEntityType
+from pyrogram.types import Chat, Message, MessageEntity, User
+
+CITIES = [
+    "Toshkent", "Samarqand", "Buxoro", "Andijon", "Namangan", "Farg'ona", "Qo'qon", "Navoiy",
+    "Тошкент", "Самарқанд", "Бухоро", "Андижон", "Наманган", "Фарғона",
+    "Ташкент", "Самарканд", "Бухара", "Андижан", "Наманган", "Фергана",
+]
+
+ORDER_TEMPLATES = [
+    "{a}dan {b}ga {n} kishi bor, ertaga ertalab yo'lga chiqamiz. Tel: +99890{tel}",
+    "{a}дан {b}га {n} киши бор, почта ҳам олиб кетамиз. Тел: +99890{tel}",
+    "Из {a} в {b} {n} человека, выезд сегодня вечером, цена договорная +99890{tel}",
+    "Pochta bor {a} -> {b}, kichik sumka. Shoshilinch! 👉 {url}",
+    "Ищу машину {a} — {b}, {n} пассажира, багаж небольшой. Писать в лс",
+    "{a}dan {b}ga yo'lovchi kerak, Cobalt bor, konditsioner 🚗 {url}",
+]
+
+CHATTER = [
+    "Assalomu alaykum hammaga", "Kim bor?", "Ассалому алайкум", "Всем привет", "Rahmat 👍",
+    "Bugun havo yaxshi", "Йўл очиқми?", "Кто сегодня едет?", "Reklama uchun adminga yozing",
+    "Guruh qoidalari: faqat e'lon", "👍👍👍", "Ок", "Xo'p aka", "Нет мест",
+]
+
+FILLER = (
+    "narxi kelishiladi manzilgacha olib boramiz konditsioner bor yuklar uchun joy bor "
+    "цена договорная довезу до адреса кондиционер есть багаж помещается "
+    "нарх келишилади манзилгача олиб борамиз кондиционер бор юк учун жой бор"
+).split()
+
+# Benchmarklarda ishlatiladigan kalit so'zlar (build_snapshot ularni normalize_text bilan kanonik qiladi)
+KEYWORDS = [
+    "toshkentdan", "samarqandga", "buxoroga", "andijonga", "namanganga", "farg'onaga",
+    "тошкентдан", "самарқандга", "из ташкента", "в самарканд", "pochta", "почта", "yo'lovchi",
+    "пассажир", "cobalt", "kishi bor", "киши бор",
+]
+
+
+def random_url(rng: random.Random) -> str:
+    return rng.choice([
+        f"https://t.me/joinchat/{rng.randrange(16**10):x}",
+        f"https://t.me/taksi_{rng.randrange(10**4)}/{rng.randrange(10**5)}",
+        f"t.me/+{rng.randrange(16**12):x}",
+        f"https://instagram.com/p/{rng.randrange(16**8):x}",
+        f"http://example.uz/buyurtma?id={rng.randrange(10**6)}&src=tg",
+    ])
+
+
+LINK_LABELS = ("Batafsil", "Подробнее", "Kanal", "👉 Bu yerda")
+
+
+def make_text(rng: random.Random, hit: bool, size: int = 0, url_density: Optional[float] = None):
+    """
+    (text, entities). hit=True -> kamida bitta shablon kalit so'zga mos keladi.
+    url_density berilsa to'ldiruvchi so'z boshiga shu ehtimol bilan URL (yarmi matnda URL
+    entity, yarmi TEXT_LINK) qo'yiladi; None -> odatiy aralash (oxirida 0-5 ta TEXT_LINK).
+    """
+    if hit:
+        a, b = rng.sample(CITIES, 2)
+        text = rng.choice(ORDER_TEMPLATES).format(
+            a=a, b=b, n=rng.randint(1, 4), tel=rng.randrange(10**7), url=random_url(rng))
+    else:
+        text = rng.choice(CHATTER)
+
+    entities: List[MessageEntity] = []
+    while len(text) < size:
+        for _ in range(rng.randint(4, 12)):
+            if url_density is not None and rng.random() < url_density:
+                url = random_url(rng)
+                if rng.random() < 0.5:
+                    text += " " + url
+                    continue
+                label = rng.choice(LINK_LABELS)
+                entities.append(MessageEntity(
+                    type=MessageEntityType.TEXT_LINK, offset=len(text) + 1, length=len(label), url=url))
+                text += " " + label
+            else:
+                text += " " + rng.choice(FILLER)
+        if rng.random() < 0.3:
+            text += "\n\n"
+
+    # Matn ichidagi URL'lar uchun URL entity, qo'shimcha TEXT_LINK'lar oxiriga
+    pos = 0
+    for word in text.split(" "):
+        if "://" in word or word.startswith("t.me/"):
+            entities.append(MessageEntity(type=MessageEntityType.URL, offset=pos, length=len(word)))
+        pos += len(word) + 1
+
+    for _ in range(rng.choice((0, 0, 0, 1, 2, 5)) if url_density is None else 0):
+        label = rng.choice(LINK_LABELS)
+        entities.append(MessageEntity(
+            type=MessageEntityType.TEXT_LINK, offset=len(text) + 1, length=len(label), url=random_url(rng)))
+        text += " " + label
+
+    entities.sort(key=lambda e: e.offset)
+    return text, entities
+
+
+def make_message(
+    rng: random.Random,
+    msg_id: int,
+    groups: int = 300,
+    hit_ratio: float = 0.05,
+    caption_ratio: float = 0.15,
+    long_ratio: float = 0.1,
+    size: Optional[int] = None,
+    url_density: Optional[float] = None,
+) -> Message:
+    gid = -1001000000000 - rng.randrange(groups)
+    chat = Chat(
+        id=gid,
+        type=ChatType.SUPERGROUP,
+        title=f"{rng.choice(CITIES)} taksi {gid % 1000}",
+        username=f"taksi_{-gid % 100000}" if rng.random() < 0.4 else None,
+    )
+    uid = rng.randrange(10**9)
+    user = User(
+        id=uid,
+        first_name="Foydalanuvchi",
+        username=f"user{uid % 10**6}" if rng.random() < 0.7 else None,
+    )
+
+    if size is None:
+        size = rng.randint(800, 3000) if rng.random() < long_ratio else 0
+    text, entities = make_text(rng, rng.random() < hit_ratio, size, url_density)
+
+    if rng.random() < caption_ratio:
+        return Message(id=msg_id, chat=chat, from_user=user, date=datetime.now(),
+                       caption=text, caption_entities=entities or None)
+    return Message(id=msg_id, chat=chat, from_user=user, date=datetime.now(),
+                   text=text, entities=entities or None)
+
+
+def make_corpus(n: int, seed: int = 1, **kw) -> List[Message]:
+    rng = random.Random(seed)
+    return [make_message(rng, i + 1, **kw) for i in range(n)]
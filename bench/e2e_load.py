@@ -0,0 +1,190 @@
+"""
+End-to-end yuklama benchmarki: sintetik pyrogram Message -> create_message_handler ->
+send_queue -> send_worker -> lokal Bot API stendi (sendMessage + 429/retry_after).
+Baza o'rniga MemoryRepository.
+
+    python bench/e2e_load.py --messages 20000 --groups 300 --hit-ratio 0.05 --out results.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web  # noqa: E402
+
+import main  # noqa: E402
+from bot_transport import BotTransport  # noqa: E402
+from corpus import KEYWORDS, make_message  # noqa: E402
+from hit_sink import HitSink  # noqa: E402
+from matcher import build_snapshot  # noqa: E402
+from outbox import create_send_queue  # noqa: E402
+from repository import MemoryRepository  # noqa: E402
+from rollup import HitRollup  # noqa: E402
+from scheduler import SendScheduler  # noqa: E402
+
+# ===================== FAKE BOT API =====================
+class FakeBotApi:
+    """sendMessage stendi: chat bo'yicha rate oshsa 429 + retry_after qaytaradi."""
+
+    def __init__(self, rate_per_s: float, latency: float):
+        self.rate = rate_per_s
+        self.latency = latency
+        self.received = {}        # tugma URL (message_link) -> qabul vaqti
+        self.requests = 0
+        self.r429 = 0
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    async def send_message(self, request):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        now = time.monotonic()
+        if now - self._window_start >= 1.0:
+            self._window_start, self._window_count = now, 0
+        self._window_count += 1
+        if self.rate and self._window_count > self.rate:
+            self.r429 += 1
+            return web.json_response(
+                {"ok": False, "error_code": 429, "parameters": {"retry_after": 1}}, status=429)
+
+        payload = await request.json()
+        t = time.time()
+        for row in payload.get("reply_markup", {}).get("inline_keyboard", []):
+            for btn in row:
+                if btn.get("url"):
+                    self.received.setdefault(btn["url"], t)
+        return web.json_response({"ok": True, "result": {}})
+
+    async def start(self, port: int) -> web.AppRunner:
+        app = web.Application()
+        app.router.add_post("/bot{token}/sendMessage", self.send_message)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        return runner
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+# ===================== RUN =====================
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    api = FakeBotApi(args.server_rate, args.server_latency)
+    runner = await api.start(args.port)
+
+    main.BOT_API_BASE = f"http://127.0.0.1:{args.port}"
+    main.repo = MemoryRepository({"keywords": [{"keyword": k} for k in KEYWORDS]})
+    main.hit_sink = HitSink(main.repo, flush_interval=0.5)
+    main.hit_sink.start()
+    main.hit_rollup = HitRollup(main.repo, flush_interval=0.5)
+    main.hit_rollup.start()
+    main.keywords_snapshot = build_snapshot(await main.repo.fetch_keywords(), 1)
+    main.send_queue = create_send_queue("memory", args.queue_max)
+    main.send_scheduler = SendScheduler(
+        ["123:bench"], global_rate=args.bot_rate, global_burst=args.bot_rate,
+        chat_rate=args.bot_rate, chat_burst=args.bot_rate,
+    )
+    main.bot_transport = BotTransport(main.BOT_API_BASE, send_limit=args.workers)
+    main.bot_transport.start()
+    workers = [asyncio.create_task(main.send_worker(i)) for i in range(args.workers)]
+
+    handler = main.create_message_handler("+998900000000")
+    print(f"⏳ {args.messages} ta sintetik xabar tayyorlanmoqda...")
+    msgs = [
+        make_message(rng, i + 1, groups=args.groups, hit_ratio=args.hit_ratio, long_ratio=args.long_ratio,
+                     size=args.text_size or None, url_density=args.url_density)
+        for i in range(args.messages)
+    ]
+
+    entered = {}
+    t0 = time.perf_counter()
+    for m in msgs:
+        entered[main.get_message_link(m)] = time.time()
+        await handler(None, m)
+    t_handled = time.perf_counter() - t0
+
+    deadline = time.time() + args.drain_timeout
+    while (main.send_queue.qsize() or main.admission.inflight) and time.time() < deadline:
+        await asyncio.sleep(0.05)
+    t_total = time.perf_counter() - t0
+
+    latencies = [api.received[k] - entered[k] for k in api.received if k in entered]
+    for w in workers:
+        w.cancel()
+    await main.hit_sink.close()
+    await main.hit_rollup.close()
+    await main.bot_transport.close()
+    await runner.cleanup()
+
+    return {
+        "commit": git_rev(),
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "params": vars(args),
+        "handler_msgs_per_s": round(args.messages / t_handled, 1),
+        "delivered": len(latencies),
+        "delivery_per_s": round(len(latencies) / t_total, 1) if t_total else None,
+        "e2e_p50_s": percentile(latencies, 0.50),
+        "e2e_p99_s": percentile(latencies, 0.99),
+        "api_requests": api.requests,
+        "api_429": api.r429,
+        "shed": main.admission.shed,
+        "dead_letters": len(main.send_scheduler.dead_letters),
+        "hit_rows_written": main.hit_sink.written,
+        "rollup_rows_written": main.hit_rollup.rows_written,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main_cli():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=20000)
+    ap.add_argument("--groups", type=int, default=300)
+    ap.add_argument("--hit-ratio", type=float, default=0.05)
+    ap.add_argument("--long-ratio", type=float, default=0.1, help="uzun (800-3000 belgi) xabarlar ulushi")
+    ap.add_argument("--text-size", type=int, default=0,
+                    help="har xabar kamida shu uzunlikda (belgi); 0 -> --long-ratio bo'yicha aralash")
+    ap.add_argument("--url-density", type=float, default=None,
+                    help="so'z boshiga URL / TEXT_LINK entity ehtimoli; berilmasa korpusning odatiy aralashmasi")
+    ap.add_argument("--queue-max", type=int, default=main.SEND_QUEUE_MAX)
+    ap.add_argument("--workers", type=int, default=main.SEND_WORKERS)
+    ap.add_argument("--bot-rate", type=float, default=25.0, help="scheduler: msg/s")
+    ap.add_argument("--server-rate", type=float, default=30.0, help="stend: shundan oshsa 429")
+    ap.add_argument("--server-latency", type=float, default=0.03)
+    ap.add_argument("--drain-timeout", type=float, default=120.0)
+    ap.add_argument("--port", type=int, default=18081)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", default="", help="natijani JSONL faylga qo'shish")
+    args = ap.parse_args()
+
+    result = asyncio.run(run(args))
+    line = json.dumps(result, ensure_ascii=False)
+    print(line)
+    if args.out:
+        with open(args.out, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+if __name__ == "__main__":
+    main_cli()
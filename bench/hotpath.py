@@ -0,0 +1,165 @@
+"""
+Har bir xabarda ishlaydigan matn funksiyalari uchun mikrobenchmark:
+extract_text_and_urls, strip_links, uniq_keep_order, build_sender_anchor,
+render_forward_text, normalize_text, kalit so'z qidiruvi va match_message (mos kelmaydigan
+xabarlarda eski eager tartib bilan solishtirish). Har biri alohida o'lchanadi:
+ops/s (eng yaxshi takror) va bitta o'tishdagi tracemalloc peak.
+
+    python bench/hotpath.py --save-baseline            # bench/hotpath_baseline.json yoziladi
+    python bench/hotpath.py --threshold 0.2            # baseline'dan 20% sekin -> exit 1
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from corpus import KEYWORDS, make_corpus  # noqa: E402
+from matcher import build_snapshot  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hotpath_baseline.json")
+
+
+# ===================== CASES =====================
+def eager_match(message, snap):
+    """Oldingi handler tartibi (solishtirish uchun): avval extract + strip, keyin qidiruv."""
+    cleaned_text, urls = main.extract_text_and_urls(message)
+    if not cleaned_text:
+        return None
+    matched = snap.matcher.matched_keywords(main.normalize_text(cleaned_text))
+    if not matched:
+        return None
+    return cleaned_text, urls, matched
+
+
+def build_cases(n: int, seed: int) -> Dict[str, tuple]:
+    """name -> (fn, args ro'yxati). Kirishlar oldindan tayyorlanadi, o'lchovga kirmaydi."""
+    msgs = make_corpus(n, seed=seed, hit_ratio=0.3, caption_ratio=0.2, long_ratio=0.15)
+    extracted = [main.extract_text_and_urls(m) for m in msgs]
+    raws = [m.text or m.caption or "" for m in msgs]
+    url_lists = [main.URL_RE.findall(r) + urls for r, (_, urls) in zip(raws, extracted)]
+    normalized = [main.normalize_text(c) for c, _ in extracted]
+    anchors = [main.build_sender_anchor(m) for m in msgs]
+    links = [main.get_message_link(m) for m in msgs]
+
+    snap = build_snapshot([{"id": i, "keyword": k} for i, k in enumerate(KEYWORDS)], 1)
+    matcher = snap.matcher
+
+    # Mos kelmaydigan oqim (guruhlardagi xabarlarning asosiy qismi): eager vs match-first
+    misses = make_corpus(n, seed=seed + 1, hit_ratio=0.0, caption_ratio=0.2, long_ratio=0.15)
+    assert not any(main.match_message(m, snap) for m in misses)
+
+    return {
+        "extract_text_and_urls": (main.extract_text_and_urls, [(m,) for m in msgs]),
+        "strip_links": (main.strip_links, [(r,) for r in raws]),
+        "uniq_keep_order": (main.uniq_keep_order, [(u,) for u in url_lists]),
+        "build_sender_anchor": (main.build_sender_anchor, [(m,) for m in msgs]),
+        "render_forward_text": (
+            main.render_forward_text,
+            [(m.chat.title, a, c, l) for m, a, (c, _), l in zip(msgs, anchors, extracted, links)],
+        ),
+        "normalize_text": (main.normalize_text, [(c,) for c, _ in extracted]),
+        "keyword_match": (matcher.matched_keywords, [(t,) for t in normalized]),
+        "nonmatch_eager": (eager_match, [(m, snap) for m in misses]),
+        "nonmatch_match_first": (main.match_message, [(m, snap) for m in misses]),
+        "match_message": (main.match_message, [(m, snap) for m in msgs]),
+    }
+
+
+def time_case(fn: Callable, args: List[tuple], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for a in args:
+            fn(*a)
+        best = min(best, time.perf_counter() - t0)
+    return len(args) / best if best > 0 else float("inf")
+
+
+def alloc_case(fn: Callable, args: List[tuple]) -> float:
+    """Bitta o'tishdagi peak (KB). Natijalar saqlanmaydi - faqat vaqtinchalik ajratmalar."""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    for a in args:
+        fn(*a)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return (peak - base) / 1024
+
+
+# ===================== BASELINE =====================
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    failures = []
+    for name, r in results.items():
+        b = baseline.get(name)
+        if not b:
+            continue
+        if r["ops_per_s"] < b["ops_per_s"] * (1 - threshold):
+            failures.append(
+                f"{name}: {r['ops_per_s']:.0f} ops/s < baseline {b['ops_per_s']:.0f} (-{threshold:.0%})")
+        # Kichik ajratmalarda shovqin katta -> 4 KB gacha farq hisobga olinmaydi
+        if r["peak_kb"] > b["peak_kb"] * (1 + threshold) + 4:
+            failures.append(
+                f"{name}: peak {r['peak_kb']:.1f} KB > baseline {b['peak_kb']:.1f} KB (+{threshold:.0%})")
+    return failures
+
+
+def main_cli():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=5000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--only", default="", help="vergul bilan: faqat shu benchmarklar")
+    ap.add_argument("--baseline", default=BASELINE_PATH)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--threshold", type=float, default=0.2, help="ruxsat etilgan regressiya ulushi")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    cases = build_cases(args.messages, args.seed)
+    only = {x.strip() for x in args.only.split(",") if x.strip()}
+
+    results: Dict[str, dict] = {}
+    for name, (fn, fargs) in cases.items():
+        if only and name not in only:
+            continue
+        results[name] = {
+            "ops_per_s": round(time_case(fn, fargs, args.repeat), 1),
+            "peak_kb": round(alloc_case(fn, fargs), 1),
+        }
+        if not args.json:
+            r = results[name]
+            print(f"{name:<24} {r['ops_per_s']:>12,.0f} ops/s   peak {r['peak_kb']:>8.1f} KB")
+
+    if args.json:
+        print(json.dumps(results))
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"💾 Baseline saqlandi: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("ℹ️ Baseline yo'q - solishtirilmadi (--save-baseline bilan yarating)")
+        return
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    failures = compare(results, baseline, args.threshold)
+    if failures:
+        print("❌ Regressiya:")
+        for line in failures:
+            print(f"   {line}")
+        sys.exit(1)
+    print("✅ Baseline bilan solishtirildi: regressiya yo'q")
+
+
+if __name__ == "__main__":
+    main_cli()
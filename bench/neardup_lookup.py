@@ -0,0 +1,112 @@
+"""
+Near-duplicate indeksi: 100k yozuvli indeksda bitta check() narxi (yangi xabar va takror),
+MinHash imzosi narxi, indeks xotirasi, kichik o'zgartirilgan takrorlarni topish ulushi (recall)
+va turli buyurtmalarni noto'g'ri birlashtirish ulushi (false positive).
+
+    python bench/neardup_lookup.py --entries 100000
+    python bench/neardup_lookup.py --entries 100000 --no-sender   # yuboruvchisiz (eng og'ir holat)
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import FILLER, make_text  # noqa: E402
+from neardup import NearDupIndex, minhash  # noqa: E402
+from normalize import normalize_text  # noqa: E402
+
+
+def order_text(rng: random.Random) -> str:
+    text, _ = make_text(rng, hit=True, size=rng.choice((0, 0, 120, 300)))
+    return normalize_text(text)
+
+
+def perturb(rng: random.Random, text: str) -> str:
+    """Dispetcher qayta joylaganda odatda: bitta so'z qo'shiladi/tushib qoladi yoki emoji."""
+    tokens = text.split()
+    r = rng.random()
+    if r < 0.4:
+        tokens.insert(rng.randrange(len(tokens) + 1), rng.choice(FILLER))
+    elif r < 0.7 and len(tokens) > 6:
+        del tokens[rng.randrange(len(tokens))]
+    # qolgani - aynan bir xil matn
+    return " ".join(tokens)
+
+
+def timed(fn, args, now_start: float) -> float:
+    t0 = time.perf_counter()
+    now = now_start
+    for a in args:
+        now += 0.001
+        fn(*a, now=now)
+    return time.perf_counter() - t0
+
+
+def main_cli():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--entries", type=int, default=100000)
+    ap.add_argument("--lookups", type=int, default=20000)
+    ap.add_argument("--senders", type=int, default=5000)
+    ap.add_argument("--threshold", type=float, default=0.75)
+    ap.add_argument("--no-sender", action="store_true", help="by_sender=False")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    by_sender = not args.no_sender
+    # Oyna va hajm o'lchov davomida hech narsani chiqarib yubormasin
+    index = NearDupIndex(
+        window=10 ** 9, threshold=args.threshold, max_entries=args.entries + args.lookups, by_sender=by_sender)
+
+    # Kirishlar oldindan tayyorlanadi, o'lchovga kirmaydi
+    base = [(order_text(rng), rng.randrange(args.senders), rng.randrange(10 ** 6)) for _ in range(args.entries)]
+    fresh = [(order_text(rng), rng.randrange(args.senders), rng.randrange(10 ** 6)) for _ in range(args.lookups)]
+    picks = [base[rng.randrange(len(base))] for _ in range(args.lookups)]
+    reposts = [(perturb(rng, t), s, g + 1) for t, s, g in picks]
+
+    # tracemalloc har allokatsiyani sekinlashtiradi: qurish vaqti o'lchanmaydi
+    tracemalloc.start()
+    timed(index.check, base, 0.0)
+    index_kb = tracemalloc.get_traced_memory()[0] / 1024
+    tracemalloc.stop()
+
+    tokens = [t.split() for t, _, _ in fresh]
+    t0 = time.perf_counter()
+    for tk in tokens:
+        minhash(tk, index.num_perm)
+    t_sig = time.perf_counter() - t0
+
+    before = index.reposts
+    t_miss = timed(index.check, fresh, 10 ** 6)
+    false_pos = index.reposts - before
+    before = index.reposts
+    t_hit = timed(index.check, reposts, 2 * 10 ** 6)
+    found = index.reposts - before
+
+    results = {
+        "entries": len(index),
+        "by_sender": by_sender,
+        "threshold": args.threshold,
+        "minhash_us_per_op": round(t_sig / args.lookups * 1e6, 2),
+        "check_miss_us_per_op": round(t_miss / args.lookups * 1e6, 2),
+        "check_repost_us_per_op": round(t_hit / args.lookups * 1e6, 2),
+        "index_mb": round(index_kb / 1024, 1),
+        "repost_recall": round(found / args.lookups, 4),
+        "false_positive_rate": round(false_pos / args.lookups, 4),
+    }
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    for k, v in results.items():
+        print(f"{k:<28} {v}")
+
+
+if __name__ == "__main__":
+    main_cli()
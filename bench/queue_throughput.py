@@ -0,0 +1,74 @@
+"""
+send_queue backendlari uchun enqueue/dequeue throughput.
+
+    python bench/queue_throughput.py --items 20000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from outbox import make_item, MemorySendQueue, SqliteSendQueue  # noqa: E402
+
+
+def _item(i: int):
+    return make_item(
+        cache_key=(-1001234567890, i),
+        text=f"🔔 <b>Yangi buyurtma</b>\n📍 Guruh: <b>Toshkent taksi</b>\n\nToshkentdan Samarqandga {i}",
+        group_link="https://t.me/toshkent_taksi",
+        message_link=f"https://t.me/toshkent_taksi/{i}",
+        urls=[],
+        group_name="Toshkent taksi",
+        body=f"Toshkentdan Samarqandga {i}",
+    )
+
+
+async def run(queue, n: int) -> dict:
+    items = [_item(i) for i in range(n)]
+
+    t0 = time.perf_counter()
+    for it in items:
+        queue.put_nowait(it)
+    t1 = time.perf_counter()
+
+    for _ in range(n):
+        got = await queue.get()
+        queue.ack(got)
+        queue.task_done()
+    t2 = time.perf_counter()
+    queue.close()
+
+    return {
+        "backend": queue.name,
+        "items": n,
+        "enqueue_per_s": round(n / (t1 - t0)),
+        "dequeue_ack_per_s": round(n / (t2 - t1)),
+    }
+
+
+async def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=20000)
+    ap.add_argument("--json", action="store_true", help="natijani JSON qatorlar sifatida chiqarish")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        results = [
+            await run(MemorySendQueue(maxsize=args.items), args.items),
+            await run(SqliteSendQueue(os.path.join(d, "outbox.sqlite3"), maxsize=args.items), args.items),
+        ]
+
+    for r in results:
+        if args.json:
+            print(json.dumps(r))
+        else:
+            print(f"{r['backend']:>7}: enqueue {r['enqueue_per_s']:>9}/s | dequeue+ack {r['dequeue_ack_per_s']:>9}/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,387 @@
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Dict, NamedTuple, Optional
+
+import aiohttp
+
+POLL_METHODS = ("getUpdates",)
+
+
+class CircuitOpen(Exception):
+    """Bot API hozir yetib bo'lmaydi - so'rov tarmoqqa chiqmasdan rad etildi."""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"Bot API circuit ochiq, {retry_in:.1f}s dan keyin probe")
+        self.retry_in = retry_in
+
+
+class BotResponse(NamedTuple):
+    status: int
+    data: dict            # JSON javob (JSON bo'lmasa {"description": matn})
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 200
+
+    @property
+    def retry_after(self) -> Optional[int]:
+        try:
+            return int((self.data.get("parameters") or {}).get("retry_after"))
+        except (TypeError, ValueError):
+            return None
+
+    @property
+    def description(self) -> str:
+        return str(self.data.get("description") or "")[:200]
+
+
+# ===================== CIRCUIT BREAKER =====================
+class CircuitBreaker:
+    """
+    failure_threshold ta ketma-ket tarmoq xatosi (ulanish, timeout, 5xx) -> open: so'rovlar
+    reset_timeout davomida darhol CircuitOpen. Keyin half_open: bitta probe o'tadi, muvaffaqiyat
+    -> closed, xato -> yana open (reset_timeout ikki barobar, max_reset_timeout gacha).
+    429 va 4xx xato hisoblanmaydi - server javob beryapti.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 5.0,
+        max_reset_timeout: float = 120.0,
+        name: str = "",
+    ):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_reset = reset_timeout
+        self.max_reset = max(reset_timeout, max_reset_timeout)
+        self.reset_timeout = reset_timeout
+        self.state = "closed"           # closed | open | half_open
+        self.failures = 0
+        self.open_until = 0.0
+        self._probing = False
+
+        self.opens = 0
+        self.rejected = 0
+
+    def check(self):
+        """Holatni o'zgartirmasdan: hozir so'rov o'tmasligi aniq bo'lsa CircuitOpen."""
+        if self.state == "closed":
+            return
+        now = time.monotonic()
+        if self.state == "open" and now < self.open_until:
+            raise CircuitOpen(self.open_until - now)
+        if self._probing:
+            raise CircuitOpen(min(1.0, self.reset_timeout))
+
+    def before(self) -> bool:
+        """So'rovdan oldin. CircuitOpen yoki probe ekanini qaytaradi."""
+        if self.state == "closed":
+            return False
+        now = time.monotonic()
+        if self.state == "open":
+            if now < self.open_until:
+                self.rejected += 1
+                raise CircuitOpen(self.open_until - now)
+            self.state = "half_open"
+        if self._probing:
+            self.rejected += 1
+            raise CircuitOpen(min(1.0, self.reset_timeout))
+        self._probing = True
+        return True
+
+    def on_success(self):
+        self._probing = False
+        self.failures = 0
+        if self.state != "closed":
+            print(f"✅ Bot API{self._tag()} yana javob beryapti, circuit yopildi")
+        self.state = "closed"
+        self.reset_timeout = self.base_reset
+
+    def on_failure(self):
+        self._probing = False
+        self.failures += 1
+        if self.state == "half_open":
+            self.reset_timeout = min(self.max_reset, self.reset_timeout * 2)
+            self._open()
+        elif self.state == "closed" and self.failures >= self.failure_threshold:
+            self._open()
+
+    def release(self):
+        """Probe natijasiz tugadi (cancel) - keyingisi urinsin."""
+        self._probing = False
+
+    def _open(self):
+        self.state = "open"
+        self.open_until = time.monotonic() + self.reset_timeout
+        self.opens += 1
+        print(f"🔌 Bot API{self._tag()} yetib bo'lmaydi ({self.failures} ta xato) - {self.reset_timeout:g}s fail-fast")
+
+    def _tag(self) -> str:
+        return f" [{self.name}]" if self.name else ""
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opens": self.opens,
+            "rejected": self.rejected,
+        }
+
+
+# ===================== RETRY BUDGET =====================
+class RetryBudget:
+    """
+    Qayta urinishlar window ichidagi so'rovlarning ratio ulushidan (kamida min_retries)
+    oshmaydi: Telegram sekinlashganda workerlar retry bilan yukni ko'paytirmaydi.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 10, window: float = 10.0):
+        self.ratio = max(0.0, ratio)
+        self.min_retries = max(0, min_retries)
+        self.window = window
+        self._requests: deque = deque()
+        self._retries: deque = deque()
+
+        self.allowed = 0
+        self.denied = 0
+
+    def _trim(self, q: deque, now: float):
+        cutoff = now - self.window
+        while q and q[0] < cutoff:
+            q.popleft()
+
+    def record(self):
+        now = time.monotonic()
+        self._requests.append(now)
+        self._trim(self._requests, now)
+
+    def can_retry(self) -> bool:
+        now = time.monotonic()
+        self._trim(self._requests, now)
+        self._trim(self._retries, now)
+        if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+            self.denied += 1
+            return False
+        self._retries.append(now)
+        self.allowed += 1
+        return True
+
+
+# ===================== STATS =====================
+class EndpointStats:
+    def __init__(self, sample: int = 1024):
+        self.requests = 0
+        self.errors = 0
+        self.latencies: deque = deque(maxlen=sample)   # oxirgi so'rovlar (s)
+
+    def observe(self, seconds: float, error: bool = False):
+        self.requests += 1
+        if error:
+            self.errors += 1
+        self.latencies.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        vals = sorted(self.latencies)
+        return vals[min(len(vals) - 1, int(q * len(vals)))]
+
+
+class PoolStats:
+    def __init__(self):
+        self.created = 0
+        self.reused = 0
+        self.dns_hits = 0
+        self.dns_misses = 0
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        tc = aiohttp.TraceConfig()
+
+        async def created(session, ctx, params):
+            self.created += 1
+
+        async def reused(session, ctx, params):
+            self.reused += 1
+
+        async def dns_hit(session, ctx, params):
+            self.dns_hits += 1
+
+        async def dns_miss(session, ctx, params):
+            self.dns_misses += 1
+
+        tc.on_connection_create_end.append(created)
+        tc.on_connection_reuseconn.append(reused)
+        tc.on_dns_cache_hit.append(dns_hit)
+        tc.on_dns_cache_miss.append(dns_miss)
+        return tc
+
+    def reuse_ratio(self) -> float:
+        total = self.created + self.reused
+        return self.reused / total if total else 0.0
+
+
+# ===================== BOT TRANSPORT =====================
+class BotTransport:
+    """
+    Bot API uchun yagona HTTP qatlam. Ikki alohida pool: "send" (sendMessage va boshqalar,
+    limit = yuboruvchi workerlar soni) va "poll" (getUpdates long-poll bitta ulanishni butun
+    umri band qiladi - yuborishlar uni kutmasin). DNS keshlanadi, ulanishlar keep-alive bilan
+    qayta ishlatiladi; har metod o'z timeout'i bilan. Har pool o'z circuit breaker'i bilan:
+    getUpdates probe'i 50 s long-poll bo'lishi mumkin va poll timeoutlari yuborishni to'xtatmasin.
+    Retry budget umumiy.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "https://api.telegram.org",
+        send_limit: int = 20,
+        poll_limit: int = 2,
+        dns_ttl: int = 300,
+        keepalive: float = 30.0,
+        connect_timeout: float = 5.0,
+        timeouts: Optional[Dict[str, float]] = None,
+        default_timeout: float = 20.0,
+        breaker: Optional[CircuitBreaker] = None,
+        poll_breaker: Optional[CircuitBreaker] = None,
+        retry_budget: Optional[RetryBudget] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.send_limit = max(1, send_limit)
+        self.poll_limit = max(1, poll_limit)
+        self.dns_ttl = dns_ttl
+        self.keepalive = keepalive
+        self.connect_timeout = connect_timeout
+        self.timeouts = {"sendMessage": 30.0, "getUpdates": 60.0}
+        self.timeouts.update(timeouts or {})
+        self.default_timeout = default_timeout
+        self.breakers: Dict[str, CircuitBreaker] = {
+            "send": breaker or CircuitBreaker(),
+            "poll": poll_breaker or CircuitBreaker(),
+        }
+        for pool, b in self.breakers.items():
+            b.name = b.name or pool
+        self.retry_budget = retry_budget or RetryBudget()
+
+        self.pools: Dict[str, PoolStats] = {"send": PoolStats(), "poll": PoolStats()}
+        self.endpoints: Dict[str, EndpointStats] = {}
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+
+    # ----- lifecycle -----
+    def _session(self, pool: str) -> aiohttp.ClientSession:
+        s = self._sessions.get(pool)
+        if s is None or s.closed:
+            limit = self.poll_limit if pool == "poll" else self.send_limit
+            connector = aiohttp.TCPConnector(
+                limit=limit,
+                limit_per_host=limit,
+                ttl_dns_cache=self.dns_ttl,
+                use_dns_cache=True,
+                keepalive_timeout=self.keepalive,
+            )
+            s = self._sessions[pool] = aiohttp.ClientSession(
+                connector=connector, trace_configs=[self.pools[pool].trace_config()])
+        return s
+
+    def start(self):
+        """Event loop ichida chaqiriladi: ikkala pool oldindan ochiladi."""
+        for pool in self.pools:
+            self._session(pool)
+
+    async def close(self):
+        for s in self._sessions.values():
+            if not s.closed:
+                await s.close()
+        self._sessions.clear()
+
+    @staticmethod
+    def pool_for(method: str) -> str:
+        return "poll" if method in POLL_METHODS else "send"
+
+    def timeout_for(self, method: str) -> aiohttp.ClientTimeout:
+        total = self.timeouts.get(method, self.default_timeout)
+        return aiohttp.ClientTimeout(total=total, connect=min(self.connect_timeout, total))
+
+    # ----- request -----
+    def check(self, method: str = "sendMessage"):
+        """
+        Rate token olishdan oldin: method pool'ining circuit'i ochiq bo'lsa CircuitOpen -
+        tarmoqqa chiqmaydigan so'rov uchun token sarflanmasin.
+        """
+        self.breakers[self.pool_for(method)].check()
+
+    async def request(
+        self,
+        token: str,
+        method: str,
+        payload: Optional[dict] = None,
+        params: Optional[dict] = None,
+    ) -> BotResponse:
+        """
+        Javob (har qanday HTTP status) BotResponse bo'lib qaytadi. Tarmoq xatosi va timeout
+        (aiohttp.ClientError / asyncio.TimeoutError) chaqiruvchiga o'tadi, circuit ochiq bo'lsa
+        CircuitOpen - qayta urinish qarori chaqiruvchida (retry_budget.can_retry()).
+        """
+        pool = self.pool_for(method)
+        breaker = self.breakers[pool]
+        probe = breaker.before()
+        stats = self.endpoints.get(method)
+        if stats is None:
+            stats = self.endpoints[method] = EndpointStats()
+        self.retry_budget.record()
+
+        url = f"{self.base_url}/bot{token}/{method}"
+        t0 = time.perf_counter()
+        try:
+            session = self._session(pool)
+            async with session.post(url, json=payload, params=params, timeout=self.timeout_for(method)) as resp:
+                body = await resp.text()
+                status = resp.status
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            stats.observe(time.perf_counter() - t0, error=True)
+            breaker.on_failure()
+            raise
+        except BaseException:
+            if probe:
+                breaker.release()
+            raise
+        stats.observe(time.perf_counter() - t0, error=status >= 500)
+
+        if status >= 500:
+            breaker.on_failure()
+        else:
+            breaker.on_success()
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            data = {"description": body}
+        return BotResponse(status, data if isinstance(data, dict) else {"result": data})
+
+    # ----- stats -----
+    def stats(self) -> dict:
+        return {
+            "breakers": {name: b.stats() for name, b in self.breakers.items()},
+            "retries_allowed": self.retry_budget.allowed,
+            "retries_denied": self.retry_budget.denied,
+            "pools": {
+                name: {
+                    "created": p.created,
+                    "reused": p.reused,
+                    "reuse_ratio": p.reuse_ratio(),
+                    "dns_hits": p.dns_hits,
+                    "dns_misses": p.dns_misses,
+                }
+                for name, p in self.pools.items()
+            },
+            "endpoints": {
+                method: {
+                    "requests": e.requests,
+                    "errors": e.errors,
+                    "p50_s": e.percentile(0.50),
+                    "p99_s": e.percentile(0.99),
+                }
+                for method, e in self.endpoints.items()
+            },
+        }
@@ -0,0 +1,124 @@
+import time
+from collections import Counter
+from typing import FrozenSet, Iterable, Optional
+
+from pyrogram import filters
+
+MODES = ("blocklist", "allowlist")
+
+
+# ===================== CHAT GATE =====================
+class ChatGate:
+    """
+    Handler ishga tushishidan oldin (pyrogram filter bosqichida) xabarni rad etish.
+    watched_groups.is_blocked dan blocklist, allowlist rejimida esa faqat watched_groups
+    dagi bloklanmagan guruhlar o'tadi. Tekshiruv bitta set lookup; to'plamlar yangilanganda
+    butunlay almashtiriladi (frozenset), filter hech qachon yarim yangilangan holatni ko'rmaydi.
+    """
+
+    def __init__(self, mode: str = "blocklist", always_blocked: Iterable[int] = ()):
+        if mode not in MODES:
+            raise ValueError(f"group filter mode {mode!r}: {', '.join(MODES)} dan biri bo'lishi kerak")
+        self.mode = mode
+        self._always_blocked = frozenset(int(x) for x in always_blocked)
+        self.blocked: FrozenSet[int] = self._always_blocked
+        self.allowed: FrozenSet[int] = frozenset()
+        self.loaded_at = 0.0
+        self.version = 0
+
+        self.passed = 0
+        self.filtered_by_chat: Counter = Counter()
+        self.filtered_by_reason: Counter = Counter()
+
+    # ----- yangilash -----
+    def load(self, rows: Iterable[dict]):
+        """watched_groups qatorlari (group_id, is_blocked) -> yangi to'plamlar."""
+        blocked, allowed = set(self._always_blocked), set()
+        for row in rows:
+            gid = row.get("group_id")
+            if gid is None:
+                continue
+            gid = int(gid)
+            if row.get("is_blocked"):
+                blocked.add(gid)
+            else:
+                allowed.add(gid)
+        allowed -= blocked
+        self.blocked = frozenset(blocked)
+        self.allowed = frozenset(allowed)
+        self.loaded_at = time.time()
+        self.version += 1
+
+    def allow(self, group_ids: Iterable[int]):
+        """Yangi qo'shilgan guruhlar (sync_watched_groups) - keyingi to'liq yuklashni kutmasdan."""
+        new = {int(g) for g in group_ids} - self.allowed - self.blocked
+        if new:
+            self.allowed = self.allowed | new
+
+    def apply(self, rows: Iterable[dict], deleted_ids: Iterable[int] = ()):
+        """Config sync deltasi: o'zgargan qatorlar va o'chirilgan group_id lar."""
+        blocked, allowed = set(self.blocked), set(self.allowed)
+        for gid in deleted_ids:
+            gid = int(gid)
+            allowed.discard(gid)
+            if gid not in self._always_blocked:
+                blocked.discard(gid)
+        for row in rows:
+            gid = row.get("group_id")
+            if gid is None:
+                continue
+            gid = int(gid)
+            if row.get("is_blocked") or gid in self._always_blocked:
+                blocked.add(gid)
+                allowed.discard(gid)
+            else:
+                blocked.discard(gid)
+                allowed.add(gid)
+        self.blocked = frozenset(blocked)
+        self.allowed = frozenset(allowed)
+        self.version += 1
+
+    # ----- tekshirish -----
+    def reason(self, chat_id: int, has_text: bool) -> Optional[str]:
+        """None -> o'tkaziladi, aks holda rad etish sababi."""
+        if not has_text:
+            return "no_text"
+        if chat_id in self.blocked:
+            return "blocked"
+        if self.mode == "allowlist" and chat_id not in self.allowed:
+            return "not_watched"
+        return None
+
+    def check(self, message) -> bool:
+        chat = message.chat
+        if chat is None:
+            return False
+        has_text = not message.service and bool(message.text or message.caption)
+        why = self.reason(chat.id, has_text)
+        if why is None:
+            self.passed += 1
+            return True
+        self.filtered_by_chat[chat.id] += 1
+        self.filtered_by_reason[why] += 1
+        return False
+
+    def filter(self) -> filters.Filter:
+        # async: sync filter funksiyalarini pyrogram thread pool'da ishlatadi
+        gate = self
+
+        async def func(_, __, message) -> bool:
+            return gate.check(message)
+
+        return filters.create(func, "ChatGateFilter")
+
+    def stats(self, top: int = 5) -> dict:
+        return {
+            "mode": self.mode,
+            "blocked": len(self.blocked),
+            "allowed": len(self.allowed),
+            "version": self.version,
+            "passed": self.passed,
+            "filtered": sum(self.filtered_by_reason.values()),
+            "filtered_by_reason": dict(self.filtered_by_reason),
+            "filtered_by_chat": self.filtered_by_chat.most_common(top),
+        }
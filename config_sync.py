@@ -0,0 +1,221 @@
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+from repository import Repository
+
+RowsFn = Callable[[List[dict]], None]
+DeltaFn = Callable[[List[dict], List[dict]], None]
+
+
+# ===================== TABLE FEED =====================
+class TableFeed:
+    """
+    Bitta jadval: updated_at kursori va o'zgarishlarni qo'llovchi funksiyalar.
+    on_full(rows)               -> to'liq holat (start va vaqti-vaqti bilan reconcile, o'chirilganlar shu yerda)
+    on_change(upserts, deletes) -> faqat o'zgargan qatorlar
+    """
+
+    def __init__(
+        self,
+        table: str,
+        columns: str,
+        key: Sequence[str],
+        on_full: RowsFn,
+        on_change: DeltaFn,
+        fallback_interval: float,
+        on_error: Optional[Callable[[Exception], None]] = None,
+        cursor_column: str = "updated_at",
+    ):
+        self.table = table
+        self.columns = columns
+        self.key = tuple(key)
+        self.on_full = on_full
+        self.on_change = on_change
+        self.fallback_interval = fallback_interval
+        self.on_error = on_error
+        self.cursor_column = cursor_column
+
+        self.cursor: Optional[str] = None
+        # Kursor vaqtidagi qatorlar: gte so'rovida ular yana keladi, ikkinchi marta qo'llanmaydi
+        self._at_cursor: set = set()
+        # False -> jadvalda updated_at yo'q, eski usul: to'liq o'qish fallback_interval da
+        self.supported = True
+        self.last_full = 0.0
+
+        self.full_loads = 0
+        self.polls = 0
+        self.rows_applied = 0
+        self.events = 0
+        self.errors = 0
+
+    def row_key(self, row: dict) -> tuple:
+        return tuple(row.get(k) for k in self.key)
+
+    def advance(self, rows: List[dict]) -> List[dict]:
+        """Kursorni suradi, allaqachon qo'llangan qatorlarni tashlaydi."""
+        fresh = []
+        for row in rows:
+            stamp = row.get(self.cursor_column)
+            k = self.row_key(row)
+            if stamp is not None and stamp == self.cursor and k in self._at_cursor:
+                continue
+            fresh.append(row)
+            if stamp is None:
+                continue
+            if self.cursor is None or stamp > self.cursor:
+                self.cursor = stamp
+                self._at_cursor = {k}
+            elif stamp == self.cursor:
+                self._at_cursor.add(k)
+        return fresh
+
+    def stats(self) -> dict:
+        return {
+            "mode": "delta" if self.supported else "full",
+            "cursor": self.cursor,
+            "full_loads": self.full_loads,
+            "polls": self.polls,
+            "rows_applied": self.rows_applied,
+            "events": self.events,
+            "errors": self.errors,
+        }
+
+
+# ===================== CONFIG SYNC =====================
+class ConfigSync:
+    """
+    keywords / userbot_accounts / watched_groups / account_groups keshlarini yangilab turadi.
+    Backend change stream bersa (repo.subscribe) o'zgarishlar darhol qo'llanadi, aks holda har
+    poll_interval da faqat updated_at >= kursor qatorlar so'raladi. O'chirilgan qatorlarni
+    kursor ko'rmaydi - ular full_interval dagi to'liq reconcile'da tushib qoladi.
+    """
+
+    def __init__(
+        self,
+        repo: Repository,
+        poll_interval: float = 10.0,
+        full_interval: float = 600.0,
+        page_size: int = 1000,
+    ):
+        self.repo = repo
+        self.poll_interval = poll_interval
+        self.full_interval = full_interval
+        self.page_size = max(1, page_size)
+        self.feeds: Dict[str, TableFeed] = {}
+        self.streaming = False
+        self._task: Optional[asyncio.Task] = None
+
+    def watch(
+        self,
+        table: str,
+        columns: str,
+        key: Sequence[str],
+        on_full: RowsFn,
+        on_change: DeltaFn,
+        fallback_interval: float = 60.0,
+        on_error: Optional[Callable[[Exception], None]] = None,
+    ) -> TableFeed:
+        feed = TableFeed(table, columns, key, on_full, on_change, fallback_interval, on_error)
+        self.feeds[table] = feed
+        return feed
+
+    async def start(self):
+        """Boshlang'ich to'liq yuklash (kursor shu yerdan boshlanadi), keyin fon sikli."""
+        self.streaming = self.repo.subscribe(self._on_event)
+        for feed in self.feeds.values():
+            await self._full(feed)
+        self._task = asyncio.create_task(self._loop())
+        mode = "change stream" if self.streaming else f"updated_at poll {self.poll_interval:g}s"
+        print(f"🔁 Config sync: {', '.join(self.feeds)} ({mode}, to'liq reconcile {self.full_interval:g}s)")
+
+    # ----- to'liq -----
+    async def _full(self, feed: TableFeed) -> bool:
+        cols = feed.columns if feed.supported else _without(feed.columns, feed.cursor_column)
+        try:
+            rows = await self.repo.select(feed.table, cols)
+        except Exception as e:
+            if feed.supported and feed.cursor_column in str(e):
+                # Jadvalda updated_at ustuni yo'q -> eski usulga o'tamiz
+                print(f"⚠️ {feed.table}: {feed.cursor_column} yo'q, to'liq o'qishga o'tildi ({feed.fallback_interval:g}s)")
+                feed.supported = False
+                return await self._full(feed)
+            feed.errors += 1
+            print(f"⚠️ {feed.table} to'liq yuklashda xato: {e}")
+            if feed.on_error:
+                feed.on_error(e)
+            return False
+
+        feed.last_full = time.monotonic()
+        feed.full_loads += 1
+        if feed.supported:
+            feed.cursor, feed._at_cursor = None, set()
+            feed.advance(rows)
+        _safe(feed.on_full, rows, feed.table)
+        return True
+
+    # ----- delta -----
+    async def _poll(self, feed: TableFeed):
+        # Birinchi sahifa gte kursor (kursor vaqtidagi kechikkan yozuvlar ham ko'rinadi),
+        # keyingilari (updated_at, key) keyset: bir xil updated_at dagi qatorlar page_size dan
+        # ko'p bo'lsa ham sahifalash oldinga siljiydi
+        since, after = feed.cursor, None
+        while True:
+            feed.polls += 1
+            try:
+                rows = await self.repo.select_since(
+                    feed.table, feed.columns, feed.cursor_column, since,
+                    limit=self.page_size, key=feed.key, after=after)
+            except Exception as e:
+                feed.errors += 1
+                print(f"⚠️ {feed.table} o'zgarishlarni olishda xato: {e}")
+                return
+            fresh = feed.advance(rows)
+            if fresh:
+                feed.rows_applied += len(fresh)
+                _safe(feed.on_change, fresh, [], feed.table)
+            # To'liq sahifa -> yana o'zgarishlar bo'lishi mumkin
+            if len(rows) < self.page_size:
+                return
+            last = rows[-1]
+            if last.get(feed.cursor_column) is None:
+                return
+            since, after = last[feed.cursor_column], feed.row_key(last)
+
+    def _on_event(self, table: str, op: str, row: dict):
+        feed = self.feeds.get(table)
+        if feed is None:
+            return
+        feed.events += 1
+        if op == "delete":
+            _safe(feed.on_change, [], [row], table)
+            return
+        if feed.advance([row]):
+            feed.rows_applied += 1
+            _safe(feed.on_change, [row], [], table)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            now = time.monotonic()
+            for feed in self.feeds.values():
+                interval = self.full_interval if feed.supported else feed.fallback_interval
+                if now - feed.last_full >= interval:
+                    await self._full(feed)
+                elif feed.supported and not self.streaming:
+                    await self._poll(feed)
+
+    def stats(self) -> Dict[str, dict]:
+        return {t: f.stats() for t, f in self.feeds.items()}
+
+
+def _without(columns: str, col: str) -> str:
+    return ", ".join(c.strip() for c in columns.split(",") if c.strip() and c.strip() != col)
+
+
+def _safe(fn: Callable, *args):
+    *call_args, table = args
+    try:
+        fn(*call_args)
+    except Exception as e:
+        print(f"⚠️ {table} o'zgarishini qo'llashda xato: {e}")
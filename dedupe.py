@@ -0,0 +1,153 @@
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+# ===================== DEDUPE STORE =====================
+class DedupeStore:
+    """
+    (chat_id, message_id) bo'yicha takrorni aniqlash.
+    seen(key) kalitni yozib qo'yadi va oyna (window) ichida avval ko'rilgan bo'lsa True qaytaradi.
+    forget(key) belgini olib tashlaydi - hit navbatga kirmasa boshqa akkaunt uni qayta olib keladi.
+    """
+
+    name = "base"
+    # True -> bir nechta jarayon bitta holatni ko'radi (kalitni bir marta belgilash kifoya)
+    shared = False
+
+    def __init__(self, window: float):
+        self.window = window
+        self.hits = 0
+        self.misses = 0
+
+    def seen(self, key: Hashable) -> bool:
+        raise NotImplementedError
+
+    def forget(self, key: Hashable):
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        return 0
+
+    def close(self):
+        pass
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+class MemoryDedupeStore(DedupeStore):
+    """Bitta jarayon uchun: OrderedDict LRU + TTL, hajmi max_size bilan cheklangan."""
+
+    name = "memory"
+
+    def __init__(self, window: float = 600, max_size: int = 200000):
+        super().__init__(window)
+        self.max_size = max(1, max_size)
+        self._data: "OrderedDict[Hashable, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def seen(self, key: Hashable) -> bool:
+        now = time.monotonic()
+        data = self._data
+
+        # Eskilari boshida turadi -> faqat boshidan tozalaymiz
+        cutoff = now - self.window
+        while data:
+            ts = next(iter(data.values()))
+            if ts >= cutoff:
+                break
+            data.popitem(last=False)
+
+        if key in data:
+            self.hits += 1
+            return True
+
+        data[key] = now
+        if len(data) > self.max_size:
+            data.popitem(last=False)
+        self.misses += 1
+        return False
+
+    def forget(self, key: Hashable):
+        self._data.pop(key, None)
+
+
+class SqliteDedupeStore(DedupeStore):
+    """
+    Bir nechta jarayon bitta mashinada bo'lsa: umumiy SQLite fayl (WAL).
+    INSERT OR IGNORE atomar bo'lgani uchun faqat bitta jarayon "yangi" deb ko'radi.
+    """
+
+    name = "sqlite"
+    shared = True
+
+    def __init__(self, path: str, window: float = 600, purge_every: int = 1000):
+        super().__init__(window)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS seen (k TEXT PRIMARY KEY, ts REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS seen_ts ON seen (ts)")
+        self._purge_every = max(1, purge_every)
+        self._ops = 0
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def seen(self, key: Hashable) -> bool:
+        now = time.time()
+        k = repr(key)
+
+        self._ops += 1
+        if self._ops % self._purge_every == 0:
+            self._conn.execute("DELETE FROM seen WHERE ts < ?", (now - self.window,))
+
+        cur = self._conn.execute("INSERT OR IGNORE INTO seen (k, ts) VALUES (?, ?)", (k, now))
+        if cur.rowcount:
+            self.misses += 1
+            return False
+
+        # Kalit bor - lekin oynadan eskirgan bo'lsa yangi deb hisoblanadi
+        cur = self._conn.execute("UPDATE seen SET ts = ? WHERE k = ? AND ts < ?", (now, k, now - self.window))
+        if cur.rowcount:
+            self.misses += 1
+            return False
+
+        self.hits += 1
+        return True
+
+    def forget(self, key: Hashable):
+        self._conn.execute("DELETE FROM seen WHERE k = ?", (repr(key),))
+
+    def close(self):
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+
+
+def create_dedupe_store(
+    backend: str,
+    window: float,
+    max_size: int = 200000,
+    path: Optional[str] = None,
+) -> Optional[DedupeStore]:
+    backend = (backend or "memory").strip().lower()
+    if backend in ("off", "none", "0") or window <= 0:
+        return None
+    if backend == "sqlite":
+        return SqliteDedupeStore(path or "dedupe.sqlite3", window=window)
+    return MemoryDedupeStore(window=window, max_size=max_size)
@@ -0,0 +1,134 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+from pyrogram import Client, raw, utils
+from pyrogram.errors import FloodWait
+
+
+# ===================== DIALOG CURSOR =====================
+class DialogCursor:
+    """messages.GetDialogs sahifalash holati - FloodWait'dan keyin shu joydan davom etiladi."""
+
+    __slots__ = ("offset_date", "offset_id", "offset_peer", "groups", "pages", "started_at", "done")
+
+    def __init__(self):
+        self.offset_date = 0
+        self.offset_id = 0
+        self.offset_peer = raw.types.InputPeerEmpty()
+        self.groups: Dict[int, str] = {}
+        self.pages = 0
+        self.started_at = time.time()
+        self.done = False
+
+
+# ===================== DIALOG WALKER =====================
+class DialogWalker:
+    """
+    Akkauntning barcha guruhlarini (GROUP + SUPERGROUP) sahifalab yig'adi.
+    client.get_dialogs() dan farqi: offsetlar saqlanadi, FloodWait yoki uzilishdan
+    keyin walk boshidan emas, oxirgi sahifadan davom etadi va takror yozuvlar bo'lmaydi.
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        phone: str,
+        page_size: int = 100,
+        max_flood_waits: int = 5,
+        cursor_ttl: float = 3600,
+    ):
+        self.client = client
+        self.phone = phone
+        self.page_size = page_size
+        self.max_flood_waits = max_flood_waits
+        self.cursor_ttl = cursor_ttl
+        self.cursor: Optional[DialogCursor] = None
+
+        self.walks = 0
+        self.resumes = 0
+        self.flood_waits = 0
+
+    async def walk(self) -> Dict[int, str]:
+        cur = self.cursor
+        if cur is None or cur.done or time.time() - cur.started_at > self.cursor_ttl:
+            cur = self.cursor = DialogCursor()
+        elif cur.pages:
+            self.resumes += 1
+            print(f"↪️ [{self.phone}] Dialoglar {cur.pages}-sahifadan davom ettirilmoqda")
+
+        floods = 0
+        while not cur.done:
+            try:
+                await self._next_page(cur)
+            except FloodWait as fw:
+                floods += 1
+                self.flood_waits += 1
+                if floods > self.max_flood_waits:
+                    raise
+                wait_s = int(getattr(fw, "value", 0) or 0)
+                print(f"⏳ [{self.phone}] FloodWait {wait_s}s (sahifa {cur.pages})")
+                await asyncio.sleep(wait_s + 1)
+
+        self.walks += 1
+        return dict(cur.groups)
+
+    async def _next_page(self, cur: DialogCursor):
+        r = await self.client.invoke(
+            raw.functions.messages.GetDialogs(
+                offset_date=cur.offset_date,
+                offset_id=cur.offset_id,
+                offset_peer=cur.offset_peer,
+                limit=self.page_size,
+                hash=0,
+            )
+        )
+
+        if isinstance(r, raw.types.messages.DialogsNotModified):
+            cur.done = True
+            return
+
+        chats = {c.id: c for c in r.chats}
+        dialogs = [d for d in r.dialogs if isinstance(d, raw.types.Dialog)]
+
+        for d in dialogs:
+            title = group_title(d.peer, chats)
+            if title is not None:
+                cur.groups[utils.get_peer_id(d.peer)] = title
+
+        cur.pages += 1
+
+        if not dialogs or isinstance(r, raw.types.messages.Dialogs) or len(r.dialogs) < self.page_size:
+            cur.done = True
+            return
+
+        last = dialogs[-1]
+        last_peer_id = utils.get_peer_id(last.peer)
+        offset_date = 0
+        for m in r.messages:
+            if isinstance(m, raw.types.MessageEmpty):
+                continue
+            if m.id == last.top_message and utils.get_peer_id(m.peer_id) == last_peer_id:
+                offset_date = m.date
+                break
+
+        cur.offset_id = last.top_message
+        cur.offset_date = offset_date
+        cur.offset_peer = await self.client.resolve_peer(last_peer_id)
+
+
+def group_title(peer, chats: dict) -> Optional[str]:
+    """Faqat kuzatiladigan guruhlar uchun nom qaytaradi (oddiy guruh yoki supergroup)."""
+    if isinstance(peer, raw.types.PeerChat):
+        chat = chats.get(peer.chat_id)
+        if isinstance(chat, raw.types.Chat) and not getattr(chat, "deactivated", False):
+            return chat.title or f"Guruh {-peer.chat_id}"
+        return None
+
+    if isinstance(peer, raw.types.PeerChannel):
+        chat = chats.get(peer.channel_id)
+        if isinstance(chat, raw.types.Channel) and chat.megagroup and not chat.left:
+            return chat.title or f"Guruh {utils.get_peer_id(peer)}"
+        return None
+
+    return None
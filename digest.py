@@ -0,0 +1,125 @@
+import html
+import time
+from typing import List, Optional, Tuple
+
+from outbox import OutItem
+
+TELEGRAM_TEXT_LIMIT = 4096
+# Telegram inline keyboard: 100 ta tugmagacha, qatorda 8 tagacha
+KEYBOARD_MAX_BUTTONS = 100
+KEYBOARD_ROW_WIDTH = 5
+
+
+# ===================== DIGEST MODE =====================
+class DigestController:
+    """
+    Navbat chuqurligi yoki kechikish chegaradan oshsa digest rejimi yoqiladi,
+    backlog tarqalganda (histerezis bilan) yana bitta xabar = bitta hit rejimiga qaytadi.
+    """
+
+    def __init__(
+        self,
+        depth_on: int = 200,
+        depth_off: int = 20,
+        latency_on: float = 30.0,
+        max_items: int = 20,
+        enabled: bool = True,
+    ):
+        self.depth_on = depth_on
+        self.depth_off = min(depth_off, depth_on)
+        self.latency_on = latency_on
+        self.max_items = max(2, min(max_items, KEYBOARD_MAX_BUTTONS))
+        self.enabled = enabled
+
+        self.active = False
+        self.switches = 0
+        self.digests_sent = 0
+        self.items_digested = 0
+
+    def update(self, depth: int, oldest_latency: float) -> bool:
+        if not self.enabled:
+            return False
+        if not self.active:
+            if depth >= self.depth_on or oldest_latency >= self.latency_on:
+                self.active = True
+                self.switches += 1
+                print(f"📦 Digest rejimi YOQILDI (navbat={depth}, kechikish={oldest_latency:.0f}s)")
+        elif depth <= self.depth_off and oldest_latency < self.latency_on / 2:
+            self.active = False
+            self.switches += 1
+            print(f"📨 Digest rejimi o'chdi (navbat={depth})")
+        return self.active
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "switches": self.switches,
+            "digests_sent": self.digests_sent,
+            "items_digested": self.items_digested,
+        }
+
+
+def _render_entry(n: int, item: OutItem, body_limit: int) -> str:
+    body = item.body or ""
+    if len(body) > body_limit:
+        body = body[:body_limit].rstrip() + "…"
+    sender = item.sender_html or html.escape("Noma'lum")
+    return (
+        f"<b>{n}.</b> 📍 <b>{html.escape(item.group_name or 'Guruh')}</b>"
+        f" · 👤 {sender}\n"
+        f"{html.escape(body)}\n"
+        f'🔗 <a href="{html.escape(item.message_link)}">Xabarga o\'tish</a>'
+    )
+
+
+def build_digests(
+    items: List[OutItem],
+    max_items: int = 20,
+    body_limit: int = 400,
+    text_limit: int = TELEGRAM_TEXT_LIMIT,
+) -> List[Tuple[str, list, List[OutItem]]]:
+    """
+    Itemlarni 4096 belgi va keyboard limitiga sig'adigan digestlarga bo'ladi.
+    Har biri: (html_text, inline_keyboard, shu digestdagi itemlar).
+    """
+    max_items = max(1, min(max_items, KEYBOARD_MAX_BUTTONS))
+    out: List[Tuple[str, list, List[OutItem]]] = []
+
+    chunk: List[OutItem] = []
+    entries: List[str] = []
+
+    def header(n: int) -> str:
+        return f"📦 <b>Yangi buyurtmalar ({n} ta)</b>\n\n"
+
+    def flush():
+        if not chunk:
+            return
+        text = header(len(chunk)) + "\n\n".join(entries)
+        buttons = [{"text": f"🔗 {i}", "url": it.message_link} for i, it in enumerate(chunk, 1)]
+        keyboard = [buttons[i: i + KEYBOARD_ROW_WIDTH] for i in range(0, len(buttons), KEYBOARD_ROW_WIDTH)]
+        out.append((text, keyboard, list(chunk)))
+        chunk.clear()
+        entries.clear()
+
+    for item in items:
+        entry = _render_entry(len(chunk) + 1, item, body_limit)
+        # header'dagi son 3 xonagacha bo'lishi mumkin -> +2 zaxira
+        projected = len(header(len(chunk) + 1)) + 2 + sum(len(e) + 2 for e in entries) + len(entry)
+        if chunk and (len(chunk) >= max_items or projected > text_limit):
+            flush()
+            entry = _render_entry(1, item, body_limit)
+
+        if len(header(1)) + len(entry) > text_limit:
+            entry = _render_entry(len(chunk) + 1, item, max(50, body_limit // 4))
+
+        chunk.append(item)
+        entries.append(entry)
+
+    flush()
+    return out
+
+
+def oldest_latency(item: Optional[OutItem], now: Optional[float] = None) -> float:
+    if not item or not item.enqueued_at:
+        return 0.0
+    return max(0.0, (now or time.time()) - item.enqueued_at)
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import os
+import random
+import time
+from collections import deque
+from typing import List, Optional
+
+from repository import Repository
+
+
+def owned_by_running_loop(task: asyncio.Future) -> bool:
+    try:
+        return task.get_loop() is asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+
+
+# ===================== KEYWORD HIT SINK =====================
+class HitSink:
+    """
+    keyword_hits uchun buferli yozuvchi.
+    Qatorlar xotirada yig'iladi va max_rows yoki flush_interval bo'yicha
+    bitta multi-row insert bilan yoziladi. Baza uzoq vaqt ishlamasa
+    bufer diskka (JSONL) tushiriladi va baza qaytganda qayta yuboriladi.
+    """
+
+    def __init__(
+        self,
+        repo: Repository,
+        max_rows: int = 500,
+        flush_interval: float = 2.0,
+        max_buffer: int = 20000,
+        spill_path: Optional[str] = None,
+        spill_after_failures: int = 5,
+        max_spill_bytes: int = 64 * 1024 * 1024,
+        max_backoff: float = 30.0,
+    ):
+        self.repo = repo
+        self.max_rows = max(1, max_rows)
+        self.flush_interval = flush_interval
+        self.max_buffer = max(self.max_rows, max_buffer)
+        self.spill_path = spill_path
+        self.spill_after_failures = spill_after_failures
+        self.max_spill_bytes = max_spill_bytes
+        self.max_backoff = max_backoff
+
+        self._buf: deque = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._failures = 0
+
+        self.written = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.flush_errors = 0
+        self.last_error: Optional[str] = None
+
+    # ----- producer side (handler) -----
+    def add(self, row: dict):
+        if len(self._buf) >= self.max_buffer:
+            # Xotira chegaralangan: eng eski qator tushib qoladi
+            self._buf.popleft()
+            self.dropped += 1
+        self._buf.append(row)
+        if len(self._buf) >= self.max_rows:
+            self._wakeup.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._buf)
+
+    def stats(self) -> dict:
+        return {
+            "written": self.written,
+            "dropped": self.dropped,
+            "pending": self.pending,
+            "spilled": self.spilled,
+            "spilled_pending": self.spilled - self.replayed,
+            "flush_errors": self.flush_errors,
+        }
+
+    # ----- lifecycle -----
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self, timeout: float = 10.0):
+        self._closing = True
+        task = self._task
+        # Task boshqa (yopilgan) loop'niki bo'lsa uni kutib ham, uyg'otib ham bo'lmaydi ->
+        # bufer to'g'ridan-to'g'ri diskka
+        if task and not task.done() and owned_by_running_loop(task):
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(task, timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                task.cancel()
+        # Yozib bo'lmaganlar yo'qolmasin
+        if self._buf:
+            self._spill(list(self._buf))
+            self._buf.clear()
+
+    # ----- consumer side -----
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            await self._drain()
+            if self._closing:
+                return
+
+    async def _drain(self):
+        while self._buf:
+            chunk = [self._buf.popleft() for _ in range(min(self.max_rows, len(self._buf)))]
+            if not await self._write_with_retry(chunk):
+                return
+
+        if self._failures == 0:
+            await self._replay_spill()
+
+    async def _write_with_retry(self, chunk: List[dict]) -> bool:
+        delay = 0.5
+        while True:
+            try:
+                await self.repo.insert_keyword_hits(chunk)
+                self.written += len(chunk)
+                self._failures = 0
+                return True
+            except Exception as e:
+                self.flush_errors += 1
+                self._failures += 1
+                self.last_error = str(e)
+
+                if self._failures >= self.spill_after_failures or self._closing:
+                    print(f"⚠️ keyword_hits yozilmadi ({self._failures} marta): {e} -> diskka")
+                    self._spill(chunk + list(self._buf))
+                    self._buf.clear()
+                    return False
+
+                await asyncio.sleep(delay + random.uniform(0, delay / 2))
+                delay = min(delay * 2, self.max_backoff)
+
+    def _spill(self, rows: List[dict], count: bool = True):
+        if not rows:
+            return
+        if not self.spill_path:
+            self.dropped += len(rows)
+            return
+        try:
+            size = os.path.getsize(self.spill_path) if os.path.exists(self.spill_path) else 0
+            os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for i, row in enumerate(rows):
+                    line = json.dumps(row, ensure_ascii=False) + "\n"
+                    size += len(line)
+                    if size > self.max_spill_bytes:
+                        self.dropped += len(rows) - i
+                        break
+                    f.write(line)
+                    if count:
+                        self.spilled += 1
+        except OSError as e:
+            print(f"⚠️ Spill faylga yozib bo'lmadi: {e}")
+            self.dropped += len(rows)
+
+    async def _replay_spill(self):
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+
+        tmp = f"{self.spill_path}.{int(time.time())}.replay"
+        try:
+            os.replace(self.spill_path, tmp)
+            with open(tmp, "r", encoding="utf-8") as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Spill faylni o'qib bo'lmadi: {e}")
+            return
+
+        done = 0
+        for i in range(0, len(rows), self.max_rows):
+            chunk = rows[i: i + self.max_rows]
+            try:
+                await self.repo.insert_keyword_hits(chunk)
+                self.written += len(chunk)
+                self.replayed += len(chunk)
+                done += len(chunk)
+            except Exception as e:
+                self.flush_errors += 1
+                self.last_error = str(e)
+                self._spill(rows[i:], count=False)
+                break
+
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+        if done:
+            print(f"♻️ Spill fayldan qayta yuborildi: {done}/{len(rows)} ta qator")
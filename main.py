@@ -5,14 +5,35 @@ import aiohttp
 import time
 import html
 import re
-from typing import Optional, List, Tuple, Dict
+import signal
+from datetime import datetime, timezone
+from typing import Any, Optional, List, Dict
 
 from dotenv import load_dotenv
-from pyrogram import Client, filters
+from pyrogram import Client, filters, raw, utils
+from pyrogram.errors import FloodWait
 from pyrogram.types import Message
 from pyrogram.enums import ChatType, MessageEntityType
-from pyrogram.errors import FloodWait
-from supabase import create_client, Client as SupabaseClient
+
+from matcher import KeywordSnapshot, EMPTY_SNAPSHOT, build_snapshot
+from normalize import normalize_text
+from repository import Repository, chunked, create_repository, db_account
+from hit_sink import HitSink
+from rollup import HitRollup, RawHitPolicy
+from dialog_sync import DialogWalker
+from dedupe import DedupeStore, create_dedupe_store
+from scheduler import SendScheduler
+from outbox import OutItem, make_item, load_item, create_send_queue
+from digest import TELEGRAM_TEXT_LIMIT, DigestController, build_digests, oldest_latency
+from admission import AdmissionController
+from chat_filter import ChatGate
+from sharding import ShardHub, ShardLink, ShardProcessPool, assign_shards
+from startup import GroupListCache, StartupScheduler
+from config_sync import ConfigSync
+from supervisor import AccountSupervisor, RunResult
+from neardup import NearDupIndex
+from bot_transport import BotTransport, CircuitBreaker, CircuitOpen, RetryBudget
+from metrics import REGISTRY, start_metrics_server
 
 load_dotenv()
 
@@ -21,10 +42,48 @@ API_ID = int(os.getenv("TELEGRAM_API_ID", "0") or "0")
 API_HASH = os.getenv("TELEGRAM_API_HASH", "")
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY", "")
+# supabase | memory (memory -> bazasiz lokal stend, MEMORY_SEED_FILE dan to'ldiriladi)
+DATA_BACKEND = (os.getenv("DATA_BACKEND", "supabase") or "supabase").strip().lower()
+MEMORY_SEED_FILE = os.getenv("MEMORY_SEED_FILE", "")
+DB_MAX_WORKERS = int(os.getenv("DB_MAX_WORKERS", "8") or "8")
+DB_TIMEOUT = float(os.getenv("DB_TIMEOUT", "15") or "15")
+
+# Guruh sinxronida bitta bulk upsert'dagi qatorlar soni
+GROUP_SYNC_CHUNK = int(os.getenv("GROUP_SYNC_CHUNK", "500") or "500")
+# To'liq dialog walk endi kamdan-kam (reconciliation); oradagi o'zgarishlar eventlardan
+FULL_SYNC_INTERVAL = int(os.getenv("FULL_SYNC_INTERVAL", "21600") or "21600")  # 6 soat
+DIALOG_PAGE_SIZE = int(os.getenv("DIALOG_PAGE_SIZE", "100") or "100")
+
+# ===== KEYWORD HITS BULK WRITE =====
+HIT_FLUSH_ROWS = int(os.getenv("HIT_FLUSH_ROWS", "500") or "500")
+HIT_FLUSH_INTERVAL = float(os.getenv("HIT_FLUSH_INTERVAL", "2") or "2")
+HIT_BUFFER_MAX = int(os.getenv("HIT_BUFFER_MAX", "20000") or "20000")
+# Xom qatorlar: all (har bir hit) | sample (KEYWORD_HITS_SAMPLE ulushi) | off. Analitika rollup'dan
+KEYWORD_HITS_MODE = (os.getenv("KEYWORD_HITS_MODE", "all") or "all").strip().lower()
+KEYWORD_HITS_SAMPLE = float(os.getenv("KEYWORD_HITS_SAMPLE", "0.1") or "0.1")
+KEYWORD_HITS_RETENTION_DAYS = float(os.getenv("KEYWORD_HITS_RETENTION_DAYS", "0") or "0")  # 0 -> o'chirilmaydi
+
+# ===== KEYWORD HIT ROLLUPS (keyword_id, group_id, phone, minute) -> hits =====
+ROLLUP_ENABLED = (os.getenv("ROLLUP_ENABLED", "1") or "1").strip().lower() not in ("0", "false", "no", "off")
+ROLLUP_FLUSH_INTERVAL = float(os.getenv("ROLLUP_FLUSH_INTERVAL", "60") or "60")
+ROLLUP_MAX_KEYS = int(os.getenv("ROLLUP_MAX_KEYS", "50000") or "50000")
+ROLLUP_COMPACT_INTERVAL = float(os.getenv("ROLLUP_COMPACT_INTERVAL", "3600") or "3600")
+ROLLUP_MINUTE_KEEP = int(os.getenv("ROLLUP_MINUTE_KEEP", str(2 * 86400)) or 2 * 86400)     # keyin -> hour
+ROLLUP_HOUR_KEEP = int(os.getenv("ROLLUP_HOUR_KEEP", str(90 * 86400)) or 90 * 86400)      # keyin -> day
 DRIVERS_GROUP_ID = int(os.getenv("DRIVERS_GROUP_ID", "-1003784903860"))
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
+# Lokal Bot API server yoki benchmark stendi uchun almashtirish mumkin
+BOT_API_BASE = (os.getenv("BOT_API_BASE", "https://api.telegram.org") or "https://api.telegram.org").rstrip("/")
+# Haydovchilar guruhiga yuborish uchun botlar (hammasi guruh a'zosi bo'lishi kerak).
+# Admin DM va /komandalar doim BOT_TOKEN orqali.
+BOT_TOKENS = [
+    t.strip() for t in (os.getenv("TELEGRAM_BOT_TOKENS", "") or BOT_TOKEN).split(",") if t.strip()
+]
 ADMIN_ID = int(os.getenv("ADMIN_ID", "7748145808") or "7748145808")
 
+# all -> har bir topilgan kalit so'z yoziladi, first -> birinchisi bilan to'xtaydi
+KEYWORD_MATCH_MODE = (os.getenv("KEYWORD_MATCH_MODE", "all") or "all").strip().lower()
+
 PHONE_NUMBERS_RAW = os.getenv("PHONE_NUMBER", "")
 PHONE_NUMBERS_ENV_FALLBACK = [
     p.strip().strip('"').strip("'") for p in PHONE_NUMBERS_RAW.split(",") if p.strip()
@@ -34,32 +93,218 @@ PHONE_NUMBERS_ENV_FALLBACK = [
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 SESS_DIR = os.path.join(BASE_DIR, "sessions")
 os.makedirs(SESS_DIR, exist_ok=True)
+SPOOL_DIR = os.path.join(BASE_DIR, "spool")
 
 # ===================== GLOBALS =====================
-supabase: SupabaseClient = None
+repo: Optional[Repository] = None
+hit_sink: Optional[HitSink] = None
+hit_rollup: Optional[HitRollup] = None
+raw_hits = RawHitPolicy(KEYWORD_HITS_MODE, KEYWORD_HITS_SAMPLE)
 
-keywords_cache: List[str] = []
-keywords_map: Dict[str, int] = {}
-last_cache_update = 0
-CACHE_TTL = 300  # 5 min
+# Handlerlar faqat shu snapshotni o'qiydi; uni faqat _rebuild_keywords almashtiradi
+keywords_snapshot: KeywordSnapshot = EMPTY_SNAPSHOT
+keywords_last_error: Optional[str] = None
+keyword_rows: Dict[Any, dict] = {}      # keywords.id -> qator (delta shu yerga qo'llanadi)
+CACHE_TTL = 300  # 5 min: keywords jadvalida updated_at bo'lmasa to'liq o'qish oralig'i
 
 watched_groups_cache = set()
 account_groups_cache: Dict[str, set] = {}
 groups_cache_loaded = False
 
+# ===== CONFIG SYNC (jadvallar to'liq emas, updated_at kursoridan keyin o'zgarganlari) =====
+CONFIG_POLL_INTERVAL = float(os.getenv("CONFIG_POLL_INTERVAL", "10") or "10")
+# O'chirilgan qatorlar shu to'liq reconcile'da tushib qoladi
+CONFIG_FULL_RESYNC = float(os.getenv("CONFIG_FULL_RESYNC", "600") or "600")
+config_sync: Optional[ConfigSync] = None
+account_rows: Dict[str, str] = {}       # phone -> status (userbot_accounts)
+accounts_changed = asyncio.Event()
+
+# ===== PRE-DISPATCH GROUP FILTER =====
+# blocklist -> faqat is_blocked=true rad etiladi | allowlist -> faqat watched_groups dagi bloklanmaganlar
+GROUP_FILTER_MODE = (os.getenv("GROUP_FILTER_MODE", "blocklist") or "blocklist").strip().lower()
+# watched_groups da updated_at bo'lmasa shu oraliqda to'liq qayta o'qiladi
+GROUP_FILTER_REFRESH = int(os.getenv("GROUP_FILTER_REFRESH", "60") or "60")
+# Haydovchilar guruhi doim bloklangan: o'zini o'zi forward qilmasin
+chat_gate = ChatGate(GROUP_FILTER_MODE, always_blocked=[DRIVERS_GROUP_ID])
+
 account_stats = {}          # phone -> {"groups_count": N, "active_count": N}
-running_clients = {}        # phone -> asyncio.Task
+account_dialog_groups: Dict[str, Dict[int, str]] = {}   # phone -> {group_id: title}
+dialog_walkers: Dict[str, DialogWalker] = {}
+running_clients = {}        # phone -> asyncio.Task (account_supervisor.supervise)
+
+# ===== ACCOUNT SUPERVISOR (uzilgan akkaunt backoff bilan qayta ulanadi) =====
+RESTART_BASE_DELAY = float(os.getenv("RESTART_BASE_DELAY", "5") or "5")
+RESTART_MAX_DELAY = float(os.getenv("RESTART_MAX_DELAY", "600") or "600")
+# Oynada shuncha restart bo'lsa akkaunt cooldown'ga qo'yiladi (restart storm)
+RESTART_STORM_MAX = int(os.getenv("RESTART_STORM_MAX", "5") or "5")
+RESTART_STORM_WINDOW = float(os.getenv("RESTART_STORM_WINDOW", "600") or "600")
+RESTART_STORM_COOLDOWN = float(os.getenv("RESTART_STORM_COOLDOWN", "1800") or "1800")
+# Qayta ulanish kutilayotgan akkaunt ham faol hisoblanadi (shard undan olib qo'yilmasin)
+ACTIVE_STATUSES = ["pending", "active", "connecting", "reconnecting"]
+
+# ===== STAGGERED STARTUP =====
+# Bir vaqtda ko'pi bilan N ta client.start()/boshlang'ich walk, har biridan oldin 0..JITTER s
+STARTUP_CONCURRENCY = int(os.getenv("STARTUP_CONCURRENCY", "3") or "3")
+STARTUP_JITTER = float(os.getenv("STARTUP_JITTER", "2") or "2")
+# Lokal guruhlar keshi shundan yangi bo'lsa restartda dialog walk qilinmaydi
+GROUP_CACHE_MAX_AGE = int(os.getenv("GROUP_CACHE_MAX_AGE", str(FULL_SYNC_INTERVAL)) or FULL_SYNC_INTERVAL)
+startup = StartupScheduler(STARTUP_CONCURRENCY, STARTUP_JITTER)
+group_list_cache = GroupListCache(os.path.join(SPOOL_DIR, "groups"))
 ALL_PHONES = []             # full phones list for statistics
 
+# ===== MULTI-PROCESS SHARDING =====
+# 0/1 -> bitta jarayon. N>1 -> shu jarayon faqat yetkazish (Bot API pipeline), akkauntlar
+# N ta `main.py --shard K` jarayonga taqsimlanadi va hitlarni lokal IPC orqali yuboradi
+SHARD_PROCESSES = int(os.getenv("SHARD_PROCESSES", "0") or "0")
+SHARD_IPC_HOST = os.getenv("SHARD_IPC_HOST", "127.0.0.1") or "127.0.0.1"
+SHARD_IPC_PORT = int(os.getenv("SHARD_IPC_PORT", "9110") or "9110")
+SHARD_REBALANCE_INTERVAL = float(os.getenv("SHARD_REBALANCE_INTERVAL", "5") or "5")
+
+
+def _shard_from_argv() -> Optional[int]:
+    if "--shard" in sys.argv:
+        try:
+            return int(sys.argv[sys.argv.index("--shard") + 1])
+        except (IndexError, ValueError):
+            print("❌ --shard dan keyin raqam kerak")
+            sys.exit(2)
+    return None
+
+
+SHARD_ID = _shard_from_argv()          # None -> shard jarayon emas
+shard_link: Optional[ShardLink] = None
+shard_hub: Optional[ShardHub] = None
+shard_pool: Optional[ShardProcessPool] = None
+active_clients: Dict[str, Client] = {}  # phone -> ishlayotgan pyrogram Client
+
 # ===== OUTBOUND QUEUE (KATTA QILINDI) =====
-send_queue: asyncio.Queue = asyncio.Queue(maxsize=50000)
+# memory -> tez, restartda yo'qoladi | sqlite -> spool/outbox.sqlite3, restartda qayta yuboriladi
+SEND_QUEUE_BACKEND = (os.getenv("SEND_QUEUE_BACKEND", "memory") or "memory").strip().lower()
+SEND_QUEUE_MAX = int(os.getenv("SEND_QUEUE_MAX", "50000") or "50000")
+# Shard jarayon navbatni ishlatmaydi (hitlar IPC orqali ketadi) -> durable fayl ochilmaydi
+send_queue = create_send_queue(
+    "memory" if SHARD_ID is not None else SEND_QUEUE_BACKEND,
+    SEND_QUEUE_MAX,
+    os.path.join(SPOOL_DIR, "outbox.sqlite3"),
+)
+
+# ===== ADMISSION CONTROL =====
+# Navbatdagi + yuborilayotgan xabarlar byudjeti; to'lsa: block | drop_oldest | drop_lowest
+MAX_INFLIGHT = min(int(os.getenv("MAX_INFLIGHT", "10000") or "10000"), SEND_QUEUE_MAX)
+ADMISSION_POLICY = (os.getenv("ADMISSION_POLICY", "drop_oldest") or "drop_oldest").strip().lower()
+ADMISSION_BLOCK_TIMEOUT = float(os.getenv("ADMISSION_BLOCK_TIMEOUT", "5") or "5")
+admission = AdmissionController(
+    MAX_INFLIGHT, ADMISSION_POLICY, ADMISSION_BLOCK_TIMEOUT, remove=lambda it: evict_queued(it))
 SEND_WORKERS = int(os.getenv("SEND_WORKERS", "20") or "20")
-aiohttp_session: aiohttp.ClientSession = None
+
+# ===== BOT API TRANSPORT =====
+# Send pool = SEND_WORKERS ta ulanish (har worker bittadan), getUpdates alohida pool'da
+BOT_HTTP_DNS_TTL = int(os.getenv("BOT_HTTP_DNS_TTL", "300") or "300")
+BOT_HTTP_KEEPALIVE = float(os.getenv("BOT_HTTP_KEEPALIVE", "30") or "30")
+BOT_HTTP_CONNECT_TIMEOUT = float(os.getenv("BOT_HTTP_CONNECT_TIMEOUT", "5") or "5")
+BOT_HTTP_SEND_TIMEOUT = float(os.getenv("BOT_HTTP_SEND_TIMEOUT", "30") or "30")
+BOT_POLL_TIMEOUT = int(os.getenv("BOT_POLL_TIMEOUT", "50") or "50")   # getUpdates long-poll
+BOT_BREAKER_FAILURES = int(os.getenv("BOT_BREAKER_FAILURES", "5") or "5")
+BOT_BREAKER_RESET = float(os.getenv("BOT_BREAKER_RESET", "5") or "5")
+BOT_BREAKER_MAX_RESET = float(os.getenv("BOT_BREAKER_MAX_RESET", "120") or "120")
+BOT_RETRY_RATIO = float(os.getenv("BOT_RETRY_RATIO", "0.2") or "0.2")
+bot_transport: Optional[BotTransport] = None
+
+
+def create_bot_transport(send_limit: int = SEND_WORKERS) -> BotTransport:
+    return BotTransport(
+        BOT_API_BASE,
+        send_limit=send_limit,
+        dns_ttl=BOT_HTTP_DNS_TTL,
+        keepalive=BOT_HTTP_KEEPALIVE,
+        connect_timeout=BOT_HTTP_CONNECT_TIMEOUT,
+        timeouts={"sendMessage": BOT_HTTP_SEND_TIMEOUT, "getUpdates": BOT_POLL_TIMEOUT + 10},
+        breaker=CircuitBreaker(BOT_BREAKER_FAILURES, BOT_BREAKER_RESET, BOT_BREAKER_MAX_RESET),
+        poll_breaker=CircuitBreaker(BOT_BREAKER_FAILURES, BOT_BREAKER_RESET, BOT_BREAKER_MAX_RESET),
+        retry_budget=RetryBudget(ratio=BOT_RETRY_RATIO),
+    )
+
+# ===== BOT API RATE LIMIT =====
+# Telegram: ~30 msg/s bitta bot uchun, ~20 msg/min bitta guruhga
+BOT_GLOBAL_RATE = float(os.getenv("BOT_GLOBAL_RATE", "25") or "25")
+BOT_CHAT_RATE_PER_MIN = float(os.getenv("BOT_CHAT_RATE_PER_MIN", "20") or "20")
+SEND_MAX_ATTEMPTS = int(os.getenv("SEND_MAX_ATTEMPTS", "8") or "8")
+DEAD_LETTER_MAX = int(os.getenv("DEAD_LETTER_MAX", "5000") or "5000")
+# 403 dan keyin token shuncha vaqt chetda turadi, keyin getMe bilan tekshiriladi (401 -> butunlay)
+BOT_DISABLE_COOLDOWN = float(os.getenv("BOT_DISABLE_COOLDOWN", "300") or "300")
+
+# ===== DIGEST MODE (backlog bo'lsa bir nechta hit bitta xabarda) =====
+DIGEST_ENABLED = (os.getenv("DIGEST_ENABLED", "1") or "1").strip().lower() not in ("0", "false", "no", "off")
+DIGEST_QUEUE_ON = int(os.getenv("DIGEST_QUEUE_ON", "200") or "200")
+DIGEST_QUEUE_OFF = int(os.getenv("DIGEST_QUEUE_OFF", "20") or "20")
+DIGEST_LATENCY_ON = float(os.getenv("DIGEST_LATENCY_ON", "30") or "30")
+DIGEST_MAX_ITEMS = int(os.getenv("DIGEST_MAX_ITEMS", "20") or "20")
+send_scheduler = SendScheduler(
+    BOT_TOKENS,
+    global_rate=BOT_GLOBAL_RATE,
+    global_burst=BOT_GLOBAL_RATE,
+    chat_rate=BOT_CHAT_RATE_PER_MIN / 60,
+    chat_burst=BOT_CHAT_RATE_PER_MIN,
+    max_attempts=SEND_MAX_ATTEMPTS,
+    dead_letter_max=DEAD_LETTER_MAX,
+    disable_cooldown=BOT_DISABLE_COOLDOWN,
+    probe=lambda tok: probe_bot_token(tok),
+)
+digest_controller = DigestController(
+    depth_on=DIGEST_QUEUE_ON,
+    depth_off=DIGEST_QUEUE_OFF,
+    latency_on=DIGEST_LATENCY_ON,
+    max_items=DIGEST_MAX_ITEMS,
+    enabled=DIGEST_ENABLED,
+)
+
+# ===== CROSS-ACCOUNT DEDUPE =====
+# Bir nechta akkaunt bitta guruhda bo'lsa, bitta xabar faqat bir marta yuboriladi
+DEDUPE_BACKEND = (os.getenv("DEDUPE_BACKEND", "memory") or "memory").strip().lower()  # memory | sqlite | off
+DEDUPE_WINDOW = float(os.getenv("DEDUPE_WINDOW", "600") or "600")
+DEDUPE_MAX = int(os.getenv("DEDUPE_MAX", "200000") or "200000")
+DEDUPE_PATH = os.getenv("DEDUPE_PATH", "") or os.path.join(SPOOL_DIR, "dedupe.sqlite3")
+dedupe_store: Optional[DedupeStore] = None
+
+# ===== NEAR-DUPLICATE (bir xil buyurtma ko'p guruhga tashlanganda) =====
+# off | suppress (takror yuborilmaydi) | annotate (suppress + birinchisiga "yana N ta guruhda")
+NEARDUP_MODE = (os.getenv("NEARDUP_MODE", "off") or "off").strip().lower()
+NEARDUP_WINDOW = float(os.getenv("NEARDUP_WINDOW", "300") or "300")
+NEARDUP_THRESHOLD = float(os.getenv("NEARDUP_THRESHOLD", "0.75") or "0.75")
+NEARDUP_MAX = int(os.getenv("NEARDUP_MAX", "50000") or "50000")  # ~1.1 KB yozuv boshiga
+# 1 -> faqat bitta yuboruvchining xabarlari solishtiriladi
+NEARDUP_BY_SENDER = (os.getenv("NEARDUP_BY_SENDER", "1") or "1").strip().lower() not in ("0", "false", "no", "off")
+neardup_index: Optional[NearDupIndex] = None
+if NEARDUP_MODE in ("suppress", "annotate"):
+    neardup_index = NearDupIndex(
+        window=NEARDUP_WINDOW,
+        threshold=NEARDUP_THRESHOLD,
+        max_entries=NEARDUP_MAX,
+        by_sender=NEARDUP_BY_SENDER,
+    )
 
 # ===== ADMIN NOTIFY DEDUPE =====
 _admin_last_notify: Dict[str, float] = {}
 ADMIN_NOTIFY_TTL = 120  # 2 min
 
+# ===== METRICS (Prometheus, faqat lokal) =====
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108") or "0")  # 0 -> o'chiq
+
+M_TG_TO_HANDLER = REGISTRY.histogram(
+    "userbot_telegram_to_handler_seconds", "Telegram message.date -> handler kirishi", ("account",))
+M_HANDLER_TO_ENQUEUE = REGISTRY.histogram(
+    "userbot_handler_to_enqueue_seconds", "Handler kirishi -> send_queue ga qo'yilishi", ("account",))
+M_QUEUE_WAIT = REGISTRY.histogram(
+    "userbot_queue_wait_seconds", "send_queue: enqueue -> dequeue", ("account",))
+M_SEND_LATENCY = REGISTRY.histogram(
+    "userbot_sendmessage_seconds", "Bot API sendMessage javob vaqti", ("bot",))
+M_MATCHES = REGISTRY.counter("userbot_matches_total", "Kalit so'z topilgan xabarlar", ("account",))
+# account: qaysi akkaunt topgan xabar (digest -> "digest")
+M_BOT_429 = REGISTRY.counter("userbot_bot_429_total", "Bot API 429 javoblari", ("bot", "account"))
+M_SEND_RETRIES = REGISTRY.counter("userbot_send_retries_total", "sendMessage qayta urinishlari", ("bot", "account"))
+M_DROPS = REGISTRY.counter("userbot_drops_total", "Yuborilmagan xabarlar", ("account", "reason"))
+
 
 # ===================== HELPERS =====================
 def normalize_chat_id(chat_id: int) -> int:
@@ -86,20 +331,37 @@ def uniq_keep_order(items):
     return out
 
 
-def init_supabase() -> bool:
-    global supabase
+def init_repository() -> bool:
+    global repo, hit_sink, hit_rollup
     try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-        print("✅ Supabase ulandi")
+        repo = create_repository(
+            DATA_BACKEND,
+            SUPABASE_URL,
+            SUPABASE_KEY,
+            seed_file=MEMORY_SEED_FILE,
+            max_workers=DB_MAX_WORKERS,
+            timeout=DB_TIMEOUT,
+        )
+        hit_sink = HitSink(
+            repo,
+            max_rows=HIT_FLUSH_ROWS,
+            flush_interval=HIT_FLUSH_INTERVAL,
+            max_buffer=HIT_BUFFER_MAX,
+            spill_path=os.path.join(
+                SPOOL_DIR, "keyword_hits.jsonl" if SHARD_ID is None else f"keyword_hits.shard{SHARD_ID}.jsonl"),
+        )
+        if ROLLUP_ENABLED:
+            hit_rollup = HitRollup(repo, flush_interval=ROLLUP_FLUSH_INTERVAL, max_keys=ROLLUP_MAX_KEYS)
+        print(f"✅ Baza ulandi ({repo.name})")
         return True
     except Exception as e:
-        print(f"❌ Supabase ulanishda xato: {e}")
+        print(f"❌ Bazaga ulanishda xato: {e}")
         return False
 
 
 async def notify_admin_once(key: str, text: str):
-    global aiohttp_session, _admin_last_notify
-    if not BOT_TOKEN or not ADMIN_ID or not aiohttp_session:
+    global _admin_last_notify
+    if not BOT_TOKEN or not ADMIN_ID or not bot_transport:
         return
 
     now = time.time()
@@ -108,11 +370,10 @@ async def notify_admin_once(key: str, text: str):
         return
     _admin_last_notify[key] = now
 
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
     payload = {"chat_id": ADMIN_ID, "text": text}
     try:
-        async with aiohttp_session.post(url, json=payload, timeout=20) as resp:
-            await resp.text()
+        # Circuit ochiq bo'lsa darhol CircuitOpen - admin xabari uchun kutmaymiz
+        await bot_transport.request(BOT_TOKEN, "sendMessage", payload)
     except Exception:
         pass
 
@@ -187,6 +448,56 @@ def extract_text_and_urls(message: Message):
     return cleaned, urls
 
 
+# URL_RE topa oladigan narsa bo'lishi mumkinligi (normalize_text'dan keyingi matnda)
+_LINK_MARKERS = ("://", "t.me/", "telegram.me/")
+
+
+def _may_have_link(norm_text: str) -> bool:
+    for m in _LINK_MARKERS:
+        if m in norm_text:
+            return True
+    return False
+
+
+def match_message(message: Message, snap: KeywordSnapshot, first_only: bool = False):
+    """
+    Ikki bosqichli qidiruv. Arzon bosqich: xom matn normalize_text + bitta avtomat o'tishi.
+    Link bo'lmasa va kalit so'z yo'q bo'lsa shu yerda to'xtaydi. Aks holda
+    extract_text_and_urls/strip_links va tozalangan matnda yakuniy qidiruv
+    (link ichidagi so'z hisobga olinmaydi, link olib tashlanib birlashgan so'zlar esa topiladi).
+    None -> mos emas, aks holda (cleaned_text, urls, matched_keywords).
+    """
+    raw = message.text or message.caption
+    if not raw:
+        return None
+
+    norm = normalize_text(raw)
+    linked = _may_have_link(norm)
+    if not linked and snap.matcher.first(norm) is None:
+        return None
+
+    cleaned_text, urls = extract_text_and_urls(message)
+    if not cleaned_text:
+        return None
+
+    # Link yo'q -> strip_links faqat bo'shliqlarni siqadi, normalize_text buni baribir qiladi
+    match_text = normalize_text(cleaned_text) if linked else norm
+    matched_keywords = snap.matcher.matched_keywords(match_text, first_only=first_only)
+    if not matched_keywords:
+        return None
+    return cleaned_text, urls, matched_keywords
+
+
+def render_forward_text(group_name: str, sender_html: str, cleaned_text: str, message_link: str) -> str:
+    return (
+        f"🔔 <b>Yangi buyurtma</b>\n"
+        f"📍 Guruh: <b>{html.escape(group_name)}</b>\n"
+        f"👤 Kimdan: {sender_html}\n\n"
+        f"{html.escape(cleaned_text)}\n\n"
+        f"🔗 {message_link}"
+    )
+
+
 # ===================== TELEGRAM LINKS =====================
 def get_message_link(message: Message) -> str:
     chat = message.chat
@@ -204,6 +515,13 @@ def get_chat_link(message: Message) -> str:
     return get_message_link(message)
 
 
+def get_sender_id(message: Message) -> int:
+    if message.from_user:
+        return message.from_user.id
+    sc = getattr(message, "sender_chat", None)
+    return sc.id if sc else 0
+
+
 def build_sender_anchor(message: Message) -> str:
     if message.from_user:
         u = message.from_user
@@ -233,15 +551,98 @@ def build_sender_anchor(message: Message) -> str:
 
 
 # ===================== SEND TO DRIVERS GROUP =====================
+async def _post_to_drivers_group(payload: dict, phone: str = "") -> bool:
+    sched = send_scheduler
+    try:
+        attempt = 0
+        while attempt < sched.max_attempts:
+            try:
+                # Circuit ochiq bo'lsa rate token olinmaydi (tarmoqqa chiqmaydigan so'rov uni yemasin)
+                bot_transport.check("sendMessage")
+                # Token bo'lmaguncha yubormaymiz -> 429 oldindan oldi olinadi
+                tok = await sched.acquire(DRIVERS_GROUP_ID)
+                t0 = time.perf_counter()
+                resp = await bot_transport.request(tok.token, "sendMessage", payload)
+            except CircuitOpen as e:
+                # api.telegram.org yetib bo'lmaydi: urinish sarflanmaydi, xabar dead-letter'ga
+                # tushmaydi - probe o'tguncha kutamiz (navbat to'lsa admission/digest ishlaydi)
+                await asyncio.sleep(e.retry_in)
+                continue
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                sched.on_error(tok, str(e) or type(e).__name__)
+                attempt += 1
+                if not await _retry_allowed(tok, attempt, phone):
+                    return False
+                continue
+
+            attempt += 1
+            M_SEND_LATENCY.observe(time.perf_counter() - t0, tok.label)
+            if resp.ok:
+                sched.on_success(tok)
+                return True
+
+            if resp.status == 429:
+                retry_after = resp.retry_after or 3
+                sched.on_429(tok, DRIVERS_GROUP_ID, retry_after + 1)
+                sched.on_retry(f"429 retry_after={retry_after}")
+                M_BOT_429.inc(tok.label, phone)
+                M_SEND_RETRIES.inc(tok.label, phone)
+                continue
+
+            if resp.status in (401, 403):
+                # 401 token yaroqsiz -> butunlay; 403 (bot guruhdan chiqarilgan va h.k.) -> cooldown
+                # va getMe probe. Boshqa bot bilan urinamiz
+                sched.disable(tok, f"{resp.status}: {resp.description}", permanent=resp.status == 401)
+                sched.on_retry(f"{tok.label} {resp.status}")
+                M_SEND_RETRIES.inc(tok.label, phone)
+                continue
+
+            sched.on_error(tok, f"{resp.status}: {resp.description}")
+            if resp.status >= 500 and await _retry_allowed(tok, attempt, phone):
+                continue
+            print(f"❌ Xabar yuborishda xato ({tok.label}, {resp.status}): {resp.description}")
+            return False
+
+        sched.last_error = f"{sched.max_attempts} urinishdan keyin ham yuborilmadi"
+        return False
+    except Exception as e:
+        sched.last_error = str(e)
+        print(f"❌ Xabar yuborishda xato: {e}")
+        return False
+
+
+async def probe_bot_token(tok) -> bool:
+    """Cooldown tugagan token: getMe javob bersa rotatsiyaga qaytadi."""
+    if not bot_transport:
+        return True
+    try:
+        resp = await bot_transport.request(tok.token, "getMe")
+    except Exception:
+        return False
+    return resp.ok
+
+
+async def _retry_allowed(tok, attempt: int, phone: str) -> bool:
+    """Tarmoq xatosi / 5xx: retry budget tugagan bo'lsa xabar dead-letter'ga."""
+    sched = send_scheduler
+    if attempt >= sched.max_attempts:
+        return False
+    if not bot_transport.retry_budget.can_retry():
+        sched.last_error = f"retry budget tugadi ({sched.last_error})"
+        return False
+    sched.on_retry()
+    M_SEND_RETRIES.inc(tok.label, phone)
+    await asyncio.sleep(min(2 ** (attempt - 1), 30))
+    return True
+
+
 async def send_to_drivers_group(
     text: str,
     group_link: str,
     message_link: str,
     extra_urls: Optional[List[str]] = None,
-    session: Optional[aiohttp.ClientSession] = None
+    phone: str = "",
 ) -> bool:
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-
     keyboard = [[
         {"text": "👥 Guruhga o'tish", "url": group_link},
         {"text": "🔗 Xabarga o'tish", "url": message_link},
@@ -258,62 +659,195 @@ async def send_to_drivers_group(
         "disable_web_page_preview": True,
         "reply_markup": {"inline_keyboard": keyboard},
     }
+    return await _post_to_drivers_group(payload, phone)
 
-    own_session = False
-    if session is None:
-        session = aiohttp.ClientSession()
-        own_session = True
 
-    try:
-        for attempt in range(8):
-            async with session.post(url, json=payload, timeout=30) as resp:
-                if resp.status == 200:
-                    return True
-
-                if resp.status == 429:
-                    retry_after = 3
-                    try:
-                        j = await resp.json()
-                        retry_after = int(j.get("parameters", {}).get("retry_after", retry_after))
-                    except Exception:
-                        pass
-                    await asyncio.sleep(retry_after + 1)
-                    continue
+async def send_digest_to_drivers_group(text: str, keyboard: list) -> bool:
+    payload = {
+        "chat_id": DRIVERS_GROUP_ID,
+        "text": text,
+        "parse_mode": "HTML",
+        "disable_web_page_preview": True,
+        "reply_markup": {"inline_keyboard": keyboard},
+    }
+    return await _post_to_drivers_group(payload, "digest")
+
+
+async def _deliver(batch: List[OutItem]):
+    if len(batch) == 1:
+        item = batch[0]
+        ok = await send_to_drivers_group(
+            annotate_reposts(item),
+            group_link=item.group_link,
+            message_link=item.message_link,
+            extra_urls=item.urls,
+            phone=item.phone,
+        )
+        if ok:
+            send_queue.ack(item)
+        else:
+            # Tashlab yuborilmaydi: /redrive bilan qayta navbatga qo'yish mumkin
+            reason = send_scheduler.last_error or "unknown"
+            send_scheduler.add_dead_letter(item, reason)
+            send_queue.bury(item, reason)
+            M_DROPS.inc(item.phone, "dead_letter")
+        return
 
-                body = await resp.text()
-                print(f"❌ Xabar yuborishda xato ({resp.status}): {body}")
-                return False
-    except Exception as e:
-        print(f"❌ Xabar yuborishda xato: {e}")
-        return False
-    finally:
-        if own_session:
-            await session.close()
+    for text, keyboard, items in build_digests(batch, max_items=digest_controller.max_items):
+        ok = await send_digest_to_drivers_group(text, keyboard)
+        if ok:
+            digest_controller.digests_sent += 1
+            digest_controller.items_digested += len(items)
+            for item in items:
+                send_queue.ack(item)
+        else:
+            reason = send_scheduler.last_error or "unknown"
+            for item in items:
+                send_scheduler.add_dead_letter(item, reason)
+                send_queue.bury(item, reason)
+                M_DROPS.inc(item.phone, "dead_letter")
+
+
+def annotate_reposts(item: OutItem) -> str:
+    """Navbatda turgan paytda shu buyurtma boshqa guruhlarda ham ko'rilgan bo'lsa - izoh."""
+    if NEARDUP_MODE != "annotate" or neardup_index is None or not item.dup_key:
+        return item.text
+    n = neardup_index.also_posted(item.dup_key)
+    if not n:
+        return item.text
+    note = f"\n🔁 Yana {n} ta guruhda ham joylangan"
+    text = item.text
+    body = item.body
+    # Izoh 4096 limitdan oshirmasin: HTML buzilmasligi uchun tana qisqartirilib qayta yig'iladi
+    while len(text) + len(note) > TELEGRAM_TEXT_LIMIT:
+        over = len(text) + len(note) - TELEGRAM_TEXT_LIMIT
+        if not body or over >= len(body):
+            return item.text
+        body = body[:len(body) - over - 1].rstrip()
+        text = render_forward_text(item.group_name, item.sender_html, body + "…", item.message_link)
+    return text + note
+
+
+def evict_queued(item: OutItem) -> bool:
+    """Admission tashlagan (drop_oldest / drop_lowest) xabar navbatdan o'chadi."""
+    M_DROPS.inc(item.phone, "evicted")
+    return send_queue.discard(item)
+
+
+def _take(item: OutItem):
+    if item.enqueued_at:
+        M_QUEUE_WAIT.observe(max(0.0, time.time() - item.enqueued_at), item.phone)
+    admission.take(item)
 
 
-# ===== DEDUPE O'CHIRILDI: endi keyword bo'lsa, doim yuboradi =====
 async def send_worker(worker_id: int):
-    global aiohttp_session
     while True:
-        item = await send_queue.get()
+        batch = [await send_queue.get()]
+        _take(batch[0])
         try:
-            _, forward_text, group_link, message_link, urls = item
-
-            await send_to_drivers_group(
-                forward_text,
-                group_link=group_link,
-                message_link=message_link,
-                extra_urls=urls,
-                session=aiohttp_session
-            )
+            # Backlog bo'lsa navbatdagilarni bitta digestga yig'amiz
+            if digest_controller.update(send_queue.qsize(), oldest_latency(batch[0])):
+                while len(batch) < digest_controller.max_items:
+                    try:
+                        it = send_queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        break
+                    _take(it)
+                    batch.append(it)
+
+            await _deliver(batch)
 
         except Exception as e:
             print(f"⚠️ send_worker[{worker_id}] xato: {e}")
+            for it in batch:
+                M_DROPS.inc(it.phone, "worker_error")
         finally:
-            send_queue.task_done()
+            for it in batch:
+                admission.release(it)
+                send_queue.task_done()
+
+
+# ===================== METRICS (scrape paytida) =====================
+def register_runtime_metrics():
+    REGISTRY.callback(
+        "userbot_send_queue_depth", "send_queue dagi xabarlar", "gauge",
+        lambda: [((), send_queue.qsize())])
+    REGISTRY.callback(
+        "userbot_inflight", "Admission byudjetidagi (navbat + yuborilayotgan) xabarlar", "gauge",
+        lambda: [((), admission.inflight)])
+    REGISTRY.callback(
+        "userbot_asyncio_tasks", "Event loop'dagi tasklar soni", "gauge",
+        lambda: [((), len(asyncio.all_tasks()))])
+    REGISTRY.callback(
+        "userbot_supabase_errors_total", "Baza so'rovlari xatolari (timeout bilan)", "counter",
+        lambda: list(((a,), n) for a, n in repo.errors_by_account.items()) if repo else [],
+        ("account",))
+    REGISTRY.callback(
+        "userbot_keyword_hits_pending", "Bazaga yozilmagan keyword_hits qatorlari", "gauge",
+        lambda: [((), hit_sink.pending)] if hit_sink else [])
+    REGISTRY.callback(
+        "userbot_hit_rollup_pending_keys", "Yozilmagan rollup bucketlari", "gauge",
+        lambda: [((), hit_rollup.pending)] if hit_rollup else [])
+    REGISTRY.callback(
+        "userbot_keyword_hits_raw_skipped_total", "Siyosat bo'yicha yozilmagan xom keyword_hits", "counter",
+        lambda: [((), raw_hits.skipped)])
+    REGISTRY.callback(
+        "userbot_neardup_index_size", "Near-duplicate oynasidagi buyurtmalar", "gauge",
+        lambda: [((), len(neardup_index))] if neardup_index is not None else [])
+    REGISTRY.callback(
+        "userbot_keywords_age_seconds", "Kalit so'zlar snapshotining yoshi", "gauge",
+        lambda: [((), keywords_age())] if keywords_snapshot.loaded_at else [])
+    REGISTRY.callback(
+        "userbot_bot_http_connections_total", "Bot API ulanishlari: yangi / qayta ishlatilgan", "counter",
+        lambda: [((pool, kind), p[kind]) for pool, p in bot_transport.stats()["pools"].items()
+                 for kind in ("created", "reused")] if bot_transport else [],
+        ("pool", "kind"))
+    REGISTRY.callback(
+        "userbot_bot_circuit_open", "Bot API circuit breaker ochiq (fail-fast)", "gauge",
+        lambda: [((pool,), int(b.state != "closed")) for pool, b in bot_transport.breakers.items()]
+        if bot_transport else [],
+        ("pool",))
+    REGISTRY.callback(
+        "userbot_bot_retry_budget_denied_total", "Retry budget tugagani uchun qilinmagan qayta urinishlar", "counter",
+        lambda: [((), bot_transport.retry_budget.denied)] if bot_transport else [])
+    REGISTRY.callback(
+        "userbot_dead_letters", "Dead-letter ro'yxatidagi xabarlar", "gauge",
+        lambda: [((), len(send_scheduler.dead_letters))])
+    REGISTRY.callback(
+        "userbot_filtered_updates_total", "Handlerdan oldin rad etilgan xabarlar (guruh bo'yicha)", "counter",
+        lambda: [((str(c),), n) for c, n in chat_gate.filtered_by_chat.items()],
+        ("chat_id",))
+    REGISTRY.callback(
+        "userbot_filtered_updates_by_reason_total", "Rad etilgan xabarlar (sabab bo'yicha)", "counter",
+        lambda: [((r,), n) for r, n in chat_gate.filtered_by_reason.items()],
+        ("reason",))
+    REGISTRY.callback(
+        "userbot_time_to_first_message_seconds", "Jarayon boshidan akkauntning birinchi xabarigacha", "gauge",
+        lambda: [((p,), t) for p, t in startup.first_message_at.items()],
+        ("account",))
+    REGISTRY.callback(
+        "userbot_account_up", "Akkaunt hozir ulangan (1) yoki yo'q (0)", "gauge",
+        lambda: [((p,), 1 if st.state == "running" else 0) for p, st in account_supervisor.accounts.items()],
+        ("account",))
+    REGISTRY.callback(
+        "userbot_account_uptime_seconds", "Akkauntning jami ulangan vaqti", "counter",
+        lambda: [((p,), st.uptime()) for p, st in account_supervisor.accounts.items()],
+        ("account",))
+    REGISTRY.callback(
+        "userbot_account_restarts_total", "Supervisor qayta ishga tushirishlari", "counter",
+        lambda: [((p,), st.restarts) for p, st in account_supervisor.accounts.items()],
+        ("account",))
+    REGISTRY.callback(
+        "userbot_groups_active", "Akkaunt kuzatayotgan guruhlar", "gauge",
+        lambda: [((p,), st.get("active_count", 0)) for p, st in account_stats.items()],
+        ("account",))
 
 
 # ===================== STATISTICS =====================
+def _fmt_secs(v: Optional[float]) -> str:
+    return "—" if v is None else f"{v:.1f}s"
+
+
 def print_statistics():
     global account_stats, watched_groups_cache, ALL_PHONES
 
@@ -329,6 +863,8 @@ def print_statistics():
     print(f"\n📱 AKKAUNTLAR ({len(phones_list)} ta):")
     print("-" * 40)
 
+    startup_stats = startup.stats()
+    sup_stats = account_supervisor.stats()
     for phone in phones_list:
         stats = account_stats.get(phone, {})
         total = int(stats.get("groups_count", 0) or 0)
@@ -336,82 +872,258 @@ def print_statistics():
         total_groups_all += total
         total_active_all += active
         print(f"  {phone}: {total} guruh, {active} ta faol kuzatilmoqda")
+        sv = sup_stats.get(phone)
+        if sv:
+            nxt = f", qayta ulanish {int(sv['next_restart_in'])}s dan keyin" if sv["next_restart_in"] is not None else ""
+            print(
+                f"      {sv['state']}: uptime {int(sv['uptime_s'])}s ({sv['coverage'] * 100:.1f}%), "
+                f"restart {sv['restarts']}, storm {sv['storms']}{nxt}"
+            )
+        st = startup_stats.get(phone)
+        if st:
+            print(
+                f"      start: ulandi {_fmt_secs(st['connected_s'])}, birinchi xabar {_fmt_secs(st['first_message_s'])}, "
+                f"guruhlar {_fmt_secs(st['groups_ready_s'])} ({st['groups_source'] or '—'})"
+            )
+        last = (stats.get("last_sync") or {}).get("account_groups")
+        if last:
+            print(
+                f"      oxirgi sync: +{last['inserted']} -{last['removed']} "
+                f"={last['unchanged']} xato {last['failed']}"
+            )
 
     print("-" * 40)
     print(f"  JAMI: {total_groups_all} guruh, {total_active_all} ta faol kuzatilmoqda")
-    print(f"\n🚫 Bloklangan: Faqat DRIVERS_GROUP_ID ({DRIVERS_GROUP_ID})")
+    cg = chat_gate.stats()
+    print(
+        f"\n🚫 Filtr ({cg['mode']}): bloklangan {cg['blocked']} ta guruh, o'tdi {cg['passed']}, "
+        f"rad etildi {cg['filtered']} {cg['filtered_by_reason'] or ''}"
+    )
+    if cg["filtered_by_chat"]:
+        print("   eng ko'p rad etilgan: " + ", ".join(f"{k}={v}" for k, v in cg["filtered_by_chat"]))
     print(f"💾 Keshda: {len(watched_groups_cache)} ta guruh")
+    kw_age = keywords_age()
+    kw_age_s = "yuklanmagan" if kw_age == float("inf") else f"{int(kw_age)}s"
+    print(f"🔑 Kalit so'zlar: {len(keywords_snapshot.keywords)} ta (v{keywords_snapshot.version}, yoshi {kw_age_s})")
+    if keywords_last_error:
+        print(f"⚠️ Oxirgi yangilash xatosi: {keywords_last_error}")
+    if config_sync:
+        print("🔁 Config sync: " + ", ".join(
+            f"{t} {f['mode']} (delta {f['rows_applied']}, to'liq {f['full_loads']}, xato {f['errors']})"
+            for t, f in config_sync.stats().items()
+        ))
+    if dedupe_store is not None:
+        ds = dedupe_store.stats()
+        print(
+            f"🧬 Dedupe: {ds['hits']} ta takror to'xtatildi / {ds['hits'] + ds['misses']} "
+            f"({ds['hit_rate'] * 100:.1f}%), keshda {ds['size']}"
+        )
+    if neardup_index is not None:
+        nd = neardup_index.stats()
+        print(
+            f"🔁 Near-dup ({NEARDUP_MODE}): {nd['reposts']} ta takror / {nd['checks']} tekshiruv, "
+            f"oynada {nd['size']}, qisqa {nd['skipped_short']}"
+        )
+    ss = send_scheduler.stats()
+    print(
+        f"📤 Yuborildi: {ss['sent']}, 429: {ss['rate_limited']}, retry: {ss['retries']}, "
+        f"dead-letter: {ss['dead_letters']}, navbatda: {send_queue.qsize()}"
+    )
+    if bot_transport:
+        bt = bot_transport.stats()
+        sp = bt["pools"]["send"]
+        br = bt["breakers"]["send"]
+        sm = bt["endpoints"].get("sendMessage")
+        print(
+            f"🌐 Bot API: circuit {br['state']} (ochildi {br['opens']}, rad {br['rejected']}), "
+            f"poll circuit {bt['breakers']['poll']['state']}, ulanishlar yangi {sp['created']} / qayta "
+            f"{sp['reused']} ({sp['reuse_ratio'] * 100:.0f}%), retry budget rad {bt['retries_denied']}"
+            + (f", sendMessage p50 {sm['p50_s'] * 1000:.0f}ms p99 {sm['p99_s'] * 1000:.0f}ms"
+               if sm and sm["p50_s"] is not None else "")
+        )
+    ad = admission.stats()
+    print(
+        f"🚦 Admission ({ad['policy']}): in-flight {ad['inflight']}/{ad['budget']}, "
+        f"tashlandi {ad['shed']} (navbatdan {ad['evicted']}), kutdi {ad['delayed']}"
+    )
+    for title, rows in (
+        ("tashlangan, guruh", ad["shed_by_group"]),
+        ("tashlangan, akkaunt", ad["shed_by_account"]),
+        ("kutgan, guruh", ad["delayed_by_group"]),
+        ("kutgan, akkaunt", ad["delayed_by_account"]),
+    ):
+        if rows:
+            print(f"   eng ko'p {title}: " + ", ".join(f"{k}={v}" for k, v in rows))
+    if len(ss["tokens"]) > 1 or any(t["disabled"] for t in ss["tokens"]):
+        for t in ss["tokens"]:
+            state = f"⛔️ {t['disabled']}" if t["disabled"] else "✅"
+            print(
+                f"   {t['label']}: {t['sent']} ta ({t['per_min']}/min), 429: {t['rate_limited']}, "
+                f"xato: {t['errors']} {state}"
+            )
+    dg = digest_controller.stats()
+    if dg["digests_sent"] or dg["active"]:
+        print(
+            f"📦 Digest: {'yoqilgan' if dg['active'] else 'o‘chiq'}, {dg['digests_sent']} ta digestda "
+            f"{dg['items_digested']} ta hit"
+        )
+    if shard_hub:
+        sh = shard_hub.stats()
+        print(
+            f"🧩 Shardlar: ulangan {sh['connected']}, akkauntlar {sh['running']}, "
+            f"hitlar {sh['items_received']} {sh['items_by_shard']}, qayta ishga tushgan {shard_pool.stats()['restarts']}"
+        )
+    if shard_link:
+        sl = shard_link.stats()
+        print(
+            f"🧩 Shard {sl['shard']}: IPC {'✅' if sl['connected'] else '❌'}, yuborildi {sl['sent']}, "
+            f"bufer {sl['buffered']}, tashlandi {sl['buffered_dropped']}"
+        )
+    if hit_sink:
+        hs = hit_sink.stats()
+        print(
+            f"🧾 keyword_hits: yozildi {hs['written']}, kutmoqda {hs['pending']}, "
+            f"diskda {hs['spilled_pending']}, tashlandi {hs['dropped']}"
+            + (f", xom qator tashlab ketildi {raw_hits.skipped} ({raw_hits.mode})" if raw_hits.skipped else "")
+        )
+    if hit_rollup:
+        hr = hit_rollup.stats()
+        print(
+            f"📈 Rollup: {hr['hits']} hit -> {hr['rows_written']} qator yozildi, kutmoqda {hr['pending_keys']} kalit, "
+            f"xato {hr['flush_errors']}, tashlandi {hr['dropped']}"
+        )
     print("=" * 60 + "\n")
 
 
-# ===================== SUPABASE CACHE LOAD =====================
-async def load_groups_cache():
-    global watched_groups_cache, account_groups_cache, groups_cache_loaded, supabase
+# ===================== CONFIG SYNC =====================
+def _on_watched_groups_full(rows: List[dict]):
+    global watched_groups_cache
+    watched_groups_cache = {row["group_id"] for row in rows if row.get("group_id") is not None}
+    chat_gate.load(rows)
+    print(f"✅ Kesh yuklandi: {len(watched_groups_cache)} ta guruh bazada mavjud")
 
-    if groups_cache_loaded or not supabase:
-        return
 
-    try:
-        result = supabase.table("watched_groups").select("group_id").execute()
-        watched_groups_cache = {row["group_id"] for row in (result.data or [])}
-        print(f"✅ Kesh yuklandi: {len(watched_groups_cache)} ta guruh bazada mavjud")
-
-        acc_result = supabase.table("account_groups").select("phone_number, group_id").execute()
-        for row in (acc_result.data or []):
-            phone = row.get("phone_number")
-            gid = row.get("group_id")
-            if phone and gid:
-                account_groups_cache.setdefault(phone, set()).add(gid)
-
-        groups_cache_loaded = True
-    except Exception as e:
-        print(f"⚠️ Kesh yuklashda xato: {e}")
+def _on_watched_groups_change(rows: List[dict], deleted: List[dict]):
+    gone = [row["group_id"] for row in deleted if row.get("group_id") is not None]
+    watched_groups_cache.update(row["group_id"] for row in rows if row.get("group_id") is not None)
+    watched_groups_cache.difference_update(gone)
+    chat_gate.apply(rows, gone)
 
 
-# ===================== SUPABASE PHONES =====================
-def fetch_phone_numbers_from_db() -> list:
-    global supabase
-    if not supabase:
-        return []
+def _on_account_groups_full(rows: List[dict]):
+    global account_groups_cache, groups_cache_loaded
+    fresh: Dict[str, set] = {}
+    for row in rows:
+        phone = row.get("phone_number")
+        gid = row.get("group_id")
+        if phone and gid:
+            fresh.setdefault(phone, set()).add(gid)
+    account_groups_cache = fresh
+    groups_cache_loaded = True
 
-    try:
-        res = supabase.table("userbot_accounts").select("phone_number,status").execute()
-        phones = []
-        for row in (res.data or []):
-            status = (row.get("status") or "").lower()
-            phone = _normalize_phone(row.get("phone_number"))
-            if not phone:
-                continue
 
-            # faqat ishlatiladiganlar
-            if status in ["pending", "active", "connecting"]:
-                phones.append(phone)
+def _on_account_groups_change(rows: List[dict], deleted: List[dict]):
+    for row in rows:
+        if row.get("phone_number") and row.get("group_id"):
+            account_groups_cache.setdefault(row["phone_number"], set()).add(row["group_id"])
+    for row in deleted:
+        account_groups_cache.get(row.get("phone_number"), set()).discard(row.get("group_id"))
+
+
+def _rebuild_keywords():
+    global keywords_snapshot, keywords_last_error
+    snap = build_snapshot(list(keyword_rows.values()), keywords_snapshot.version + 1)
+    # Bitta havola almashadi -> handler eski yoki yangi snapshotni to'liq ko'radi
+    keywords_snapshot = snap
+    keywords_last_error = None
+    print(f"✅ Kalit so'zlar yangilandi: {len(snap.keywords)} ta kanonik, {len(keyword_rows)} qatordan (v{snap.version})")
+
+
+def _on_keywords_full(rows: List[dict]):
+    global keyword_rows
+    keyword_rows = {row.get("id"): row for row in rows}
+    _rebuild_keywords()
+
+
+def _on_keywords_change(rows: List[dict], deleted: List[dict]):
+    for row in rows:
+        keyword_rows[row.get("id")] = row
+    for row in deleted:
+        keyword_rows.pop(row.get("id"), None)
+    _rebuild_keywords()
+
+
+def _on_keywords_error(e: Exception):
+    global keywords_last_error
+    keywords_last_error = str(e)
+    age = keywords_snapshot.age()
+    age_s = "hech qachon" if age == float("inf") else f"{int(age)}s oldin"
+    print(f"❌ Kalit so'zlar yangilashda xato: {e} (oxirgi muvaffaqiyatli: {age_s})")
+
+
+def _on_accounts_full(rows: List[dict]):
+    account_rows.clear()
+    _on_accounts_change(rows, [])
+
+
+def _on_accounts_change(rows: List[dict], deleted: List[dict]):
+    for row in rows:
+        phone = _normalize_phone(row.get("phone_number"))
+        if phone:
+            account_rows[phone] = (row.get("status") or "").lower()
+    for row in deleted:
+        account_rows.pop(_normalize_phone(row.get("phone_number")), None)
+    accounts_changed.set()
+    if shard_hub:
+        shard_hub.changed.set()
 
-        return uniq_keep_order(phones)
-    except Exception as e:
-        print(f"⚠️ Bazadan raqamlarni olishda xato: {e}")
-        return []
 
+def active_phones() -> list:
+    # faqat ishlatiladiganlar
+    return [p for p, status in account_rows.items() if status in ACTIVE_STATUSES]
 
+
+async def start_config_sync(accounts: bool = True):
+    """Boshlang'ich to'liq yuklash + fon sikli. Shard jarayonlarga akkauntlar jadvali kerak emas."""
+    global config_sync
+    if not repo:
+        return
+    config_sync = ConfigSync(repo, CONFIG_POLL_INTERVAL, CONFIG_FULL_RESYNC)
+    config_sync.watch(
+        "keywords", "id, keyword, updated_at", ["id"],
+        _on_keywords_full, _on_keywords_change, CACHE_TTL, _on_keywords_error)
+    config_sync.watch(
+        "watched_groups", "group_id, is_blocked, updated_at", ["group_id"],
+        _on_watched_groups_full, _on_watched_groups_change, GROUP_FILTER_REFRESH)
+    config_sync.watch(
+        "account_groups", "phone_number, group_id, updated_at", ["phone_number", "group_id"],
+        _on_account_groups_full, _on_account_groups_change, CONFIG_FULL_RESYNC)
+    if accounts:
+        config_sync.watch(
+            "userbot_accounts", "phone_number, status, updated_at", ["phone_number"],
+            _on_accounts_full, _on_accounts_change, 30)
+    await config_sync.start()
+
+
+# ===================== SUPABASE PHONES =====================
 async def ensure_accounts_seeded_from_env():
-    global supabase
-    if not supabase or not PHONE_NUMBERS_ENV_FALLBACK:
+    if not repo or not PHONE_NUMBERS_ENV_FALLBACK:
         return
 
     try:
-        existing = supabase.table("userbot_accounts").select("phone_number").execute()
-        existing_phones = {_normalize_phone(row.get("phone_number", "")) for row in (existing.data or [])}
+        existing = await repo.fetch_accounts("phone_number")
+        existing_phones = {_normalize_phone(row.get("phone_number", "")) for row in existing}
 
         for phone in PHONE_NUMBERS_ENV_FALLBACK:
             phone = _normalize_phone(phone)
             if not phone or phone in existing_phones:
                 continue
             try:
-                supabase.table("userbot_accounts").insert({
+                await repo.insert_account({
                     "phone_number": phone,
                     "status": "pending",
                     "two_fa_required": False,
-                }).execute()
+                })
                 print(f"✅ Yangi raqam qo'shildi: {phone}")
             except Exception as e:
                 if "duplicate" not in str(e).lower():
@@ -420,96 +1132,129 @@ async def ensure_accounts_seeded_from_env():
         print(f"⚠️ .env seed'da xato: {e}")
 
 
-def update_account_status(phone: str, status: str):
-    global supabase
-    if not supabase:
+def utc_now_iso() -> str:
+    # updated_at aniq yoziladi: trigger bo'lmagan bazada ham config sync kursori o'zgarishni ko'radi
+    return datetime.now(timezone.utc).isoformat()
+
+
+async def update_account_status(phone: str, status: str):
+    if not repo:
         return
     try:
-        supabase.table("userbot_accounts").update(
-            {"status": status, "updated_at": "now()"}
-        ).eq("phone_number", phone).execute()
+        await repo.update_account(phone, {"status": status, "updated_at": utc_now_iso()})
         print(f"📊 Status yangilandi: {phone} -> {status}")
     except Exception as e:
         print(f"⚠️ Status yangilashda xato: {e}")
 
 
 # ===================== GROUP SYNC =====================
-async def sync_account_groups(phone: str, groups: list):
-    global supabase, account_groups_cache
-    if not supabase:
-        return
+async def sync_account_groups(phone: str, groups: list, complete: bool = True) -> dict:
+    """
+    Dialoglardan topilgan guruhlarni kesh bilan solishtiradi:
+    yangilari bulk upsert, chiqib ketilganlari (faqat to'liq walk bo'lsa) o'chiriladi.
+    """
+    global account_groups_cache
+    counts = {"inserted": 0, "removed": 0, "unchanged": 0, "failed": 0}
+    if not repo:
+        return counts
+
+    current = {g["group_id"]: g for g in groups}
+    cached = account_groups_cache.setdefault(phone, set())
+
+    new_rows = [
+        {"phone_number": phone, "group_id": gid, "group_name": g["group_name"]}
+        for gid, g in current.items() if gid not in cached
+    ]
+    left_ids = [gid for gid in cached if gid not in current] if complete else []
+    counts["unchanged"] = len(current) - len(new_rows)
+
+    for chunk in chunked(new_rows, GROUP_SYNC_CHUNK):
+        try:
+            await repo.upsert_account_groups(chunk, chunk_size=GROUP_SYNC_CHUNK)
+            cached.update(r["group_id"] for r in chunk)
+            counts["inserted"] += len(chunk)
+        except Exception as e:
+            counts["failed"] += len(chunk)
+            print(f"⚠️ [{phone}] account_groups upsert xato ({len(chunk)} ta): {e}")
 
-    try:
-        existing_ids = account_groups_cache.get(phone, set())
-        new_groups = [g for g in groups if g["group_id"] not in existing_ids]
-        if not new_groups:
-            return
+    if left_ids:
+        try:
+            await repo.delete_account_groups(phone, left_ids)
+            cached.difference_update(left_ids)
+            counts["removed"] = len(left_ids)
+        except Exception as e:
+            counts["failed"] += len(left_ids)
+            print(f"⚠️ [{phone}] account_groups o'chirish xato ({len(left_ids)} ta): {e}")
 
-        for group in new_groups:
-            try:
-                supabase.table("account_groups").insert({
-                    "phone_number": phone,
-                    "group_id": group["group_id"],
-                    "group_name": group["group_name"],
-                }).execute()
-                account_groups_cache.setdefault(phone, set()).add(group["group_id"])
-            except Exception:
-                pass
+    if counts["inserted"] or counts["removed"] or counts["failed"]:
+        print(
+            f"📝 [{phone}] account_groups: +{counts['inserted']} -{counts['removed']} "
+            f"={counts['unchanged']} (xato {counts['failed']})"
+        )
+    return counts
 
-        print(f"📝 [{phone}] {len(new_groups)} ta yangi guruh qo'shildi")
-    except Exception as e:
-        print(f"⚠️ Guruhlarni saqlashda xato: {e}")
 
+async def sync_watched_groups(groups: list) -> dict:
+    global watched_groups_cache
+    counts = {"inserted": 0, "unchanged": 0, "failed": 0}
+    if not repo:
+        return counts
 
-async def sync_all_groups(client: Client, phone: str) -> list:
-    global supabase, account_stats, watched_groups_cache
+    new_rows = []
+    seen = set()
+    for g in groups:
+        gid = g["group_id"]
+        if gid in watched_groups_cache or gid in seen:
+            continue
+        seen.add(gid)
+        new_rows.append({
+            "group_id": gid,
+            "group_name": g["group_name"],
+            "is_blocked": normalize_chat_id(gid) == normalize_chat_id(DRIVERS_GROUP_ID),
+        })
+    counts["unchanged"] = len({g["group_id"] for g in groups}) - len(new_rows)
+
+    for chunk in chunked(new_rows, GROUP_SYNC_CHUNK):
+        try:
+            await repo.upsert_watched_groups(chunk, chunk_size=GROUP_SYNC_CHUNK)
+            watched_groups_cache.update(r["group_id"] for r in chunk)
+            chat_gate.allow(r["group_id"] for r in chunk if not r["is_blocked"])
+            counts["inserted"] += len(chunk)
+        except Exception as e:
+            counts["failed"] += len(chunk)
+            print(f"⚠️ watched_groups upsert xato ({len(chunk)} ta): {e}")
 
-    if not supabase:
-        return []
+    return counts
 
-    try:
-        groups_found = []
 
-        try:
-            async for dialog in client.get_dialogs():
-                chat = dialog.chat
-                if chat.type in [ChatType.GROUP, ChatType.SUPERGROUP]:
-                    groups_found.append({
-                        "group_id": chat.id,
-                        "group_name": chat.title or f"Guruh {chat.id}"
-                    })
-        except FloodWait as fw:
-            wait_s = int(getattr(fw, "value", 0) or 0)
-            await asyncio.sleep(wait_s + 1)
-            async for dialog in client.get_dialogs():
-                chat = dialog.chat
-                if chat.type in [ChatType.GROUP, ChatType.SUPERGROUP]:
-                    groups_found.append({
-                        "group_id": chat.id,
-                        "group_name": chat.title or f"Guruh {chat.id}"
-                    })
+def _update_group_stats(phone: str, groups: Dict[int, str], last_sync: Optional[dict] = None):
+    active = [gid for gid in groups if normalize_chat_id(gid) != normalize_chat_id(DRIVERS_GROUP_ID)]
+    stats = account_stats.setdefault(phone, {})
+    stats["groups_count"] = len(groups)
+    stats["active_count"] = len(active)
+    if last_sync is not None:
+        stats["last_sync"] = last_sync
 
-        await sync_account_groups(phone, groups_found)
 
-        new_groups = [g for g in groups_found if g["group_id"] not in watched_groups_cache]
-        for g in new_groups:
-            try:
-                is_blocked = normalize_chat_id(g["group_id"]) == normalize_chat_id(DRIVERS_GROUP_ID)
-                supabase.table("watched_groups").insert({
-                    "group_id": g["group_id"],
-                    "group_name": g["group_name"],
-                    "is_blocked": is_blocked
-                }).execute()
-                watched_groups_cache.add(g["group_id"])
-            except Exception:
-                pass
+async def sync_all_groups(client: Client, phone: str) -> list:
+    """To'liq dialog walk + bazaga diff. Oradagi o'zgarishlarni membership eventlar yuritadi."""
+    if not repo:
+        return []
+
+    try:
+        walker = dialog_walkers.get(phone)
+        if walker is None or walker.client is not client:
+            walker = dialog_walkers[phone] = DialogWalker(client, phone, page_size=DIALOG_PAGE_SIZE)
 
-        active_groups = [
-            g for g in groups_found
-            if normalize_chat_id(g["group_id"]) != normalize_chat_id(DRIVERS_GROUP_ID)
-        ]
+        groups = await walker.walk()
+        account_dialog_groups[phone] = groups
+        group_list_cache.save(phone, groups)
 
-        account_stats[phone] = {"groups_count": len(groups_found), "active_count": len(active_groups)}
+        groups_found = [{"group_id": gid, "group_name": name} for gid, name in groups.items()]
+        acc_counts = await sync_account_groups(phone, groups_found)
+        watched_counts = await sync_watched_groups(groups_found)
+
+        _update_group_stats(phone, groups, {"account_groups": acc_counts, "watched_groups": watched_counts})
         return groups_found
 
     except Exception as e:
@@ -517,44 +1262,109 @@ async def sync_all_groups(client: Client, phone: str) -> list:
         return []
 
 
-# ===================== KEYWORDS =====================
-async def refresh_keywords():
-    global keywords_cache, keywords_map, last_cache_update, supabase
-    if not supabase:
+async def apply_group_delta(phone: str, joined: Dict[int, str], left: List[int]):
+    """Join/leave/migrate eventlaridan kelgan o'zgarishni kesh va bazaga qo'llaydi."""
+    groups = account_dialog_groups.setdefault(phone, {})
+    joined = {gid: name for gid, name in joined.items() if groups.get(gid) != name}
+    left = [gid for gid in left if gid in groups or gid in account_groups_cache.get(phone, set())]
+    if not joined and not left:
         return
-    try:
-        result = supabase.table("keywords").select("id, keyword").execute()
-        keywords_cache = [k["keyword"].lower() for k in (result.data or []) if k.get("keyword")]
-        keywords_map = {k["keyword"].lower(): k["id"] for k in (result.data or []) if k.get("keyword")}
-        last_cache_update = time.time()
-        print(f"✅ Kalit so'zlar yangilandi: {len(keywords_cache)} ta")
-    except Exception as e:
-        print(f"❌ Kalit so'zlar yangilashda xato: {e}")
 
+    groups.update(joined)
+    for gid in left:
+        groups.pop(gid, None)
+    group_list_cache.save(phone, groups)
+
+    if joined:
+        rows = [{"group_id": gid, "group_name": name} for gid, name in joined.items()]
+        await sync_account_groups(phone, rows, complete=False)
+        await sync_watched_groups(rows)
+
+    if left and repo:
+        try:
+            await repo.delete_account_groups(phone, left)
+            account_groups_cache.get(phone, set()).difference_update(left)
+        except Exception as e:
+            print(f"⚠️ [{phone}] account_groups o'chirish xato: {e}")
+
+    _update_group_stats(phone, groups)
+    print(f"🔄 [{phone}] Guruhlar o'zgardi: +{len(joined)} -{len(left)}")
 
-async def periodic_keywords_refresh():
-    while True:
-        await asyncio.sleep(CACHE_TTL)
-        await refresh_keywords()
+
+def create_membership_handler(phone: str):
+    async def handle_membership(client: Client, message: Message):
+        chat = message.chat
+        if chat.type not in (ChatType.GROUP, ChatType.SUPERGROUP):
+            return
+        title = chat.title or f"Guruh {chat.id}"
+
+        joined: Dict[int, str] = {}
+        left: List[int] = []
+
+        if message.migrate_to_chat_id:
+            left.append(chat.id)
+            joined[message.migrate_to_chat_id] = title
+        elif message.migrate_from_chat_id:
+            left.append(message.migrate_from_chat_id)
+            joined[chat.id] = title
+        elif message.left_chat_member and message.left_chat_member.is_self:
+            left.append(chat.id)
+        elif message.group_chat_created or message.supergroup_chat_created:
+            joined[chat.id] = title
+        elif message.new_chat_members and any(u.is_self for u in message.new_chat_members):
+            joined[chat.id] = title
+
+        if joined or left:
+            await apply_group_delta(phone, joined, left)
+
+    async def handle_raw_channel(client: Client, update, users, chats):
+        # Guruhdan chiqarib yuborilganda service xabar kelmaydi, faqat UpdateChannel
+        if not isinstance(update, raw.types.UpdateChannel):
+            return
+        ch = chats.get(update.channel_id)
+        gid = utils.get_channel_id(update.channel_id)
+        if isinstance(ch, raw.types.ChannelForbidden) or (isinstance(ch, raw.types.Channel) and ch.left):
+            await apply_group_delta(phone, {}, [gid])
+        elif isinstance(ch, raw.types.Channel) and ch.megagroup:
+            await apply_group_delta(phone, {gid: ch.title or f"Guruh {gid}"}, [])
+
+    return handle_membership, handle_raw_channel
+
+
+# ===================== KEYWORDS =====================
+def keywords_age() -> float:
+    return keywords_snapshot.age()
 
 
 # ===================== HIT LOG =====================
-async def save_keyword_hit(keyword: str, group_id: int, group_name: str, phone: str, message_text: str):
-    global supabase, keywords_map
-    if not supabase:
+def save_keyword_hit(keyword: str, group_id: int, group_name: str, phone: str, message_text: str):
+    """Task ochilmaydi: rollup counteri oshadi, xom qator (siyosat bo'yicha) hit_sink buferiga."""
+    keyword_id = keywords_snapshot.ids.get(keyword)
+    if hit_rollup:
+        hit_rollup.add(keyword_id, group_id, phone, time.time())
+    if not hit_sink or not raw_hits.keep():
         return
-    try:
-        keyword_id = keywords_map.get(keyword.lower())
-        preview = (message_text or "")[:200]
-        supabase.table("keyword_hits").insert({
-            "keyword_id": keyword_id,
-            "group_id": group_id,
-            "group_name": group_name,
-            "phone_number": phone,
-            "message_preview": preview,
-        }).execute()
-    except Exception:
-        pass
+    hit_sink.add({
+        "keyword_id": keyword_id,
+        "group_id": group_id,
+        "group_name": group_name,
+        "phone_number": phone,
+        "message_preview": (message_text or "")[:200],
+    })
+
+
+async def periodic_rollup_compaction():
+    """Faqat bitta jarayonda (yetkazish / yagona): minute -> hour -> day, xom qatorlar retention."""
+    raw_keep = int(KEYWORD_HITS_RETENTION_DAYS * 86400)
+    while True:
+        await asyncio.sleep(ROLLUP_COMPACT_INTERVAL)
+        if not repo:
+            continue
+        try:
+            res = await repo.compact_hit_rollups(ROLLUP_MINUTE_KEEP, ROLLUP_HOUR_KEEP, raw_keep)
+            print(f"🗜 Rollup compaction: {res}")
+        except Exception as e:
+            print(f"⚠️ Rollup compaction xato: {e}")
 
 
 # ===================== ADMIN COMMAND POLLER =====================
@@ -567,19 +1377,21 @@ async def admin_command_poller():
       /enable +998...
       /list
       /where
+      /redrive          -> dead-letter xabarlarni qayta navbatga qo'yish
     """
-    global aiohttp_session, supabase
     if not BOT_TOKEN or not ADMIN_ID:
         return
 
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/getUpdates"
     offset = 0
 
     while True:
         try:
-            params = {"timeout": 50, "offset": offset}
-            async with aiohttp_session.get(url, params=params, timeout=60) as resp:
-                data = await resp.json()
+            resp = await bot_transport.request(
+                BOT_TOKEN, "getUpdates", {"timeout": BOT_POLL_TIMEOUT, "offset": offset})
+            data = resp.data
+        except CircuitOpen as e:
+            await asyncio.sleep(e.retry_in)
+            continue
         except Exception:
             await asyncio.sleep(2)
             continue
@@ -606,6 +1418,21 @@ async def admin_command_poller():
                 )
                 continue
 
+            if text.startswith("/redrive"):
+                items = send_scheduler.drain_dead_letters()
+                queued = 0
+                for it in items:
+                    try:
+                        send_queue.put_nowait(it)
+                        queued += 1
+                    except asyncio.QueueFull:
+                        send_scheduler.add_dead_letter(it, "redrive: queue full")
+                await notify_admin_once(
+                    f"redrive_{int(time.time())}",
+                    f"♻️ Dead-letter: {queued}/{len(items)} ta qayta navbatga qo'yildi"
+                )
+                continue
+
             if text.startswith("/add"):
                 parts = text.split()
                 if len(parts) < 2:
@@ -618,11 +1445,12 @@ async def admin_command_poller():
                     continue
 
                 try:
-                    supabase.table("userbot_accounts").upsert({
+                    await repo.upsert_account({
                         "phone_number": phone,
                         "status": "pending",
                         "two_fa_required": False,
-                    }).execute()
+                        "updated_at": utc_now_iso(),
+                    })
                     await notify_admin_once(f"add_{phone}", f"✅ Qo'shildi: {phone} (pending)")
                 except Exception as e:
                     await notify_admin_once(f"add_err_{phone}", f"❌ Qo'shishda xato: {phone}\n{e}")
@@ -635,7 +1463,7 @@ async def admin_command_poller():
                     continue
                 phone = _normalize_phone(parts[1])
                 try:
-                    supabase.table("userbot_accounts").update({"status": "disabled"}).eq("phone_number", phone).execute()
+                    await repo.update_account(phone, {"status": "disabled", "updated_at": utc_now_iso()})
                     await notify_admin_once(f"dis_{phone}", f"⛔️ Disabled: {phone}")
                 except Exception as e:
                     await notify_admin_once(f"dis_err_{phone}", f"❌ Disable xato: {phone}\n{e}")
@@ -648,7 +1476,7 @@ async def admin_command_poller():
                     continue
                 phone = _normalize_phone(parts[1])
                 try:
-                    supabase.table("userbot_accounts").update({"status": "pending"}).eq("phone_number", phone).execute()
+                    await repo.update_account(phone, {"status": "pending", "updated_at": utc_now_iso()})
                     await notify_admin_once(f"en_{phone}", f"✅ Enabled (pending): {phone}")
                 except Exception as e:
                     await notify_admin_once(f"en_err_{phone}", f"❌ Enable xato: {phone}\n{e}")
@@ -664,7 +1492,7 @@ async def admin_command_poller():
 
                 # DB delete
                 try:
-                    supabase.table("userbot_accounts").delete().eq("phone_number", phone).execute()
+                    await repo.delete_account(phone)
                 except Exception:
                     pass
 
@@ -683,8 +1511,7 @@ async def admin_command_poller():
 
             if text.startswith("/list"):
                 try:
-                    res = supabase.table("userbot_accounts").select("phone_number,status").execute()
-                    rows = res.data or []
+                    rows = await repo.fetch_accounts()
                     lines = [f"{r.get('phone_number')} — {r.get('status')}" for r in rows][:80]
                     await notify_admin_once("list", "📋 Accounts:\n" + ("\n".join(lines) if lines else "Bo'sh"))
                 except Exception as e:
@@ -693,73 +1520,144 @@ async def admin_command_poller():
 
 
 # ===================== HANDLER =====================
+def check_near_duplicate(item: OutItem) -> Optional[OutItem]:
+    """
+    Yetkazish jarayonida (shard rejimida on_item'da) chaqiriladi. None -> oynada shu
+    yuboruvchining shu buyurtmasi allaqachon o'tgan, yuborilmaydi. Aks holda dup_key bilan.
+    """
+    if neardup_index is None:
+        return item
+    if NEARDUP_BY_SENDER and not item.sender_id:
+        # Yuboruvchi noma'lum: hammasi bitta "0" guruhiga tushib, begona buyurtmalar birlashmasin
+        return item
+    eid, is_repost = neardup_index.check(
+        normalize_text(item.body), sender=item.sender_id or None, group_id=item.cache_key[0])
+    if is_repost:
+        M_DROPS.inc(item.phone, "near_duplicate")
+        return None
+    return item._replace(dup_key=eid) if eid else item
+
+
+def forget_duplicate(cache_key):
+    """
+    seen() kalitni navbatdan oldin belgilaydi. Hit navbatga kirmasa (shed, queue_full,
+    IPC to'lgan) belgini olib tashlaymiz - shu guruhdagi boshqa akkaunt uni qayta olib kelsin.
+    """
+    if dedupe_store is not None:
+        dedupe_store.forget(cache_key)
+
+
+async def enqueue_item(item: OutItem) -> bool:
+    """Detached task yo'q: byudjet to'lsa siyosat bo'yicha kutadi yoki tashlaydi."""
+    if not await admission.admit(item):
+        M_DROPS.inc(item.phone, "shed")
+        return False
+    try:
+        send_queue.put_nowait(item)
+    except asyncio.QueueFull:
+        admission.reject(item)
+        M_DROPS.inc(item.phone, "queue_full")
+        return False
+    return True
+
+
 def create_message_handler(phone: str):
     async def handle_message(client: Client, message: Message):
-        global last_cache_update
+        t_entry = time.time()
+        startup.mark_first_message(phone)
+        if message.date:
+            M_TG_TO_HANDLER.observe(max(0.0, t_entry - message.date.timestamp()), phone)
 
         chat_id = message.chat.id
         group_name = getattr(message.chat, "title", None) or f"Chat {chat_id}"
 
-        # Shafiyorlar gruxidan o'zini o'zi forward qilmasin
-        if normalize_chat_id(chat_id) == normalize_chat_id(DRIVERS_GROUP_ID):
-            return
+        # Bloklangan guruhlar (haydovchilar guruhi ham) va matnsiz xabarlar bu yerga kelmaydi:
+        # run_client dagi chat_gate filtri ularni handler task'i ochilishidan oldin rad etadi
 
-        now = time.time()
-        if now - last_cache_update > CACHE_TTL:
-            await refresh_keywords()
+        # Tarmoqni kutmaymiz: yangilashni periodic_keywords_refresh qiladi
+        snap = keywords_snapshot
 
-        cleaned_text, urls = extract_text_and_urls(message)
-        if not cleaned_text:
+        # Ko'p xabar mos kelmaydi: entity/URL/strip_links faqat kalit so'z topilganda
+        matched = match_message(message, snap, first_only=KEYWORD_MATCH_MODE == "first")
+        if matched is None:
             return
+        cleaned_text, urls, matched_keywords = matched
+        M_MATCHES.inc(phone)
 
-        lower_text = cleaned_text.lower()
+        # Statistika har akkaunt uchun yoziladi - takror tekshiruvidan oldin
+        for kw in matched_keywords:
+            save_keyword_hit(kw, chat_id, group_name, phone, cleaned_text)
 
-        matched_keyword = None
-        for kw in keywords_cache:
-            if kw and kw in lower_text:
-                matched_keyword = kw
-                break
-        if not matched_keyword:
+        # ===== MUHIM: takror bo'lsa render ham, queue ham, Bot API ham yo'q =====
+        cache_key = (normalize_chat_id(chat_id), int(message.id))
+        if dedupe_store is not None and dedupe_store.seen(cache_key):
+            M_DROPS.inc(phone, "duplicate")
             return
 
         sender_html = build_sender_anchor(message)
         message_link = get_message_link(message)
         group_link = get_chat_link(message)
 
-        safe_text = html.escape(cleaned_text)
-
-        forward_text = (
-            f"🔔 <b>Yangi buyurtma</b>\n"
-            f"📍 Guruh: <b>{html.escape(group_name)}</b>\n"
-            f"👤 Kimdan: {sender_html}\n\n"
-            f"{safe_text}\n\n"
-            f"🔗 {message_link}"
+        forward_text = render_forward_text(group_name, sender_html, cleaned_text, message_link)
+
+        # ===== MUHIM: navbatga faqat admission control orqali =====
+        item = make_item(
+            cache_key=cache_key,
+            text=forward_text,
+            group_link=group_link,
+            message_link=message_link,
+            urls=urls,
+            group_name=group_name,
+            sender_html=sender_html,
+            body=cleaned_text,
+            phone=phone,
+            priority=len(matched_keywords),
+            sender_id=get_sender_id(message),
         )
 
-        asyncio.create_task(save_keyword_hit(matched_keyword, chat_id, group_name, phone, cleaned_text))
-
-        # ===== MUHIM: Handler queue sababli blok bo'lmasin =====
-        cache_key = (normalize_chat_id(chat_id), int(message.id))
-
-        async def _enqueue():
-            try:
-                send_queue.put_nowait((cache_key, forward_text, group_link, message_link, urls))
-            except asyncio.QueueFull:
-                await asyncio.sleep(0.2)
-                try:
-                    send_queue.put_nowait((cache_key, forward_text, group_link, message_link, urls))
-                except asyncio.QueueFull:
-                    await send_queue.put((cache_key, forward_text, group_link, message_link, urls))
-
-        asyncio.create_task(_enqueue())
+        # Shard jarayonda navbat yetkazish jarayonida: hit IPC orqali ketadi
+        if shard_link:
+            await shard_link.send_item(item)
+        else:
+            # Hit yuqorida yozildi: takror faqat haydovchilar guruhiga ketmaydi
+            item = check_near_duplicate(item)
+            if item is None:
+                return
+            if not await enqueue_item(item):
+                forget_duplicate(cache_key)
+                return
+        M_HANDLER_TO_ENQUEUE.observe(time.time() - t_entry, phone)
 
     return handle_message
 
 
 # ===================== RUN CLIENT =====================
-async def run_client(phone: str):
-    print(f"\n📱 [{phone}] Ishga tushmoqda...")
-    update_account_status(phone, "connecting")
+async def initial_group_sync(client: Client, phone: str) -> float:
+    """
+    Handler allaqachon ishlayapti - guruhlar fonda tayyorlanadi. Lokal kesh yangi bo'lsa
+    walk yo'q. Qaytaradi: birinchi to'liq walk'gacha qancha kutish kerak (s).
+    """
+    cached = group_list_cache.load(phone, GROUP_CACHE_MAX_AGE)
+    if cached:
+        groups, age = cached
+        account_dialog_groups[phone] = groups
+        _update_group_stats(phone, groups)
+        startup.mark_synced(phone, "cache")
+        print(f"💾 [{phone}] Guruhlar lokal keshdan: {len(groups)} ta ({int(age)}s oldin), walk o'tkazib yuborildi")
+        return max(60.0, FULL_SYNC_INTERVAL - age)
+
+    async with startup.slot():
+        await sync_all_groups(client, phone)
+    startup.mark_synced(phone, "walk")
+    print_statistics()
+    return FULL_SYNC_INTERVAL
+
+
+async def run_client(phone: str) -> RunResult:
+    """Bitta ulanish davri. Qayta ulanishni account_supervisor qiladi, bu yerda faqat natija."""
+    # Shu task va undan ochilgan handler tasklaridagi baza xatolari shu akkauntga yoziladi
+    db_account.set(phone)
+    print(f"\n📱 [{phone}] Navbatda (bir vaqtda {STARTUP_CONCURRENCY} ta ulanadi)...")
 
     session_base = session_base_for_phone(phone)
 
@@ -771,29 +1669,39 @@ async def run_client(phone: str):
         workers=16,
         sleep_threshold=30
     )
+    active_clients[phone] = client
+
+    client.on_message((filters.group | filters.channel) & chat_gate.filter())(create_message_handler(phone))
 
-    client.on_message(filters.group | filters.channel)(create_message_handler(phone))
+    handle_membership, handle_raw_channel = create_membership_handler(phone)
+    client.on_message(filters.group & filters.service, group=1)(handle_membership)
+    client.on_raw_update(group=2)(handle_raw_channel)
 
+    sync_task: Optional[asyncio.Task] = None
     try:
-        await client.start()
+        async with startup.slot():
+            await update_status_if_wanted(phone, "connecting")
+            await client.start()
+        startup.mark_connected(phone)
+        account_supervisor.mark_started(phone)
         print(f"✅ [{phone}] Ulandi!")
-        update_account_status(phone, "active")
-
-        await sync_all_groups(client, phone)
-        print_statistics()
+        await update_status_if_wanted(phone, "active")
 
         async def periodic_sync():
+            delay = await initial_group_sync(client, phone)
             while True:
                 try:
-                    await asyncio.sleep(1800)
+                    await asyncio.sleep(delay)
+                    delay = FULL_SYNC_INTERVAL
                     if client and client.is_connected:
                         await sync_all_groups(client, phone)
                         print_statistics()
                 except Exception:
                     pass
 
-        asyncio.create_task(periodic_sync())
+        sync_task = asyncio.create_task(periodic_sync())
         await asyncio.Event().wait()
+        return RunResult(True, "to'xtadi")
 
     except Exception as e:
         msg = str(e)
@@ -803,10 +1711,17 @@ async def run_client(phone: str):
             await client.stop()
         except Exception:
             pass
+        if active_clients.get(phone) is client:
+            del active_clients[phone]
+
+        if isinstance(e, FloodWait):
+            wait = float(e.value or 0)
+            await notify_admin_once(f"flood_{phone}", f"⏳ FloodWait\n📱 {phone}\n🕒 {int(wait)}s kutiladi")
+            return RunResult(True, f"FloodWait {int(wait)}s", wait)
 
         # ===== MUHIM: AUTH_KEY_DUPLICATED bo'lsa SESSION O'CHIRILMAYDI =====
         if "AUTH_KEY_DUPLICATED" in msg:
-            update_account_status(phone, "duplicated_running_elsewhere")
+            await update_account_status(phone, "duplicated_running_elsewhere")
             await notify_admin_once(
                 f"dup_{phone}",
                 "⚠️ AUTH_KEY_DUPLICATED\n"
@@ -815,12 +1730,12 @@ async def run_client(phone: str):
                 "📌 Bu raqam boshqa joyda ishlayapti. O‘sha joyni STOP qiling.\n"
                 "🔁 Keyin qayta ishga tushiring."
             )
-            return
+            return RunResult(False, "AUTH_KEY_DUPLICATED")
 
         # AUTH_KEY_UNREGISTERED bo'lsa relogin kerak, sessionni o'chirish mumkin
         if "AUTH_KEY_UNREGISTERED" in msg:
             deleted = await safe_delete_session_files(session_base, tries=12)
-            update_account_status(phone, "relogin_required")
+            await update_account_status(phone, "relogin_required")
             await notify_admin_once(
                 f"unreg_{phone}",
                 "⚠️ AUTH_KEY_UNREGISTERED\n"
@@ -828,38 +1743,316 @@ async def run_client(phone: str):
                 f"🧹 Session delete: {'✅' if deleted else '❌'}\n"
                 "🔁 Qayta login kerak."
             )
-            return
+            return RunResult(False, "AUTH_KEY_UNREGISTERED")
+
+        await notify_admin_once(f"err_{phone}", f"❌ Userbot error\n📱 {phone}\n🧾 {msg}\n🔁 Qayta ulanadi")
+        return RunResult(True, msg)
+    finally:
+        if sync_task:
+            sync_task.cancel()
+
+
+async def _on_account_storm(phone: str, reason: str):
+    await notify_admin_once(
+        f"storm_{phone}",
+        f"🌪 Restart storm\n📱 {phone}\n🔁 {RESTART_STORM_MAX} ta restart {int(RESTART_STORM_WINDOW)}s ichida\n"
+        f"⏸ {int(RESTART_STORM_COOLDOWN)}s pauza\n🧾 {reason}",
+    )
+
+
+def account_wanted(phone: str) -> bool:
+    """
+    Akkaunt hali ishlashi kerakmi (supervisor har urinishdan oldin, status yozishdan oldin).
+    Admin /disable qilgan yoki jadvaldan o'chirgan akkaunt qayta ulanmaydi va statusi
+    "connecting"/"active"/"reconnecting" bilan ustidan yozilmaydi. Akkauntlar jadvali
+    kuzatilmasa (bazasiz, shard jarayon - u yerda hub qaror qiladi) -> True.
+    """
+    if not repo or not account_rows:
+        return True
+    return account_rows.get(phone) in ACTIVE_STATUSES
+
+
+async def update_status_if_wanted(phone: str, status: str):
+    if account_wanted(phone):
+        await update_account_status(phone, status)
+
+
+async def _on_account_backoff(phone: str, delay: float):
+    # "error" emas: aks holda active_phones() dan chiqib, shard undan olib qo'yiladi
+    await update_status_if_wanted(phone, "reconnecting")
+
+
+account_supervisor = AccountSupervisor(
+    run_client,
+    base_delay=RESTART_BASE_DELAY,
+    max_delay=RESTART_MAX_DELAY,
+    storm_max=RESTART_STORM_MAX,
+    storm_window=RESTART_STORM_WINDOW,
+    storm_cooldown=RESTART_STORM_COOLDOWN,
+    on_storm=_on_account_storm,
+    on_backoff=_on_account_backoff,
+    should_run=account_wanted,
+)
 
-        update_account_status(phone, "error")
-        await notify_admin_once(f"err_{phone}", f"❌ Userbot error\n📱 {phone}\n🧾 {msg}")
+
+def prune_running_clients():
+    """Tugagan (qayta ishga tushirilmaydigan) tasklar ro'yxatdan chiqadi."""
+    for p in [p for p, t in running_clients.items() if t.done()]:
+        del running_clients[p]
+
+
+def start_phone(phone: str):
+    task = running_clients.get(phone)
+    if task and not task.done():
         return
+    running_clients[phone] = asyncio.create_task(account_supervisor.supervise(phone))
+
+
+async def stop_phone(phone: str, status: Optional[str] = None):
+    """
+    Akkauntni to'xtatish (boshqa shardga ko'chirilganda): task bekor qilinadi, client uziladi.
+    Ko'chirishda status yozilmaydi - "stopped" akkauntni faol ro'yxatdan chiqarib yuboradi.
+    """
+    task = running_clients.pop(phone, None)
+    if task and not task.done():
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+    client = active_clients.pop(phone, None)
+    if client:
+        try:
+            await client.stop()
+        except Exception:
+            pass
+    if status:
+        await update_account_status(phone, status)
+
+
+# ===================== SHARD PROCESS =====================
+async def shard_main(shard: int):
+    """`main.py --shard K`: faqat akkauntlar + matching; hitlar IPC orqali yetkazish jarayoniga."""
+    global bot_transport, dedupe_store, shard_link, ALL_PHONES
+
+    print(f"🧩 Shard {shard} ishga tushmoqda (pid {os.getpid()})")
+    if not init_repository():
+        print("❌ Bazaga ulanib bo'lmadi. Chiqish...")
+        sys.exit(1)
+
+    # Admin xabarnomalari (AUTH_KEY_*) uchun: shard sendMessage'ni kam ishlatadi
+    bot_transport = create_bot_transport(send_limit=2)
+    bot_transport.start()
+    hit_sink.start()
+    if hit_rollup:
+        hit_rollup.start()
+    dedupe_store = create_dedupe_store(DEDUPE_BACKEND, DEDUPE_WINDOW, max_size=DEDUPE_MAX, path=DEDUPE_PATH)
+
+    register_runtime_metrics()
+    if METRICS_PORT:
+        port = METRICS_PORT + 1 + shard
+        try:
+            await start_metrics_server(REGISTRY, METRICS_HOST, port)
+        except OSError as e:
+            print(f"⚠️ Metrics serverni ochib bo'lmadi ({METRICS_HOST}:{port}): {e}")
+
+    await start_config_sync(accounts=False)
+
+    async def on_assign(phones: List[str]):
+        global ALL_PHONES
+        ALL_PHONES = phones
+        wanted = set(phones)
+        for p in [p for p in running_clients if p not in wanted]:
+            print(f"↪️ [shard {shard}] {p} to'xtatilmoqda (qayta taqsimlandi)")
+            await stop_phone(p)
+        prune_running_clients()
+        for p in phones:
+            start_phone(p)
+
+    stop = asyncio.Event()
+    received = []
+
+    def on_signal(sig):
+        received.append(sig)
+        stop.set()
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            asyncio.get_running_loop().add_signal_handler(sig, on_signal, sig)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    def on_drop(payload):
+        item = load_item(payload)
+        M_DROPS.inc(item.phone, "ipc_overflow")
+        forget_duplicate(item.cache_key)
+
+    parent = os.getenv("SHARD_PARENT_PID", "")
+    shard_link = ShardLink(
+        shard,
+        SHARD_IPC_HOST,
+        SHARD_IPC_PORT,
+        on_assign,
+        lambda: [p for p, t in running_clients.items() if not t.done()],
+        buffer_max=SEND_QUEUE_MAX,
+        parent_pid=int(parent) if parent.isdigit() else None,
+        on_drop=on_drop,
+    )
+    link_task = asyncio.create_task(shard_link.run(stop))
+
+    await stop.wait()
+    link_task.cancel()
+    print(f"👋 Shard {shard} to'xtatilmoqda...")
+    phones = list(running_clients)
+    for p in phones:
+        await stop_phone(p)
+    # Hub jarayonlarni SIGTERM bilan to'xtatadi (redeploy, qayta taqsimlash) - status yozilmaydi
+    await shutdown(phones, "stopped" if signal.SIGINT in received else None)
+
+
+# ===================== SHARD SUPERVISOR =====================
+async def run_shard_supervisor():
+    """
+    Yetkazish jarayoni: Bot API pipeline shu yerda, akkauntlar SHARD_PROCESSES ta jarayonda.
+    Akkaunt boshqa shardga faqat eskisi uni to'xtatganini ("running") bildirgandan keyin beriladi
+    - bitta session ikki joyda ochilmasin (AUTH_KEY_DUPLICATED).
+    """
+    global shard_hub, shard_pool, ALL_PHONES
+
+    async def on_item(item: OutItem):
+        # Turli shardlardagi akkauntlar bitta guruhda bo'lsa takror shu yerda to'xtaydi.
+        # Umumiy store (sqlite) bo'lsa kalitni shard handler'i allaqachon belgilagan -
+        # qayta seen() har doim True qaytarib hamma hitni tashlardi
+        if dedupe_store is not None and not dedupe_store.shared and dedupe_store.seen(item.cache_key):
+            M_DROPS.inc(item.phone, "duplicate")
+            return
+        item = check_near_duplicate(item)
+        if item is not None and not await enqueue_item(item):
+            forget_duplicate(item.cache_key)
+
+    shard_hub = ShardHub(on_item)
+    await shard_hub.start(SHARD_IPC_HOST, SHARD_IPC_PORT)
+    shard_pool = ShardProcessPool(os.path.abspath(__file__), SHARD_PROCESSES)
+    shard_pool.start()
+    print(f"🧩 {len(ALL_PHONES)} ta akkaunt {SHARD_PROCESSES} ta jarayonga taqsimlanadi")
+
+    placement: Dict[str, int] = {}
+    try:
+        while True:
+            # userbot_accounts o'zgarsa config sync hub.changed ni ham qo'yadi
+            latest = active_phones()
+            if latest:
+                ALL_PHONES = latest
+
+            new = assign_shards(ALL_PHONES, SHARD_PROCESSES, placement)
+            moved = [p for p, k in new.items() if p in placement and placement[p] != k]
+            if moved:
+                print(f"⚖️ Qayta taqsimlash: {', '.join(f'{p}->{new[p]}' for p in moved)}")
+            placement = new
+
+            for k in range(SHARD_PROCESSES):
+                busy = shard_hub.running_elsewhere(k)
+                shard_hub.assign(k, [p for p, s in placement.items() if s == k and p not in busy])
+
+            shard_hub.changed.clear()
+            try:
+                await asyncio.wait_for(shard_hub.changed.wait(), SHARD_REBALANCE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await shard_pool.stop()
+        await shard_hub.close()
 
 
 # ===================== MAIN =====================
 async def main():
-    global ALL_PHONES, aiohttp_session
+    """
+    SIGTERM (systemctl stop, Railway redeploy) va Ctrl+C main task'ni bekor qiladi; to'xtash
+    (hit bufer flush/spill, rollup, outbox, repo) har doim shu event loop ichida - finally'da.
+    "stopped" statusi faqat operator to'xtatganda (Ctrl+C) yoziladi: SIGTERM - redeploy, status
+    yozilsa keyingi startda akkauntlar faol ro'yxatdan chiqib qoladi.
+    """
+    task = asyncio.current_task()
+    loop = asyncio.get_running_loop()
+    received = []
+
+    def on_signal(sig):
+        received.append(sig)
+        task.cancel()
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, on_signal, sig)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    status: Optional[str] = "stopped"
+    try:
+        await serve()
+    except asyncio.CancelledError:
+        print("\n👋 UserBot to'xtatildi")
+        if signal.SIGTERM in received:
+            status = None
+    except Exception as e:
+        status = "error"
+        print(f"❌ Kritik xato: {e}")
+    finally:
+        phones = list(running_clients)
+        for p in phones:
+            await stop_phone(p)
+        if status == "stopped" and not phones and SHARD_PROCESSES <= 1:
+            phones = PHONE_NUMBERS_ENV_FALLBACK
+        await shutdown(phones, status)
+
+
+async def serve():
+    global ALL_PHONES, bot_transport, dedupe_store
 
     print("🚀 UserBot Multi-Account ishga tushmoqda...")
     print(f"📁 BASE_DIR: {BASE_DIR}")
     print(f"📁 SESS_DIR: {SESS_DIR}")
     print(f"📁 CWD: {os.getcwd()}")
 
-    if not init_supabase():
-        print("❌ Supabase'ga ulanib bo'lmadi. Chiqish...")
+    if not init_repository():
+        print("❌ Bazaga ulanib bo'lmadi. Chiqish...")
         sys.exit(1)
 
-    aiohttp_session = aiohttp.ClientSession()
+    bot_transport = create_bot_transport()
+    bot_transport.start()
+    hit_sink.start()
+    if hit_rollup:
+        hit_rollup.start()
+        asyncio.create_task(periodic_rollup_compaction())
+
+    dedupe_store = create_dedupe_store(DEDUPE_BACKEND, DEDUPE_WINDOW, max_size=DEDUPE_MAX, path=DEDUPE_PATH)
+    if dedupe_store is not None:
+        print(f"🧬 Dedupe: {dedupe_store.name}, oyna {int(DEDUPE_WINDOW)}s")
+    if neardup_index is not None:
+        print(f"🔁 Near-dup: {NEARDUP_MODE}, oyna {int(NEARDUP_WINDOW)}s, o'xshashlik >= {NEARDUP_THRESHOLD:g}"
+              + (", yuboruvchi bo'yicha" if NEARDUP_BY_SENDER else ""))
+
+    register_runtime_metrics()
+    try:
+        await start_metrics_server(REGISTRY, METRICS_HOST, METRICS_PORT)
+    except OSError as e:
+        print(f"⚠️ Metrics serverni ochib bo'lmadi ({METRICS_HOST}:{METRICS_PORT}): {e}")
+
+    for item in send_queue.load_dead():
+        send_scheduler.add_dead_letter(item, "restartdan oldin yuborilmagan")
+    replayed = getattr(send_queue, "replayed", 0)
+    if replayed:
+        print(f"♻️ Navbatdan qayta yuboriladi: {replayed} ta xabar")
 
     for i in range(max(1, SEND_WORKERS)):
         asyncio.create_task(send_worker(i + 1))
-    print(f"📤 Yuborish workerlari: {max(1, SEND_WORKERS)} ta | queue={send_queue.maxsize}")
+    print(f"📤 Yuborish workerlari: {max(1, SEND_WORKERS)} ta | queue={send_queue.name}, max={send_queue.maxsize}")
 
-    await load_groups_cache()
     await ensure_accounts_seeded_from_env()
+    await start_config_sync()
 
     asyncio.create_task(admin_command_poller())
 
-    phones = fetch_phone_numbers_from_db() or PHONE_NUMBERS_ENV_FALLBACK
+    phones = active_phones() or PHONE_NUMBERS_ENV_FALLBACK
     phones = uniq_keep_order(phones)
     ALL_PHONES = phones
 
@@ -868,28 +2061,30 @@ async def main():
         print("❌ Bazada ham, .env fallback'da ham raqam yo'q!")
         sys.exit(1)
 
-    await refresh_keywords()
-    asyncio.create_task(periodic_keywords_refresh())
-
-    async def start_phone(p: str):
-        if p in running_clients:
-            return
-        running_clients[p] = asyncio.create_task(run_client(p))
+    if SHARD_PROCESSES > 1:
+        await notify_admin_once("started", f"✅ Userbot ishga tushdi ({SHARD_PROCESSES} ta shard).")
+        await run_shard_supervisor()
+        return
 
     print("\n🔄 Akkauntlar ishga tushirilmoqda...")
     for p in phones:
-        await start_phone(p)
+        start_phone(p)
 
     async def watch_new_accounts():
         global ALL_PHONES
         while True:
-            await asyncio.sleep(30)
-            latest = fetch_phone_numbers_from_db()
-            latest = uniq_keep_order(latest)
+            await accounts_changed.wait()
+            accounts_changed.clear()
+            latest = active_phones()
             if latest:
                 ALL_PHONES = latest
+            prune_running_clients()
+            # /disable yoki jadvaldan o'chirilgan akkauntlar to'xtatiladi (status yozilmaydi)
+            for p in [p for p in running_clients if not account_wanted(p)]:
+                print(f"⏹ [{p}] Akkaunt faol emas - to'xtatilmoqda")
+                await stop_phone(p)
             for p in latest:
-                await start_phone(p)
+                start_phone(p)
 
     asyncio.create_task(watch_new_accounts())
 
@@ -898,33 +2093,29 @@ async def main():
 
 
 # ===================== ENTRY =====================
+async def shutdown(phones: list, status: Optional[str]):
+    """status=None -> bazadagi akkaunt statuslari o'zgarmaydi (keyingi startda shu holatdan davom)."""
+    if status:
+        for phone in phones:
+            await update_account_status(phone, status)
+
+    if bot_transport:
+        await bot_transport.close()
+    if hit_sink:
+        await hit_sink.close()
+    if hit_rollup:
+        await hit_rollup.close()
+    if dedupe_store is not None:
+        dedupe_store.close()
+    send_queue.close()
+    if repo:
+        await repo.close()
+
+
 if __name__ == "__main__":
+    # To'xtash ikkala holatda ham loop ichida (signal handler); bu yerga faqat
+    # handler o'rnatilishidan oldingi Ctrl+C keladi
     try:
-        asyncio.run(main())
+        asyncio.run(shard_main(SHARD_ID) if SHARD_ID is not None else main())
     except KeyboardInterrupt:
-        print("\n👋 UserBot to'xtatildi")
-        for phone in list(running_clients.keys()) or PHONE_NUMBERS_ENV_FALLBACK:
-            update_account_status(phone, "stopped")
-
-        try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            if aiohttp_session and not aiohttp_session.closed:
-                loop.run_until_complete(aiohttp_session.close())
-            loop.close()
-        except Exception:
-            pass
-
-    except Exception as e:
-        print(f"❌ Kritik xato: {e}")
-        for phone in list(running_clients.keys()):
-            update_account_status(phone, "error")
-
-        try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            if aiohttp_session and not aiohttp_session.closed:
-                loop.run_until_complete(aiohttp_session.close())
-            loop.close()
-        except Exception:
-            pass
+        pass
@@ -0,0 +1,143 @@
+import time
+from collections import deque
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from normalize import normalize_text
+
+
+# ===================== AHO-CORASICK =====================
+class KeywordMatcher:
+    """
+    Kalit so'zlar uchun Aho-Corasick avtomati.
+    Bir marta quriladi (refresh_keywords), keyin matnni bitta o'tishda tekshiradi:
+    narx O(len(text) + topilganlar), kalit so'zlar soniga bog'liq emas.
+    """
+
+    __slots__ = ("keywords", "_goto", "_fail", "_out")
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._out: List[Tuple[int, ...]] = [()]
+
+        seen = set()
+        for kw in keywords:
+            if not kw or kw in seen:
+                continue
+            seen.add(kw)
+            self._add(kw, len(self.keywords))
+            self.keywords.append(kw)
+
+        self._fail: List[int] = [0] * len(self._goto)
+        self._build()
+
+    def _add(self, kw: str, idx: int):
+        goto = self._goto
+        state = 0
+        for ch in kw:
+            nxt = goto[state].get(ch)
+            if nxt is None:
+                nxt = len(goto)
+                goto[state][ch] = nxt
+                goto.append({})
+                self._out.append(())
+            state = nxt
+        self._out[state] = self._out[state] + (idx,)
+
+    def _build(self):
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                if out[fail[nxt]]:
+                    out[nxt] = out[nxt] + out[fail[nxt]]
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def find(self, text: str, first_only: bool = False) -> List[Tuple[str, int]]:
+        """(keyword, start) ro'yxati; first_only=True bo'lsa birinchi topilgani bilan to'xtaydi."""
+        if not text or not self.keywords:
+            return []
+
+        goto, fail, out, kws = self._goto, self._fail, self._out, self.keywords
+        found: List[Tuple[str, int]] = []
+        state = 0
+        for pos, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for idx in out[state]:
+                    kw = kws[idx]
+                    found.append((kw, pos - len(kw) + 1))
+                    if first_only:
+                        return found
+        return found
+
+    def first(self, text: str) -> Optional[str]:
+        found = self.find(text, first_only=True)
+        return found[0][0] if found else None
+
+    def matched_keywords(self, text: str, first_only: bool = False) -> List[str]:
+        """Topilgan kalit so'zlar (takrorlarsiz, matndagi tartibda)."""
+        out = []
+        seen = set()
+        for kw, _ in self.find(text, first_only=first_only):
+            if kw not in seen:
+                seen.add(kw)
+                out.append(kw)
+        return out
+
+
+EMPTY_MATCHER = KeywordMatcher(())
+
+
+# ===================== SNAPSHOT =====================
+class KeywordSnapshot(NamedTuple):
+    """
+    Kalit so'zlar holati (ro'yxat, id map, avtomat) - o'zgarmas.
+    Yangilanganda butunlay yangi snapshot bitta havola bilan almashtiriladi.
+    """
+    keywords: Tuple[str, ...]
+    ids: Mapping[str, int]
+    matcher: KeywordMatcher
+    loaded_at: float
+    version: int
+
+    def age(self, now: Optional[float] = None) -> float:
+        if not self.loaded_at:
+            return float("inf")
+        return (now or time.time()) - self.loaded_at
+
+
+def build_snapshot(rows: Iterable[dict], version: int) -> KeywordSnapshot:
+    """
+    Kalit so'zlar normalize_text bilan kanonik shaklga keltiriladi: "Тошкентдан",
+    "toshkentdan" va "TOSHKENTDAN" bitta yozuv bo'ladi (id - oxirgi qatorniki).
+    Xabar matni ham handlerda aynan shu funksiyadan o'tadi.
+    """
+    ids: Dict[str, int] = {}
+    for row in rows:
+        kw = normalize_text(row.get("keyword") or "")
+        if kw:
+            ids[kw] = row.get("id")
+    keywords = tuple(ids)
+    return KeywordSnapshot(
+        keywords=keywords,
+        ids=MappingProxyType(ids),
+        matcher=KeywordMatcher(keywords),
+        loaded_at=time.time(),
+        version=version,
+    )
+
+
+EMPTY_SNAPSHOT = KeywordSnapshot((), MappingProxyType({}), EMPTY_MATCHER, 0.0, 0)
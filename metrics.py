@@ -0,0 +1,173 @@
+import bisect
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return repr(v)
+
+
+# ===================== METRICS =====================
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        return []
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, doc, labelnames=()):
+        super().__init__(name, doc, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labelvalues, amount: float = 1):
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        return [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, *labelvalues):
+        self._values[labelvalues] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, doc, labelnames=(), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label -> [bucket counts..., sum, count]
+        self._data: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labelvalues):
+        d = self._data.get(labelvalues)
+        if d is None:
+            d = self._data[labelvalues] = [0] * (len(self.buckets) + 2)
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            d[i] += 1
+        d[-2] += value
+        d[-1] += 1
+
+    def samples(self):
+        out = []
+        n = len(self.buckets)
+        for k, d in self._data.items():
+            acc = 0
+            for i, le in enumerate(self.buckets):
+                acc += d[i]
+                le_label = 'le="%s"' % _num(float(le))
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, k, le_label)} {acc}")
+            inf_label = 'le="+Inf"'
+            out.append(f"{self.name}_bucket{_labels(self.labelnames, k, inf_label)} {int(d[n + 1])}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, k)} {_num(d[n])}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, k)} {int(d[n + 1])}")
+        return out
+
+
+class CallbackMetric(Metric):
+    """Qiymati scrape paytida olinadi: fn() -> [(label_values, value), ...]."""
+
+    def __init__(self, name, doc, kind: str, fn: Callable[[], Iterable[Tuple[LabelValues, float]]], labelnames=()):
+        super().__init__(name, doc, labelnames)
+        self.kind = kind
+        self.fn = fn
+
+    def samples(self):
+        try:
+            rows = list(self.fn())
+        except Exception:
+            return []
+        return [f"{self.name}{_labels(self.labelnames, k)} {_num(float(v))}" for k, v in rows]
+
+
+# ===================== REGISTRY =====================
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def _add(self, m: Metric) -> Metric:
+        if m.name in self._metrics:
+            raise ValueError(f"metric {m.name} allaqachon ro'yxatdan o'tgan")
+        self._metrics[m.name] = m
+        return m
+
+    def counter(self, name, doc, labelnames=()) -> Counter:
+        return self._add(Counter(name, doc, labelnames))
+
+    def gauge(self, name, doc, labelnames=()) -> Gauge:
+        return self._add(Gauge(name, doc, labelnames))
+
+    def histogram(self, name, doc, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, doc, labelnames, buckets))
+
+    def callback(self, name, doc, kind, fn, labelnames=()) -> CallbackMetric:
+        return self._add(CallbackMetric(name, doc, kind, fn, labelnames))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics.values():
+            samples = m.samples()
+            if not samples:
+                continue
+            lines.extend(m.header())
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# ===================== HTTP ENDPOINT =====================
+async def start_metrics_server(registry: Registry, host: str, port: int) -> Optional[web.AppRunner]:
+    """GET /metrics -> Prometheus text format (0.0.4)."""
+    if not port:
+        return None
+
+    async def handle(_request):
+        return web.Response(
+            text=registry.render(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"📈 Metrics: http://{host}:{port}/metrics")
+    return runner
@@ -0,0 +1,225 @@
+import time
+from array import array
+from collections import OrderedDict
+from functools import lru_cache
+from hashlib import blake2b
+from operator import eq
+from typing import Dict, Hashable, List, Optional, Tuple, Union
+
+_EMPTY = (1 << 64) - 1
+_DENSIFY_STEP = 0x9E3779B97F4A7C15
+
+
+# ===================== MINHASH (one permutation) =====================
+@lru_cache(maxsize=1 << 16)
+def _feature_hash(feature: str) -> int:
+    # hash() emas: PYTHONHASHSEED ga bog'liq bo'lmasin; tokenlar ko'p takrorlanadi -> kesh
+    return int.from_bytes(blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def features(tokens: List[str]) -> set:
+    """So'zlar + qo'shni juftliklar: bitta so'z qo'shilsa/tushsa Jaccard ~0.85 atrofida qoladi."""
+    return set(tokens).union(a + " " + b for a, b in zip(tokens, tokens[1:]))
+
+
+def minhash(tokens: List[str], num_perm: int = 32) -> array:
+    """
+    One-permutation MinHash: har bir belgi bitta hash, num_perm ta bin ichida minimum.
+    k ta alohida permutatsiyaga qaraganda k marta arzon. Bo'sh binlar (qisqa matn) o'ngdagi
+    birinchi to'liq bindan olinadi (rotation densification), aks holda ikkita qisqa matn
+    bo'sh binlar hisobiga o'xshash chiqardi.
+    """
+    mins = [_EMPTY] * num_perm
+    for f in features(tokens):
+        v, b = divmod(_feature_hash(f), num_perm)
+        if v < mins[b]:
+            mins[b] = v
+    if _EMPTY in mins:
+        # Aylanani o'ngdan chapga ikki marta aylanib: har bo'sh bin uchun keyingi to'liq bin
+        out = list(mins)
+        nxt = -1
+        for i in range(2 * num_perm - 1, -1, -1):
+            k = i % num_perm
+            if mins[k] != _EMPTY:
+                nxt = i
+            elif i < num_perm and nxt >= 0:
+                out[k] = (mins[nxt % num_perm] + (nxt - i) * _DENSIFY_STEP) & _EMPTY
+        mins = out
+    return array("Q", mins)
+
+
+def similarity(a: array, b: array) -> float:
+    """Jaccard bahosi: mos kelgan minhash pozitsiyalari ulushi."""
+    return sum(map(eq, a, b)) / len(a)
+
+
+# ===================== NEAR-DUP INDEX =====================
+class _Entry:
+    # Band kalitlari saqlanmaydi: o'chirishda sig + sender dan qayta hisoblanadi (xotira)
+    __slots__ = ("sig", "sender", "first_group", "groups", "seen_at")
+
+    def __init__(self, sig: array, sender: Optional[Hashable], group_id: Hashable, now: float):
+        self.sig = sig
+        self.sender = sender
+        self.first_group = group_id
+        self.groups: Optional[set] = None   # birinchisidan boshqa guruhlar (kerak bo'lganda)
+        self.seen_at = now
+
+
+class NearDupIndex:
+    """
+    Bir xil buyurtma matni ko'p guruhga tashlanganini aniqlash (normalize qilingan cleaned_text).
+    MinHash imzosi `bands` bo'lakka bo'linadi (LSH): o'xshash matnlar kamida bitta bo'lakda
+    bir xil bucketga tushadi, nomzodlar esa Jaccard bahosi >= threshold bilan tekshiriladi.
+    by_sender -> faqat bitta yuboruvchining xabarlari solishtiriladi (turli dispetcherlarning
+    o'xshash shablonlari bir-birini bosmaydi). Oyna sirpanuvchi: takror kelsa yozuv yangilanadi.
+    """
+
+    def __init__(
+        self,
+        window: float = 300.0,
+        threshold: float = 0.75,
+        max_entries: int = 50000,
+        by_sender: bool = True,
+        min_tokens: int = 4,
+        max_groups: int = 200,
+        num_perm: int = 32,
+        bands: int = 8,
+    ):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) bands ({bands}) ga bo'linishi kerak")
+        self.window = window
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.by_sender = by_sender
+        self.min_tokens = max(1, min_tokens)
+        self.max_groups = max(1, max_groups)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()   # eskilari boshida
+        # Ko'p bucketda bitta yozuv bo'ladi: list faqat ikkinchisi qo'shilganda
+        self._buckets: Dict[int, Union[int, List[int]]] = {}
+        self._next_id = 1
+
+        self.checks = 0
+        self.reposts = 0
+        self.candidates = 0
+        self.skipped_short = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _band_keys(self, sig: array, sender: Optional[Hashable]) -> List[int]:
+        r = self.rows
+        raw = sig.tobytes()
+        step = r * sig.itemsize
+        return [hash((i, sender, raw[i * step:(i + 1) * step])) for i in range(self.bands)]
+
+    def _drop(self, eid: int, entry: _Entry):
+        buckets = self._buckets
+        for k in self._band_keys(entry.sig, entry.sender):
+            ids = buckets.get(k)
+            if ids is None:
+                continue
+            if ids.__class__ is int:
+                if ids == eid:
+                    del buckets[k]
+                continue
+            try:
+                ids.remove(eid)
+            except ValueError:
+                pass
+            if len(ids) == 1:
+                buckets[k] = ids[0]
+
+    def _expire(self, now: float):
+        entries = self._entries
+        cutoff = now - self.window
+        while entries:
+            eid = next(iter(entries))
+            entry = entries[eid]
+            if entry.seen_at >= cutoff:
+                break
+            del entries[eid]
+            self._drop(eid, entry)
+
+    def check(
+        self,
+        text: str,
+        sender: Optional[Hashable] = None,
+        group_id: Hashable = 0,
+        now: Optional[float] = None,
+    ) -> Tuple[int, bool]:
+        """
+        text - normalize_text() natijasi. Qaytaradi: (klaster id, takrormi).
+        Qisqa matnlar (min_tokens dan kam) solishtirilmaydi: (0, False).
+        """
+        now = time.monotonic() if now is None else now
+        self.checks += 1
+        self._expire(now)
+
+        tokens = text.split()
+        if len(tokens) < self.min_tokens:
+            self.skipped_short += 1
+            return 0, False
+
+        sig = minhash(tokens, self.num_perm)
+        sender = sender if self.by_sender else None
+        keys = self._band_keys(sig, sender)
+        tried = set()
+        for k in keys:
+            ids = self._buckets.get(k, ())
+            for eid in ((ids,) if ids.__class__ is int else ids):
+                if eid in tried:
+                    continue
+                tried.add(eid)
+                entry = self._entries[eid]
+                if similarity(sig, entry.sig) < self.threshold:
+                    continue
+                entry.seen_at = now
+                self._entries.move_to_end(eid)
+                if group_id != entry.first_group:
+                    if entry.groups is None:
+                        entry.groups = set()
+                    if len(entry.groups) < self.max_groups:
+                        entry.groups.add(group_id)
+                self.candidates += len(tried)
+                self.reposts += 1
+                return eid, True
+        self.candidates += len(tried)
+
+        eid = self._next_id
+        self._next_id += 1
+        self._entries[eid] = _Entry(sig, sender, group_id, now)
+        buckets = self._buckets
+        for k in keys:
+            ids = buckets.get(k)
+            if ids is None:
+                buckets[k] = eid
+            elif ids.__class__ is int:
+                buckets[k] = [ids, eid]
+            else:
+                ids.append(eid)
+        if len(self._entries) > self.max_entries:
+            old_id, old = self._entries.popitem(last=False)
+            self._drop(old_id, old)
+            self.evicted += 1
+        return eid, False
+
+    def also_posted(self, eid: int) -> int:
+        """Birinchi xabardan keyin yana nechta boshqa guruhda ko'rildi."""
+        entry = self._entries.get(eid)
+        return len(entry.groups) if entry and entry.groups else 0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "checks": self.checks,
+            "reposts": self.reposts,
+            "candidates": self.candidates,
+            "skipped_short": self.skipped_short,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,79 @@
+"""
+Kalit so'z qidiruvi uchun matnni bitta kanonik shaklga keltirish.
+
+O'zbek lotin, o'zbek kirill va rus yozuvlari lotinga o'giriladi, harf kichraytiriladi,
+apostrof variantlari (o', oʻ, o`, g’) va ko'rinmas belgilar olib tashlanadi, o'xshash
+harflar (kirill "о"/lotin "o", grekcha) bitta harfga tushadi.
+Hammasi oldindan tuzilgan bitta str.translate jadvali bilan; bo'shliqlar split/join bilan
+siqiladi. Xabar va kalit so'zlar aynan bir xil funksiyadan o'tadi.
+
+Jadval dict emas, ordinal bo'yicha indekslanadigan list (U+0000..U+20FF): translate uchun
+dict'dan 2-3 baravar tez. Undan yuqori belgilar (emoji va h.k.) o'zgarishsiz qoladi.
+"""
+from typing import Dict, List, Union
+
+# Kichik harf -> kanonik lotin
+_CYRILLIC = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "yo", "ж": "j",
+    "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "x", "ц": "ts",
+    "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "", "ы": "i", "ь": "", "э": "e", "ю": "yu",
+    "я": "ya",
+    # o'zbekcha harflar: ў -> o', ғ -> g' (apostrof baribir tushib qoladi)
+    "ў": "o", "қ": "q", "ғ": "g", "ҳ": "h",
+    # qozoq/tojik klaviaturasidan kelib qoladiganlar
+    "ҷ": "j", "ӣ": "i", "ӯ": "u", "і": "i", "ї": "i", "є": "e", "ң": "n", "ү": "u", "ұ": "u",
+}
+
+# Apostrof va tutuq belgisi variantlari (o'zbek lotinida o'/g' va kirillda ъ o'rnida)
+_APOSTROPHES = "'`\u00b4\u02b9\u02bb\u02bc\u02bd\u02c8\u2018\u2019\u201a\u201b\u2032"
+
+# Ko'rinmas: zero-width, soft hyphen, yo'nalish belgilari, "İ".lower() dagi nuqta
+_INVISIBLE = "\u0307\u00ad\u200b\u200c\u200d\u200e\u200f\u2060"
+
+# Lotin harflariga o'xshash boshqa yozuv harflari
+_HOMOGLYPHS = {
+    "ı": "i", "ſ": "s",
+    "α": "a", "β": "b", "ε": "e", "ι": "i", "κ": "k", "ν": "v", "ο": "o", "ρ": "p",
+    "τ": "t", "υ": "u", "χ": "x",
+}
+
+
+TABLE_SIZE = 0x2100
+
+
+def _build_table() -> List[Union[int, str]]:
+    base: Dict[str, str] = {}
+    base.update(_CYRILLIC)
+    base.update(_HOMOGLYPHS)
+    for ch in _APOSTROPHES + _INVISIBLE:
+        base[ch] = ""
+
+    # O'zgarmaydigan belgi -> o'z ordinali (translate uchun identity)
+    table: List[Union[int, str]] = list(range(TABLE_SIZE))
+    for cp in range(TABLE_SIZE):
+        ch = chr(cp)
+        # Katta harflar ham shu jadvalda: lower() uchun alohida o'tish kerak emas
+        val = "".join(base.get(c, c) for c in ch.lower())
+        if val != ch:
+            table[cp] = val
+    return table
+
+
+TRANSLATION_TABLE = _build_table()
+
+# Faqat ASCII matn uchun: translate o'rniga C darajadagi lower/replace tezroq
+_ASCII_APOSTROPHES = "'`"
+
+
+def normalize_text(text: str) -> str:
+    """Qidiruv uchun kanonik shakl: 'Тошкентдан  Фарғонага' -> 'toshkentdan fargonaga'."""
+    if not text:
+        return ""
+    if text.isascii():
+        text = text.lower()
+        for ch in _ASCII_APOSTROPHES:
+            if ch in text:
+                text = text.replace(ch, "")
+        return " ".join(text.split())
+    return " ".join(text.translate(TRANSLATION_TABLE).split())
@@ -0,0 +1,283 @@
+import asyncio
+import itertools
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+_uids = itertools.count(1)
+
+
+# ===================== OUTBOUND ITEM =====================
+class OutItem(NamedTuple):
+    """Haydovchilar guruhiga ketadigan bitta xabar (send_queue elementi)."""
+    cache_key: Tuple[int, int]
+    text: str                 # tayyor HTML (bitta xabar rejimi uchun)
+    group_link: str
+    message_link: str
+    urls: List[str]
+    group_name: str = ""
+    sender_html: str = ""
+    body: str = ""            # tozalangan matn (digest uchun)
+    enqueued_at: float = 0.0
+    qid: int = 0              # durable navbatdagi qator id (0 -> xotirada)
+    phone: str = ""           # qaysi akkaunt topdi
+    priority: int = 0         # admission drop_lowest uchun (katta -> muhimroq)
+    sender_id: int = 0        # near-dup kaliti (from_user yoki sender_chat)
+    dup_key: int = 0          # near-dup klaster id (yetkazish jarayonida qo'yiladi)
+    uid: int = 0              # jarayon ichida yagona id (admission kaliti; cache_key takrorlanishi mumkin)
+
+
+def make_item(**kwargs) -> OutItem:
+    kwargs.setdefault("enqueued_at", time.time())
+    kwargs.setdefault("uid", next(_uids))
+    return OutItem(**kwargs)
+
+
+def dump_item(item: OutItem) -> str:
+    """JSON (durable navbat va jarayonlararo IPC uchun). qid, dup_key, uid lokal - yozilmaydi."""
+    d = item._asdict()
+    d.pop("qid", None)
+    d.pop("dup_key", None)
+    d.pop("uid", None)
+    return json.dumps(d, ensure_ascii=False)
+
+
+def load_item(payload: str, qid: int = 0, uid: Optional[int] = None) -> OutItem:
+    """uid berilmasa yangisi (boshqa jarayondan kelgan xabar shu jarayonda yangi element)."""
+    d = json.loads(payload)
+    d["cache_key"] = tuple(d.get("cache_key") or ())
+    d["qid"] = qid
+    d["uid"] = next(_uids) if uid is None else uid
+    return OutItem(**d)
+
+
+# ===================== SEND QUEUE BACKENDS =====================
+class MemorySendQueue:
+    """
+    Tezkor rejim: xotirada FIFO, restartda yo'qoladi. ack/bury hech narsa qilmaydi.
+    asyncio.Queue emas: admission tashlagan xabar discard() bilan haqiqatan o'chadi.
+    """
+
+    name = "memory"
+
+    def __init__(self, maxsize: int = 50000):
+        self._items: "OrderedDict[int, OutItem]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self.maxsize = maxsize
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def put_nowait(self, item: OutItem):
+        if self.maxsize and len(self._items) >= self.maxsize:
+            raise asyncio.QueueFull()
+        if not item.uid:
+            item = item._replace(uid=next(_uids))
+        self._items[item.uid] = item
+        self._ready.set()
+
+    async def put(self, item: OutItem):
+        while True:
+            try:
+                self.put_nowait(item)
+                return
+            except asyncio.QueueFull:
+                await asyncio.sleep(0.05)
+
+    async def get(self) -> OutItem:
+        while not self._items:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._items.popitem(last=False)[1]
+
+    def get_nowait(self) -> OutItem:
+        if not self._items:
+            raise asyncio.QueueEmpty()
+        return self._items.popitem(last=False)[1]
+
+    def discard(self, item: OutItem) -> bool:
+        """Navbatdan olinmagan xabarni o'chiradi. False -> allaqachon olingan."""
+        return self._items.pop(item.uid, None) is not None
+
+    def task_done(self):
+        pass
+
+    def ack(self, item: OutItem):
+        pass
+
+    def bury(self, item: OutItem, reason: str = ""):
+        pass
+
+    def load_dead(self) -> List[OutItem]:
+        return []
+
+    def close(self):
+        pass
+
+
+class SqliteSendQueue:
+    """
+    Restartdan omon qoladigan navbat: SQLite (WAL). Xotirada faqat qator id'lari turadi,
+    matn get() paytida o'qiladi. Yozuvlar commit_interval bo'yicha guruhlab commit qilinadi,
+    qator faqat ack() (yuborilgandan keyin) o'chiriladi; startda ack qilinmaganlar qayta o'qiladi.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, maxsize: int = 50000, commit_interval: float = 0.05, commit_batch: int = 500):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.maxsize = maxsize
+        self.commit_interval = commit_interval
+        self.commit_batch = max(1, commit_batch)
+
+        self._conn = sqlite3.connect(path, isolation_level="DEFERRED", check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " payload TEXT NOT NULL,"
+            " dead INTEGER NOT NULL DEFAULT 0,"
+            " reason TEXT,"
+            " created REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+        self._ids: asyncio.Queue = asyncio.Queue()
+        # discard() qilingan, lekin _ids da qolgan qatorlar (get() ularni o'tkazib yuboradi)
+        self._stale = 0
+        self._uid_of: Dict[int, int] = {}   # qator id -> item.uid (faqat shu jarayonda qo'yilganlar)
+        self._rid_of: Dict[int, int] = {}   # item.uid -> qator id
+        self._dirty = 0
+        self._last_commit = time.monotonic()
+        self._commit_handle = None
+
+        self.replayed = 0
+        for (rid,) in self._conn.execute("SELECT id FROM outbox WHERE dead = 0 ORDER BY id"):
+            self._ids.put_nowait(rid)
+            self.replayed += 1
+
+    # ----- batched commit -----
+    def _touch(self):
+        self._dirty += 1
+        if self._dirty >= self.commit_batch or time.monotonic() - self._last_commit >= self.commit_interval:
+            self._commit()
+        elif self._commit_handle is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self._commit()
+                return
+            self._commit_handle = loop.call_later(self.commit_interval, self._commit)
+
+    def _commit(self):
+        if self._commit_handle is not None:
+            self._commit_handle.cancel()
+            self._commit_handle = None
+        if self._dirty:
+            self._conn.commit()
+            self._dirty = 0
+        self._last_commit = time.monotonic()
+
+    # ----- queue API -----
+    def qsize(self) -> int:
+        return self._ids.qsize() - self._stale
+
+    def put_nowait(self, item: OutItem):
+        if item.qid:
+            # dead-letter'dan qaytgan: yangi qator emas, mavjudini tiriltiramiz
+            self._conn.execute("UPDATE outbox SET dead = 0, reason = NULL WHERE id = ?", (item.qid,))
+            self._touch()
+            self._ids.put_nowait(item.qid)
+            return
+
+        if self.maxsize and self.qsize() >= self.maxsize:
+            raise asyncio.QueueFull()
+        cur = self._conn.execute(
+            "INSERT INTO outbox (payload, created) VALUES (?, ?)",
+            (dump_item(item), item.enqueued_at or time.time()),
+        )
+        self._touch()
+        if item.uid:
+            self._uid_of[cur.lastrowid] = item.uid
+            self._rid_of[item.uid] = cur.lastrowid
+        self._ids.put_nowait(cur.lastrowid)
+
+    async def put(self, item: OutItem):
+        while True:
+            try:
+                self.put_nowait(item)
+                return
+            except asyncio.QueueFull:
+                await asyncio.sleep(0.05)
+
+    def _fetch(self, rid: int) -> Optional[OutItem]:
+        uid = self._uid_of.pop(rid, 0)
+        self._rid_of.pop(uid, None)
+        row = self._conn.execute("SELECT payload FROM outbox WHERE id = ?", (rid,)).fetchone()
+        if row is None:
+            self._stale = max(0, self._stale - 1)
+            return None
+        # Restartdan qaytganlar (uid 0) admission byudjetidan o'tmagan
+        return load_item(row[0], rid, uid)
+
+    async def get(self) -> OutItem:
+        while True:
+            rid = await self._ids.get()
+            item = self._fetch(rid)
+            if item is not None:
+                return item
+            self._ids.task_done()
+
+    def get_nowait(self) -> OutItem:
+        while True:
+            rid = self._ids.get_nowait()
+            item = self._fetch(rid)
+            if item is not None:
+                return item
+            self._ids.task_done()
+
+    def discard(self, item: OutItem) -> bool:
+        rid = self._rid_of.pop(item.uid, None) if item.uid else None
+        if rid is None:
+            return False
+        self._uid_of.pop(rid, None)
+        self._conn.execute("DELETE FROM outbox WHERE id = ?", (rid,))
+        self._touch()
+        self._stale += 1
+        return True
+
+    def task_done(self):
+        self._ids.task_done()
+
+    def ack(self, item: OutItem):
+        if item.qid:
+            self._conn.execute("DELETE FROM outbox WHERE id = ?", (item.qid,))
+            self._touch()
+
+    def bury(self, item: OutItem, reason: str = ""):
+        if item.qid:
+            self._conn.execute("UPDATE outbox SET dead = 1, reason = ? WHERE id = ?", (reason[:500], item.qid))
+            self._touch()
+
+    def load_dead(self) -> List[OutItem]:
+        rows = self._conn.execute("SELECT id, payload FROM outbox WHERE dead = 1 ORDER BY id").fetchall()
+        return [load_item(payload, rid) for rid, payload in rows]
+
+    def close(self):
+        try:
+            self._commit()
+            self._conn.close()
+        except Exception:
+            pass
+
+
+def create_send_queue(backend: str, maxsize: int, path: str = ""):
+    backend = (backend or "memory").strip().lower()
+    if backend == "sqlite":
+        return SqliteSendQueue(path or "outbox.sqlite3", maxsize=maxsize)
+    return MemorySendQueue(maxsize=maxsize)
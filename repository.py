@@ -0,0 +1,519 @@
+import asyncio
+import copy
+import itertools
+import json
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+
+def chunked(items: Sequence[Any], size: int) -> Iterable[List[Any]]:
+    items = list(items)
+    size = max(1, size)
+    for i in range(0, len(items), size):
+        yield items[i: i + size]
+
+
+def _keyset_filter(columns: Sequence[str], values: Sequence[Any]) -> str:
+    """PostgREST or= filtri: (c1, c2, ...) > (v1, v2, ...) leksikografik."""
+    def lit(v):
+        return f'"{v}"' if isinstance(v, str) else str(v)
+
+    parts = []
+    for i, col in enumerate(columns):
+        conds = [f"{c}.eq.{lit(v)}" for c, v in zip(columns[:i], values[:i])]
+        conds.append(f"{col}.gt.{lit(values[i])}")
+        parts.append(conds[0] if len(conds) == 1 else f"and({','.join(conds)})")
+    return ",".join(parts)
+
+
+# Qaysi akkaunt nomidan so'rov (run_client task'ida qo'yiladi, handler tasklari meros oladi).
+# Umumiy fon ishlari (bulk hit flush, config sync) -> ""
+db_account: ContextVar[str] = ContextVar("db_account", default="")
+
+
+# ===================== BASE =====================
+class Repository:
+    """
+    Bazaga async kirish qatlami. Pastki 5 ta primitiv (select/insert/upsert/update/delete)
+    backend tomonidan yoziladi, domen metodlari shular ustida qurilgan.
+    Xatolar yutib yuborilmaydi - chaqiruvchi o'zi ushlaydi (asyncio.TimeoutError ham).
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.errors_by_account: Counter = Counter()
+
+    def _error(self, timeout: bool = False):
+        self.errors += 1
+        self.errors_by_account[db_account.get()] += 1
+        if timeout:
+            self.timeouts += 1
+
+    # ----- primitives -----
+    async def select(self, table: str, columns: str = "*", eq: Optional[Dict[str, Any]] = None) -> List[dict]:
+        raise NotImplementedError
+
+    async def insert(self, table: str, rows: Sequence[dict]) -> List[dict]:
+        raise NotImplementedError
+
+    async def upsert(
+        self,
+        table: str,
+        rows: Sequence[dict],
+        on_conflict: Optional[str] = None,
+        ignore_duplicates: bool = False,
+    ) -> List[dict]:
+        raise NotImplementedError
+
+    async def update(self, table: str, values: dict, eq: Dict[str, Any]) -> List[dict]:
+        raise NotImplementedError
+
+    async def delete(
+        self,
+        table: str,
+        eq: Dict[str, Any],
+        in_: Optional[Dict[str, Sequence[Any]]] = None,
+    ) -> List[dict]:
+        raise NotImplementedError
+
+    async def select_since(
+        self,
+        table: str,
+        columns: str,
+        column: str,
+        since: Optional[str],
+        limit: int = 1000,
+        key: Sequence[str] = (),
+        after: Optional[Sequence[Any]] = None,
+    ) -> List[dict]:
+        """
+        column >= since bo'lgan qatorlar, (column, *key) bo'yicha tartibda (change feed uchun).
+        after berilsa keyset sahifa: faqat (column, *key) > (since, *after) qatorlar - bitta
+        updated_at da page_size dan ko'p qator bo'lsa ham keyingi sahifa oldinga siljiydi.
+        """
+        raise NotImplementedError
+
+    def subscribe(self, callback: Callable[[str, str, dict], None]) -> bool:
+        """
+        O'zgarishlar oqimi: callback(table, "upsert" | "delete", row).
+        False -> backend qo'llab-quvvatlamaydi, chaqiruvchi select_since bilan so'raydi.
+        """
+        return False
+
+    # ----- hit rollups (backendga xos: qo'shish atomar bo'lishi kerak) -----
+    async def add_hit_rollups(self, rows: Sequence[dict]):
+        """keyword_hit_rollups: mavjud bucketga hits qo'shiladi (hits = hits + excluded.hits)."""
+        raise NotImplementedError
+
+    async def compact_hit_rollups(self, minute_keep: int, hour_keep: int, raw_keep: int = 0) -> dict:
+        """
+        minute_keep s dan eski minute bucketlar -> hour, hour_keep s dan eski hour -> day.
+        raw_keep > 0 bo'lsa shundan eski xom keyword_hits qatorlari o'chiriladi.
+        """
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    # ----- keywords -----
+    async def fetch_keywords(self) -> List[dict]:
+        return await self.select("keywords", "id, keyword")
+
+    async def insert_keyword_hits(self, rows: Sequence[dict]):
+        if rows:
+            await self.insert("keyword_hits", rows)
+
+    # ----- groups -----
+    async def fetch_watched_groups(self) -> List[dict]:
+        return await self.select("watched_groups", "group_id, is_blocked")
+
+    async def fetch_account_groups(self) -> List[dict]:
+        return await self.select("account_groups", "phone_number, group_id")
+
+    async def upsert_watched_groups(self, rows: Sequence[dict], chunk_size: int = 500) -> int:
+        # Mavjud qatorlar (admin qo'ygan is_blocked) ustidan yozilmaydi
+        n = 0
+        for chunk in chunked(rows, chunk_size):
+            await self.upsert("watched_groups", chunk, on_conflict="group_id", ignore_duplicates=True)
+            n += len(chunk)
+        return n
+
+    async def upsert_account_groups(self, rows: Sequence[dict], chunk_size: int = 500) -> int:
+        n = 0
+        for chunk in chunked(rows, chunk_size):
+            await self.upsert("account_groups", chunk, on_conflict="phone_number,group_id")
+            n += len(chunk)
+        return n
+
+    async def delete_account_groups(self, phone: str, group_ids: Sequence[int], chunk_size: int = 200) -> int:
+        n = 0
+        for chunk in chunked(group_ids, chunk_size):
+            await self.delete("account_groups", {"phone_number": phone}, in_={"group_id": chunk})
+            n += len(chunk)
+        return n
+
+    # ----- accounts -----
+    async def fetch_accounts(self, columns: str = "phone_number,status") -> List[dict]:
+        return await self.select("userbot_accounts", columns)
+
+    async def insert_account(self, row: dict):
+        await self.insert("userbot_accounts", [row])
+
+    async def upsert_account(self, row: dict):
+        await self.upsert("userbot_accounts", [row])
+
+    async def update_account(self, phone: str, values: dict):
+        await self.update("userbot_accounts", values, {"phone_number": phone})
+
+    async def delete_account(self, phone: str):
+        await self.delete("userbot_accounts", {"phone_number": phone})
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "calls": self.calls, "errors": self.errors, "timeouts": self.timeouts}
+
+
+# ===================== SUPABASE =====================
+class SupabaseRepository(Repository):
+    """
+    supabase-py sinxron klienti cheklangan thread pool'da ishlaydi,
+    shuning uchun sekin PostgREST javobi event loop'ni to'xtatmaydi.
+    """
+
+    name = "supabase"
+
+    def __init__(self, client, max_workers: int = 8, timeout: float = 15.0):
+        super().__init__()
+        self._client = client
+        self._timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="supabase")
+        # Pool to'lsa ham navbat cheksiz o'smasin
+        self._sem = asyncio.Semaphore(max(1, max_workers) * 2)
+
+    async def _run(self, fn: Callable[[], Any], timeout: Optional[float] = None) -> List[dict]:
+        self.calls += 1
+        await self._sem.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            fut = loop.run_in_executor(self._executor, fn)
+        except BaseException:
+            self._sem.release()
+            raise
+        # Slot timeout'da emas, thread haqiqatan tugaganda bo'shaydi: baza osilib qolsa
+        # tugamagan so'rovlar cheklovdan oshib to'planmaydi
+        fut.add_done_callback(self._release)
+        try:
+            res = await asyncio.wait_for(asyncio.shield(fut), timeout or self._timeout)
+        except asyncio.TimeoutError:
+            self._error(timeout=True)
+            raise
+        except Exception:
+            self._error()
+            raise
+        return getattr(res, "data", None) or []
+
+    def _release(self, fut: asyncio.Future):
+        self._sem.release()
+        if not fut.cancelled():
+            fut.exception()   # timeout'dan keyin kelgan xato "never retrieved" bo'lmasin
+
+    def _filtered(self, query, eq: Optional[Dict[str, Any]], in_: Optional[Dict[str, Sequence[Any]]] = None):
+        for col, val in (eq or {}).items():
+            query = query.eq(col, val)
+        for col, vals in (in_ or {}).items():
+            query = query.in_(col, list(vals))
+        return query
+
+    async def select(self, table, columns="*", eq=None):
+        return await self._run(lambda: self._filtered(self._client.table(table).select(columns), eq).execute())
+
+    async def insert(self, table, rows):
+        rows = list(rows)
+        return await self._run(lambda: self._client.table(table).insert(rows).execute())
+
+    async def upsert(self, table, rows, on_conflict=None, ignore_duplicates=False):
+        rows = list(rows)
+        kwargs = {"on_conflict": on_conflict} if on_conflict else {}
+        if ignore_duplicates:
+            kwargs["ignore_duplicates"] = True
+        return await self._run(lambda: self._client.table(table).upsert(rows, **kwargs).execute())
+
+    async def update(self, table, values, eq):
+        return await self._run(lambda: self._filtered(self._client.table(table).update(values), eq).execute())
+
+    async def delete(self, table, eq, in_=None):
+        return await self._run(lambda: self._filtered(self._client.table(table).delete(), eq, in_).execute())
+
+    async def select_since(self, table, columns, column, since, limit=1000, key=(), after=None):
+        def q():
+            query = self._client.table(table).select(columns)
+            if since is not None and after is not None:
+                query = query.or_(_keyset_filter([column, *key], [since, *after]))
+            elif since is not None:
+                query = query.gte(column, since)
+            for col in (column, *key):
+                query = query.order(col)
+            return query.limit(limit).execute()
+        return await self._run(q)
+
+    # SQL funksiyalar README dagi "Analitika" bo'limida
+    async def add_hit_rollups(self, rows):
+        return await self._run(lambda: self._client.rpc("add_keyword_hit_rollups", {"rows": list(rows)}).execute())
+
+    async def compact_hit_rollups(self, minute_keep, hour_keep, raw_keep=0):
+        params = {"minute_keep_s": int(minute_keep), "hour_keep_s": int(hour_keep), "raw_keep_s": int(raw_keep)}
+        res = await self._run(
+            lambda: self._client.rpc("compact_keyword_hit_rollups", params).execute(),
+            timeout=max(self._timeout, 120.0),
+        )
+        return res[0] if isinstance(res, list) and res else (res or {})
+
+    async def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ===================== IN-MEMORY =====================
+# Jadval -> unique kalit (upsert va duplicate tekshiruvi uchun)
+MEMORY_UNIQUE_KEYS: Dict[str, tuple] = {
+    "userbot_accounts": ("phone_number",),
+    "watched_groups": ("group_id",),
+    "account_groups": ("phone_number", "group_id"),
+    "keywords": ("keyword",),
+    "keyword_hit_rollups": ("keyword_id", "group_id", "phone_number", "granularity", "bucket"),
+}
+
+
+class MemoryRepository(Repository):
+    """
+    Supabase o'rniga lokal stend: jadvallar xotirada, bir xil interfeys.
+    Bot va benchmarklarni bazasiz ishga tushirish uchun.
+    """
+
+    name = "memory"
+
+    def __init__(self, seed: Optional[Dict[str, List[dict]]] = None, latency: float = 0.0):
+        super().__init__()
+        self.tables: Dict[str, List[dict]] = {}
+        self.latency = latency
+        self._ids = itertools.count(1)
+        self._listeners: List[Callable[[str, str, dict], None]] = []
+        self._last_stamp = datetime.fromtimestamp(0, timezone.utc)
+        for table, rows in (seed or {}).items():
+            self.tables[table] = [self._with_id(r) for r in rows]
+
+    @classmethod
+    def from_file(cls, path: str) -> "MemoryRepository":
+        seed = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                seed = json.load(f)
+        return cls(seed)
+
+    def _with_id(self, row: dict) -> dict:
+        row = dict(row)
+        row.setdefault("id", next(self._ids))
+        row.setdefault("updated_at", self._stamp())
+        return row
+
+    def _stamp(self) -> str:
+        # Qat'iy o'suvchi: bir mikrosekundda ikki yozuv bo'lsa ham kursor adashmaydi
+        now = datetime.now(timezone.utc)
+        if now <= self._last_stamp:
+            now = self._last_stamp + timedelta(microseconds=1)
+        self._last_stamp = now
+        return now.isoformat()
+
+    # ----- change stream (lokal stend) -----
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+        return True
+
+    def _emit(self, table: str, op: str, rows: Iterable[dict]):
+        if not self._listeners:
+            return
+        for row in rows:
+            for cb in self._listeners:
+                try:
+                    cb(table, op, copy.deepcopy(row))
+                except Exception as e:
+                    print(f"⚠️ Change listener xato ({table}): {e}")
+
+    async def _tick(self):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        else:
+            await asyncio.sleep(0)
+
+    @staticmethod
+    def _match(row: dict, eq: Optional[Dict[str, Any]], in_: Optional[Dict[str, Sequence[Any]]] = None) -> bool:
+        if not all(row.get(k) == v for k, v in (eq or {}).items()):
+            return False
+        return all(row.get(k) in set(vals) for k, vals in (in_ or {}).items())
+
+    @staticmethod
+    def _project(row: dict, columns: str) -> dict:
+        cols = [c.strip() for c in (columns or "*").split(",") if c.strip()]
+        if not cols or "*" in cols:
+            return copy.deepcopy(row)
+        return {c: copy.deepcopy(row.get(c)) for c in cols}
+
+    def _key(self, table: str, row: dict, on_conflict: Optional[str] = None) -> Optional[tuple]:
+        cols = tuple(c.strip() for c in on_conflict.split(",")) if on_conflict else MEMORY_UNIQUE_KEYS.get(table)
+        if not cols:
+            return None
+        return tuple(row.get(c) for c in cols)
+
+    async def select(self, table, columns="*", eq=None):
+        await self._tick()
+        return [self._project(r, columns) for r in self.tables.get(table, []) if self._match(r, eq)]
+
+    async def insert(self, table, rows):
+        await self._tick()
+        data = self.tables.setdefault(table, [])
+        existing = {self._key(table, r) for r in data} - {None}
+        out = []
+        for row in rows:
+            key = self._key(table, row)
+            if key is not None and key in existing:
+                self._error()
+                raise ValueError(f"duplicate key value violates unique constraint on {table}: {key}")
+            new = self._with_id(row)
+            data.append(new)
+            existing.add(key)
+            out.append(copy.deepcopy(new))
+        self._emit(table, "upsert", out)
+        return out
+
+    async def upsert(self, table, rows, on_conflict=None, ignore_duplicates=False):
+        await self._tick()
+        data = self.tables.setdefault(table, [])
+        index = {self._key(table, r, on_conflict): r for r in data}
+        out = []
+        for row in rows:
+            key = self._key(table, row, on_conflict)
+            cur = index.get(key) if key is not None else None
+            if cur is not None:
+                if ignore_duplicates:
+                    continue
+                cur.update(row)
+                cur["updated_at"] = self._stamp()
+            else:
+                cur = self._with_id(row)
+                data.append(cur)
+                if key is not None:
+                    index[key] = cur
+            out.append(copy.deepcopy(cur))
+        self._emit(table, "upsert", out)
+        return out
+
+    async def update(self, table, values, eq):
+        await self._tick()
+        out = []
+        for row in self.tables.get(table, []):
+            if self._match(row, eq):
+                row.update(values)
+                row["updated_at"] = self._stamp()
+                out.append(copy.deepcopy(row))
+        self._emit(table, "upsert", out)
+        return out
+
+    async def delete(self, table, eq, in_=None):
+        await self._tick()
+        data = self.tables.get(table, [])
+        keep, gone = [], []
+        for row in data:
+            (gone if self._match(row, eq, in_) else keep).append(row)
+        self.tables[table] = keep
+        self._emit(table, "delete", gone)
+        return gone
+
+    async def select_since(self, table, columns, column, since, limit=1000, key=(), after=None):
+        await self._tick()
+
+        def pos(r):
+            return (r.get(column) or "", *(r.get(k) for k in key))
+
+        rows = self.tables.get(table, [])
+        if since is not None and after is not None:
+            start = (since, *after)
+            rows = [r for r in rows if pos(r) > start]
+        elif since is not None:
+            rows = [r for r in rows if (r.get(column) or "") >= since]
+        rows = sorted(rows, key=pos)
+        return [self._project(r, columns) for r in rows[:limit]]
+
+    async def add_hit_rollups(self, rows):
+        await self._tick()
+        out = self._add_rollups(rows)
+        self._emit("keyword_hit_rollups", "upsert", out)
+        return out
+
+    def _add_rollups(self, rows: Iterable[dict]) -> List[dict]:
+        data = self.tables.setdefault("keyword_hit_rollups", [])
+        index = {self._key("keyword_hit_rollups", r): r for r in data}
+        out = []
+        for row in rows:
+            key = self._key("keyword_hit_rollups", row)
+            cur = index.get(key)
+            if cur is not None:
+                cur["hits"] += row["hits"]
+                cur["updated_at"] = self._stamp()
+            else:
+                cur = index[key] = self._with_id(row)
+                data.append(cur)
+            out.append(copy.deepcopy(cur))
+        return out
+
+    async def compact_hit_rollups(self, minute_keep, hour_keep, raw_keep=0):
+        await self._tick()
+        now = datetime.now(timezone.utc).timestamp()
+        out = {}
+        for src, dst, keep, step in (("minute", "hour", minute_keep, 3600), ("hour", "day", hour_keep, 86400)):
+            # Faqat to'liq tugagan dst bucketlar: kesish chegarasi dst qadamiga tekislanadi
+            cutoff = int((now - keep) // step) * step
+            data = self.tables.get("keyword_hit_rollups", [])
+            moved, keep_rows = [], []
+            for r in data:
+                ts = datetime.fromisoformat(r["bucket"]).timestamp()
+                if r.get("granularity") == src and ts < cutoff:
+                    moved.append(dict(r, granularity=dst, bucket=datetime.fromtimestamp(
+                        int(ts // step) * step, timezone.utc).isoformat()))
+                else:
+                    keep_rows.append(r)
+            self.tables["keyword_hit_rollups"] = keep_rows
+            for r in moved:
+                r.pop("id", None)
+                r.pop("updated_at", None)
+            self._add_rollups(moved)
+            out[src] = len(moved)
+
+        out["raw"] = 0
+        if raw_keep > 0:
+            cutoff_iso = datetime.fromtimestamp(now - raw_keep, timezone.utc).isoformat()
+            hits = self.tables.get("keyword_hits", [])
+            kept = [r for r in hits if (r.get("created_at") or r.get("updated_at") or "") >= cutoff_iso]
+            out["raw"] = len(hits) - len(kept)
+            self.tables["keyword_hits"] = kept
+        return out
+
+
+def create_repository(backend: str, supabase_url: str = "", supabase_key: str = "", **kwargs) -> Repository:
+    backend = (backend or "supabase").strip().lower()
+    if backend == "memory":
+        return MemoryRepository.from_file(kwargs.get("seed_file", ""))
+
+    from supabase import create_client
+    client = create_client(supabase_url, supabase_key)
+    return SupabaseRepository(
+        client,
+        max_workers=kwargs.get("max_workers", 8),
+        timeout=kwargs.get("timeout", 15.0),
+    )
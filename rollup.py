@@ -0,0 +1,181 @@
+import asyncio
+import random
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from hit_sink import owned_by_running_loop
+from repository import Repository, chunked
+
+ROLLUP_TABLE = "keyword_hit_rollups"
+GRANULARITIES = ("minute", "hour", "day")
+
+RollupKey = Tuple[int, int, str, int]   # (keyword_id, group_id, phone, minute bucket, epoch s)
+
+
+def bucket_start(ts: float, granularity: str = "minute") -> int:
+    step = {"minute": 60, "hour": 3600, "day": 86400}[granularity]
+    return int(ts // step) * step
+
+
+def bucket_iso(bucket: int) -> str:
+    return datetime.fromtimestamp(bucket, timezone.utc).isoformat()
+
+
+# ===================== HIT ROLLUP =====================
+class HitRollup:
+    """
+    keyword_hits uchun vaqt bo'yicha agregat: (keyword_id, group_id, phone, minute) -> hits.
+    Handler faqat Counter'ni oshiradi; har flush_interval da yig'ilganlar bitta
+    repo.add_hit_rollups chaqiruvi bilan keyword_hit_rollups ga qo'shiladi (hits = hits + n,
+    shuning uchun bir nechta jarayon/restart bitta bucketni buzmaydi). Yozilmasa counterlar
+    qaytib qo'shiladi, xotira max_keys bilan chegaralangan.
+    """
+
+    def __init__(
+        self,
+        repo: Repository,
+        flush_interval: float = 60.0,
+        max_keys: int = 50000,
+        chunk_size: int = 500,
+    ):
+        self.repo = repo
+        self.flush_interval = flush_interval
+        self.max_keys = max(1, max_keys)
+        self.chunk_size = max(1, chunk_size)
+        self._counts: Counter = Counter()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._closing = False
+
+        self.hits = 0
+        self.rows_written = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.dropped = 0
+        self.unattributed = 0
+        self.last_error: Optional[str] = None
+
+    # ----- producer side (handler) -----
+    def add(self, keyword_id: Optional[int], group_id: int, phone: str, ts: float):
+        if keyword_id is None:
+            # Snapshot yangilanayotganda id topilmasa - rollup kaliti bo'la olmaydi
+            self.unattributed += 1
+            return
+        key = (keyword_id, group_id, phone, bucket_start(ts))
+        if key not in self._counts and len(self._counts) >= self.max_keys:
+            self.dropped += 1
+            return
+        self._counts[key] += 1
+        self.hits += 1
+
+    @property
+    def pending(self) -> int:
+        return len(self._counts)
+
+    # ----- lifecycle -----
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self, timeout: float = 10.0):
+        # Bekor qilinmaydi: flush o'rtasida cancel almashtirilgan Counter'ni yo'qotardi.
+        # Task uyg'otiladi, oxirgi flush'ni qilib o'zi chiqadi
+        self._closing = True
+        task = self._task
+        if task and not task.done() and owned_by_running_loop(task):
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(task, timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                task.cancel()
+        # Task boshqa loop'niki bo'lsa yoki kutish tugamagan bo'lsa - qolganlari shu yerda
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            if self._closing:
+                return
+
+    async def flush(self) -> int:
+        if not self._counts:
+            return 0
+        # Almashtirish: flush paytidagi hitlar yangi Counter'ga tushadi
+        counts, self._counts = self._counts, Counter()
+        rows = [
+            {
+                "keyword_id": kid,
+                "group_id": gid,
+                "phone_number": phone,
+                "granularity": "minute",
+                "bucket": bucket_iso(bucket),
+                "hits": n,
+            }
+            for (kid, gid, phone, bucket), n in counts.items()
+        ]
+        written = 0
+        try:
+            for chunk in chunked(rows, self.chunk_size):
+                await self.repo.add_hit_rollups(chunk)
+                written += len(chunk)
+        except asyncio.CancelledError:
+            # Yozilmagan qism Counter'ga qaytadi - close() dagi flush uni yozadi
+            self._restore(list(counts.items())[written:])
+            self.rows_written += written
+            raise
+        except Exception as e:
+            self.flush_errors += 1
+            self.last_error = str(e)
+            print(f"⚠️ keyword_hit_rollups yozilmadi: {e} (keyingi flush'da qayta)")
+            self._restore(list(counts.items())[written:])
+        self.rows_written += written
+        self.flushes += 1
+        return written
+
+    def _restore(self, items: List[tuple]):
+        for key, n in items:
+            if key not in self._counts and len(self._counts) >= self.max_keys:
+                self.dropped += n
+                continue
+            self._counts[key] += n
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "pending_keys": self.pending,
+            "rows_written": self.rows_written,
+            "flush_errors": self.flush_errors,
+            "dropped": self.dropped,
+            "unattributed": self.unattributed,
+        }
+
+
+# ===================== RAW RETENTION =====================
+class RawHitPolicy:
+    """
+    Xom keyword_hits qatorlari: all (oldingidek har bir hit), sample (rate ulushi), off.
+    Analitika rollup'dan o'qiladi, xom qatorlar faqat ko'rib chiqish uchun.
+    """
+
+    MODES = ("all", "sample", "off")
+
+    def __init__(self, mode: str = "all", rate: float = 1.0):
+        if mode not in self.MODES:
+            raise ValueError(f"keyword_hits mode {mode!r}: {', '.join(self.MODES)} dan biri bo'lishi kerak")
+        self.mode = mode
+        self.rate = min(1.0, max(0.0, rate))
+        self.kept = 0
+        self.skipped = 0
+
+    def keep(self) -> bool:
+        if self.mode == "all" or (self.mode == "sample" and random.random() < self.rate):
+            self.kept += 1
+            return True
+        self.skipped += 1
+        return False
@@ -0,0 +1,270 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+# ===================== TOKEN BUCKET =====================
+class TokenBucket:
+    """rate token/sekund, capacity gacha to'planadi. pause() -> 429 retry_after davomida token berilmaydi."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "paused_until")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: Optional[float] = None) -> float:
+        """Keyingi token uchun kutish (0 -> hozir bor)."""
+        now = now or time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 1.0
+
+    def take(self, now: Optional[float] = None):
+        self._refill(now or time.monotonic())
+        self.tokens -= 1
+
+    def pause(self, seconds: float):
+        until = time.monotonic() + max(0.0, seconds)
+        if until > self.paused_until:
+            self.paused_until = until
+        self.tokens = 0
+
+    def headroom(self, now: Optional[float] = None) -> float:
+        now = now or time.monotonic()
+        if now < self.paused_until:
+            return 0.0
+        self._refill(now)
+        return self.tokens
+
+
+# ===================== BOT TOKEN =====================
+class BotToken:
+    """Bitta bot: o'z global bucket'i, har bir chat uchun bucket va statistikasi."""
+
+    def __init__(self, token: str, rate: float, burst: float, chat_rate: float, chat_burst: float):
+        self.token = token
+        self.label = f"bot{token.split(':', 1)[0]}" if token else "bot?"
+        self.bucket = TokenBucket(rate, burst)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._chats: Dict[Any, TokenBucket] = {}
+        self.disabled: Optional[str] = None
+        self.disabled_until: Optional[float] = None   # None -> butunlay (401), aks holda cooldown
+        self.probing = False
+
+        self.sent = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.started = time.monotonic()
+
+    def chat_bucket(self, chat_id) -> TokenBucket:
+        b = self._chats.get(chat_id)
+        if b is None:
+            b = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return b
+
+    def delay(self, chat_id, now: float) -> float:
+        return max(self.bucket.delay(now), self.chat_bucket(chat_id).delay(now))
+
+    def headroom(self, chat_id, now: float) -> float:
+        return min(self.bucket.headroom(now), self.chat_bucket(chat_id).headroom(now))
+
+    def take(self, chat_id, now: float):
+        self.bucket.take(now)
+        self.chat_bucket(chat_id).take(now)
+
+    def stats(self) -> dict:
+        up = max(1e-9, time.monotonic() - self.started)
+        return {
+            "label": self.label,
+            "sent": self.sent,
+            "per_min": round(self.sent * 60 / up, 1),
+            "rate_limited": self.rate_limited,
+            "errors": self.errors,
+            "disabled": self.disabled,
+            "disabled_for": (
+                round(max(0.0, self.disabled_until - time.monotonic()))
+                if self.disabled and self.disabled_until is not None else None),
+        }
+
+
+class NoBotTokens(RuntimeError):
+    pass
+
+
+# ===================== SEND SCHEDULER =====================
+class SendScheduler:
+    """
+    Bot API limitlari uchun umumiy rejalashtiruvchi. Har bir bot tokeni uchun global bucket
+    (~30 msg/s) va chat bucket (~20 msg/min guruhga) bor. acquire() bo'sh joyi eng ko'p
+    bo'lgan tokenni tanlaydi; 429 shu tokenni retry_after davomida rotatsiyadan chiqaradi.
+    401 tokenni butunlay o'chiradi; 403 (bot guruhdan chiqarilgan va h.k.) disable_cooldown ga,
+    keyin probe(tok) (getMe) o'tsa token qaytadi - bitta tokenli o'rnatishda ham trafik
+    restartgacha to'xtab qolmaydi.
+    """
+
+    def __init__(
+        self,
+        tokens: List[str],
+        global_rate: float = 25.0,
+        global_burst: float = 25.0,
+        chat_rate: float = 20 / 60,
+        chat_burst: float = 20.0,
+        max_attempts: int = 8,
+        dead_letter_max: int = 5000,
+        disable_cooldown: float = 300.0,
+        probe: Optional[Callable[[BotToken], Awaitable[bool]]] = None,
+    ):
+        self.tokens = [
+            BotToken(t, global_rate, global_burst, chat_rate, chat_burst)
+            for t in dict.fromkeys(t for t in tokens if t)
+        ]
+        self.max_attempts = max(1, max_attempts)
+        self.disable_cooldown = disable_cooldown
+        self.probe = probe
+        self._probes: set = set()
+
+        self.dead_letters: deque = deque(maxlen=max(1, dead_letter_max))
+
+        self.sent = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.dead_lettered = 0
+        self.dead_letters_evicted = 0
+        self.waited_s = 0.0
+        self.last_error: Optional[str] = None
+
+    async def acquire(self, chat_id) -> BotToken:
+        """
+        Global va chat bucket'da token bor botni qaytaradi; hech birida bo'lmasa kutadi.
+        Tanlash va take() orasida await yo'q - lock kerak emas; kutish va getMe probe boshqa
+        chatlar uchun yuborayotgan workerlarni to'sib qo'ymaydi, uyg'ongach qayta tekshiriladi.
+        """
+        while True:
+            now = time.monotonic()
+            for t in self.tokens:
+                if t.disabled and t.disabled_until is not None and now >= t.disabled_until and not t.probing:
+                    self._start_probe(t)
+            active = [t for t in self.tokens if not t.disabled]
+            if not active:
+                cooling = [t.disabled_until for t in self.tokens if t.disabled_until is not None]
+                if not cooling:
+                    raise NoBotTokens("faol bot token qolmadi")
+                # Hammasi cooldown'da (yoki probe ketyapti): dead-letter emas, eng yaqin probe'ni kutamiz
+                wait = max(0.1, min(cooling) - time.monotonic())
+                self.waited_s += wait
+                await asyncio.sleep(wait)
+                continue
+
+            best, best_room, wait = None, -1.0, float("inf")
+            for t in active:
+                d = t.delay(chat_id, now)
+                if d <= 0:
+                    room = t.headroom(chat_id, now)
+                    if room > best_room:
+                        best, best_room = t, room
+                else:
+                    wait = min(wait, d)
+
+            if best is not None:
+                best.take(chat_id, now)
+                return best
+
+            self.waited_s += wait
+            await asyncio.sleep(wait)
+
+    def on_success(self, tok: BotToken):
+        self.sent += 1
+        tok.sent += 1
+
+    def on_429(self, tok: BotToken, chat_id, retry_after: float):
+        # Bitta worker emas - shu botning umumiy bucket'lari to'xtaydi, boshqa botlar davom etadi
+        self.rate_limited += 1
+        tok.rate_limited += 1
+        tok.chat_bucket(chat_id).pause(retry_after)
+        tok.bucket.pause(retry_after)
+
+    def on_error(self, tok: BotToken, error: str):
+        tok.errors += 1
+        self.last_error = f"{tok.label}: {error}"
+
+    def disable(self, tok: BotToken, reason: str, permanent: bool = False):
+        if tok.disabled and tok.disabled_until is None:
+            return
+        tok.disabled = reason
+        tok.disabled_until = None if permanent else time.monotonic() + self.disable_cooldown
+        tok.errors += 1
+        if permanent:
+            print(f"⛔️ {tok.label} rotatsiyadan chiqarildi: {reason}")
+        else:
+            print(f"⏸ {tok.label} {self.disable_cooldown:g}s rotatsiyadan chiqarildi: {reason}")
+
+    def _start_probe(self, tok: BotToken):
+        """Cooldown tugadi: getMe fon task'da, token natija kelguncha rotatsiyadan tashqarida."""
+        if not self.probe:
+            self._finish_probe(tok, True)
+            return
+        tok.probing = True
+        task = asyncio.create_task(self._reprobe(tok))
+        self._probes.add(task)
+        task.add_done_callback(self._probes.discard)
+
+    async def _reprobe(self, tok: BotToken):
+        try:
+            ok = await self.probe(tok)
+        except Exception:
+            ok = False
+        finally:
+            tok.probing = False
+        self._finish_probe(tok, ok)
+
+    def _finish_probe(self, tok: BotToken, ok: bool):
+        if not tok.disabled or tok.disabled_until is None:
+            # Probe paytida 401 bilan butunlay o'chirilgan
+            return
+        if ok:
+            print(f"✅ {tok.label} yana rotatsiyada")
+            tok.disabled = None
+            tok.disabled_until = None
+        else:
+            tok.disabled_until = time.monotonic() + self.disable_cooldown
+
+    def on_retry(self, error: Optional[str] = None):
+        self.retries += 1
+        if error:
+            self.last_error = error
+
+    def add_dead_letter(self, item: Any, reason: str):
+        if len(self.dead_letters) == self.dead_letters.maxlen:
+            self.dead_letters_evicted += 1
+        self.dead_letters.append({"item": item, "reason": reason, "ts": time.time()})
+        self.dead_lettered += 1
+
+    def drain_dead_letters(self) -> List[Any]:
+        items = [d["item"] for d in self.dead_letters]
+        self.dead_letters.clear()
+        return items
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+            "dead_letters": len(self.dead_letters),
+            "dead_lettered": self.dead_lettered,
+            "waited_s": round(self.waited_s, 1),
+            "tokens": [t.stats() for t in self.tokens],
+        }
@@ -0,0 +1,331 @@
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from outbox import OutItem, dump_item, load_item
+
+# JSON qatorlar; bitta xabar (HTML + matn) 64 KB default limitdan oshishi mumkin
+IPC_LINE_LIMIT = 1024 * 1024
+
+
+# ===================== ASSIGNMENT =====================
+def assign_shards(phones: Iterable[str], shards: int, current: Dict[str, int]) -> Dict[str, int]:
+    """
+    Akkauntlarni jarayonlarga taqsimlash. Mavjud joylashuv saqlanadi (akkaunt bekordan
+    ko'chmasin - ko'chish = qayta ulanish), yangilari eng bo'sh shardga tushadi, keyin
+    shardlar orasidagi farq 1 dan oshmaguncha oxirgi qo'shilganlar ko'chiriladi.
+    """
+    shards = max(1, shards)
+    phones = list(dict.fromkeys(phones))
+    out = {p: current[p] for p in phones if 0 <= current.get(p, -1) < shards}
+    load = [0] * shards
+    for s in out.values():
+        load[s] += 1
+
+    for p in phones:
+        if p not in out:
+            s = min(range(shards), key=load.__getitem__)
+            out[p] = s
+            load[s] += 1
+
+    while True:
+        hi = max(range(shards), key=load.__getitem__)
+        lo = min(range(shards), key=load.__getitem__)
+        if load[hi] - load[lo] <= 1:
+            break
+        p = next(p for p in reversed(phones) if out[p] == hi)
+        out[p] = lo
+        load[hi] -= 1
+        load[lo] += 1
+    return out
+
+
+def _line(msg: dict) -> bytes:
+    return (json.dumps(msg, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+# ===================== DELIVERY SIDE =====================
+class ShardHub:
+    """
+    Yetkazish jarayonidagi IPC server. Shard jarayonlar topilgan hitlarni shu yerga yuboradi
+    ({"t": "item"}), hub ularni on_item orqali yagona Bot API navbatiga qo'yadi.
+    Hub har bir shardga akkauntlar ro'yxatini ({"t": "assign"}) yuboradi, shard esa
+    haqiqatda ishlayotganlarini ({"t": "running"}) qaytaradi.
+    """
+
+    def __init__(self, on_item: Callable[[OutItem], Awaitable[None]]):
+        self.on_item = on_item
+        self._writers: Dict[int, asyncio.StreamWriter] = {}
+        self.running: Dict[int, Set[str]] = {}
+        self.assigned: Dict[int, List[str]] = {}
+        self.changed = asyncio.Event()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+        self.items_received = 0
+        self.items_by_shard: Counter = Counter()
+        self.connects = 0
+        self.bad_messages = 0
+
+    async def start(self, host: str, port: int):
+        self._server = await asyncio.start_server(self._handle, host, port, limit=IPC_LINE_LIMIT)
+        print(f"🔌 Shard IPC: {host}:{port}")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        shard: Optional[int] = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    self.bad_messages += 1
+                    continue
+
+                t = msg.get("t")
+                if t == "item":
+                    item = load_item(msg["item"])
+                    self.items_received += 1
+                    self.items_by_shard[shard] += 1
+                    # Navbat to'lsa (admission block) shu yerda kutiladi -> shardga backpressure
+                    await self.on_item(item)
+                elif t == "running" and shard is not None:
+                    self.running[shard] = set(msg.get("phones") or ())
+                    self.changed.set()
+                elif t == "hello":
+                    shard = int(msg["shard"])
+                    old = self._writers.get(shard)
+                    if old is not None and old is not writer:
+                        old.close()
+                    self._writers[shard] = writer
+                    self.running[shard] = set(msg.get("running") or ())
+                    self.connects += 1
+                    print(f"🔌 Shard {shard} ulandi (pid {msg.get('pid')}, {len(self.running[shard])} akkaunt)")
+                    if shard in self.assigned:
+                        self._send(shard, {"t": "assign", "phones": self.assigned[shard]})
+                    self.changed.set()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            print(f"⚠️ Shard {shard} IPC xato: {e}")
+        finally:
+            if shard is not None and self._writers.get(shard) is writer:
+                del self._writers[shard]
+                # Jarayon o'ldi -> uning akkauntlari endi hech qayerda ishlamayapti
+                self.running.pop(shard, None)
+                self.changed.set()
+                print(f"🔌 Shard {shard} uzildi")
+            writer.close()
+
+    def _send(self, shard: int, msg: dict) -> bool:
+        w = self._writers.get(shard)
+        if w is None or w.is_closing():
+            return False
+        w.write(_line(msg))
+        return True
+
+    def assign(self, shard: int, phones: List[str]):
+        if self.assigned.get(shard) == phones:
+            return
+        self.assigned[shard] = phones
+        self._send(shard, {"t": "assign", "phones": phones})
+
+    def running_elsewhere(self, shard: int) -> Set[str]:
+        out: Set[str] = set()
+        for s, phones in self.running.items():
+            if s != shard:
+                out |= phones
+        return out
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+        for w in list(self._writers.values()):
+            w.close()
+
+    def stats(self) -> dict:
+        return {
+            "connected": sorted(self._writers),
+            "items_received": self.items_received,
+            "items_by_shard": dict(self.items_by_shard),
+            "running": {s: len(p) for s, p in sorted(self.running.items())},
+            "connects": self.connects,
+        }
+
+
+# ===================== SHARD SIDE =====================
+class ShardLink:
+    """
+    Shard jarayonidan hubga ulanish. Uzilsa qayta ulanadi; orada hitlar buffer_max gacha
+    xotirada turadi. Ota jarayon o'lsa stop hodisasini qo'yadi.
+    """
+
+    def __init__(
+        self,
+        shard: int,
+        host: str,
+        port: int,
+        on_assign: Callable[[List[str]], Awaitable[None]],
+        running: Callable[[], Iterable[str]],
+        buffer_max: int = 10000,
+        parent_pid: Optional[int] = None,
+        on_drop: Optional[Callable[[str], None]] = None,
+    ):
+        self.shard = shard
+        self.host = host
+        self.port = port
+        self.on_assign = on_assign
+        self.running = running
+        self.parent_pid = parent_pid
+        self.on_drop = on_drop
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._buffer: deque = deque(maxlen=max(1, buffer_max))
+        self._assign_lock = asyncio.Lock()
+
+        self.sent = 0
+        self.buffered_dropped = 0
+        self.reconnects = 0
+
+    async def send_item(self, item: OutItem) -> bool:
+        payload = dump_item(item)
+        w = self._writer
+        if w is None or w.is_closing():
+            if len(self._buffer) == self._buffer.maxlen:
+                self.buffered_dropped += 1
+                if self.on_drop:
+                    # deque maxlen eng eskisini chiqaradi
+                    self.on_drop(self._buffer[0])
+            self._buffer.append(payload)
+            return False
+        w.write(_line({"t": "item", "item": payload}))
+        # Hub sekinlashsa handler ham kutadi (block siyosatidagidek)
+        await w.drain()
+        self.sent += 1
+        return True
+
+    async def report_running(self):
+        w = self._writer
+        if w is not None and not w.is_closing():
+            w.write(_line({"t": "running", "phones": sorted(self.running())}))
+            await w.drain()
+
+    def _parent_alive(self) -> bool:
+        return self.parent_pid is None or os.getppid() == self.parent_pid
+
+    async def run(self, stop: asyncio.Event):
+        delay = 0.5
+        while not stop.is_set():
+            if not self._parent_alive():
+                print(f"⚠️ [shard {self.shard}] Ota jarayon yo'q - to'xtatilmoqda")
+                stop.set()
+                return
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port, limit=IPC_LINE_LIMIT)
+            except OSError:
+                await asyncio.sleep(delay)
+                delay = min(5.0, delay * 2)
+                continue
+
+            delay = 0.5
+            self.reconnects += 1
+            writer.write(_line({
+                "t": "hello", "shard": self.shard, "pid": os.getpid(), "running": sorted(self.running()),
+            }))
+            while self._buffer:
+                writer.write(_line({"t": "item", "item": self._buffer.popleft()}))
+                self.sent += 1
+            self._writer = writer
+            try:
+                await writer.drain()
+                await self._read_loop(reader)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                print(f"⚠️ [shard {self.shard}] IPC uzildi: {e}")
+            finally:
+                self._writer = None
+                writer.close()
+
+    async def _read_loop(self, reader: asyncio.StreamReader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue
+            if msg.get("t") == "assign":
+                async with self._assign_lock:
+                    await self.on_assign(list(msg.get("phones") or ()))
+                await self.report_running()
+
+    def stats(self) -> dict:
+        return {
+            "shard": self.shard,
+            "connected": self._writer is not None,
+            "sent": self.sent,
+            "buffered": len(self._buffer),
+            "buffered_dropped": self.buffered_dropped,
+            "reconnects": self.reconnects,
+        }
+
+
+# ===================== PROCESS POOL =====================
+class ShardProcessPool:
+    """N ta shard jarayon: `python main.py --shard K`. O'lsa backoff bilan qayta ishga tushiradi."""
+
+    def __init__(self, script: str, shards: int, env: Optional[Dict[str, str]] = None):
+        self.script = script
+        self.shards = max(1, shards)
+        self.env = env or {}
+        self._procs: Dict[int, asyncio.subprocess.Process] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+        self.restarts: Counter = Counter()
+
+    def start(self):
+        for k in range(self.shards):
+            self._tasks.append(asyncio.create_task(self._keep_alive(k)))
+
+    async def _keep_alive(self, shard: int):
+        delay = 1.0
+        env = dict(os.environ, SHARD_PARENT_PID=str(os.getpid()), **self.env)
+        while not self._stopping:
+            started = time.monotonic()
+            proc = await asyncio.create_subprocess_exec(sys.executable, self.script, "--shard", str(shard), env=env)
+            self._procs[shard] = proc
+            print(f"🧩 Shard {shard} ishga tushdi (pid {proc.pid})")
+            code = await proc.wait()
+            if self._stopping:
+                return
+            self.restarts[shard] += 1
+            # Uzoq ishlagan bo'lsa backoff qaytadan boshlanadi
+            if time.monotonic() - started > 60:
+                delay = 1.0
+            print(f"⚠️ Shard {shard} chiqdi (kod {code}), {delay:.0f}s dan keyin qayta ishga tushadi")
+            await asyncio.sleep(delay)
+            delay = min(60.0, delay * 2)
+
+    async def stop(self, timeout: float = 20.0):
+        self._stopping = True
+        for proc in self._procs.values():
+            if proc.returncode is None:
+                try:
+                    proc.terminate()
+                except ProcessLookupError:
+                    pass
+        for proc in self._procs.values():
+            try:
+                await asyncio.wait_for(proc.wait(), timeout)
+            except asyncio.TimeoutError:
+                proc.kill()
+        for t in self._tasks:
+            t.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "pids": {k: p.pid for k, p in sorted(self._procs.items()) if p.returncode is None},
+            "restarts": dict(self.restarts),
+        }
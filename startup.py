@@ -0,0 +1,105 @@
+import asyncio
+import json
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+
+
+# ===================== STARTUP SCHEDULER =====================
+class StartupScheduler:
+    """
+    Akkauntlarni bir vaqtda emas, navbat bilan ulash: bir vaqtda ko'pi bilan `concurrency` ta
+    client.start() / boshlang'ich dialog walk, har biridan oldin tasodifiy jitter.
+    Har bir akkaunt uchun vaqtlar (jarayon boshidan): ulandi, birinchi xabar, guruhlar tayyor.
+    """
+
+    def __init__(self, concurrency: int = 3, jitter: float = 2.0):
+        self.concurrency = max(1, concurrency)
+        self.jitter = max(0.0, jitter)
+        self._sem = asyncio.Semaphore(self.concurrency)
+        self.started_at = time.time()
+
+        self.waiting = 0
+        self.connected_at: Dict[str, float] = {}
+        self.first_message_at: Dict[str, float] = {}
+        self.synced_at: Dict[str, Tuple[float, str]] = {}   # phone -> (vaqt, "cache" | "walk")
+
+    @asynccontextmanager
+    async def slot(self):
+        self.waiting += 1
+        try:
+            await self._sem.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            if self.jitter:
+                await asyncio.sleep(random.uniform(0, self.jitter))
+            yield
+        finally:
+            self._sem.release()
+
+    def _since_start(self) -> float:
+        return time.time() - self.started_at
+
+    def mark_connected(self, phone: str):
+        self.connected_at[phone] = self._since_start()
+
+    def mark_first_message(self, phone: str):
+        if phone not in self.first_message_at:
+            self.first_message_at[phone] = self._since_start()
+
+    def mark_synced(self, phone: str, source: str):
+        self.synced_at[phone] = (self._since_start(), source)
+
+    def stats(self) -> Dict[str, dict]:
+        out = {}
+        for phone in set(self.connected_at) | set(self.first_message_at) | set(self.synced_at):
+            synced = self.synced_at.get(phone)
+            out[phone] = {
+                "connected_s": self.connected_at.get(phone),
+                "first_message_s": self.first_message_at.get(phone),
+                "groups_ready_s": synced[0] if synced else None,
+                "groups_source": synced[1] if synced else None,
+            }
+        return out
+
+
+# ===================== GROUP LIST CACHE =====================
+class GroupListCache:
+    """
+    Har bir akkauntning oxirgi ma'lum guruhlar ro'yxati lokal JSON faylda (spool/groups/).
+    Restartda yangi bo'lsa boshlang'ich dialog walk o'tkazib yuboriladi.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, phone: str) -> str:
+        clean = phone.replace("+", "").replace(" ", "")
+        return os.path.join(self.path, f"{clean}.json")
+
+    def load(self, phone: str, max_age: float) -> Optional[Tuple[Dict[int, str], float]]:
+        """(groups, yoshi sekundda) yoki None (yo'q, eskirgan yoki buzilgan)."""
+        try:
+            with open(self._file(phone), encoding="utf-8") as f:
+                data = json.load(f)
+            age = time.time() - float(data.get("saved_at") or 0)
+            if age > max_age:
+                return None
+            groups = {int(gid): name for gid, name in (data.get("groups") or {}).items()}
+            return groups, age
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def save(self, phone: str, groups: Dict[int, str]):
+        path = self._file(phone)
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"saved_at": time.time(), "groups": groups}, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"⚠️ [{phone}] Guruhlar keshini saqlab bo'lmadi: {e}")
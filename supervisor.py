@@ -0,0 +1,202 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional
+
+
+class RunResult(NamedTuple):
+    """run_client natijasi: restart=False -> qayta ishga tushirilmaydi (relogin kerak va h.k.)."""
+    restart: bool
+    reason: str = ""
+    retry_after: float = 0.0    # FloodWait: kamida shuncha kutiladi
+
+
+# ===================== ACCOUNT STATE =====================
+class AccountState:
+    def __init__(self):
+        self.state = "new"          # connecting | running | backoff | fatal | stopped
+        self.starts = 0
+        self.restarts = 0
+        self.storms = 0
+        self.first_start: Optional[float] = None
+        self.up_since: Optional[float] = None
+        self.uptime_total = 0.0
+        self.last_reason = ""
+        self.next_restart_at: Optional[float] = None
+        self.recent: deque = deque()   # oxirgi restart vaqtlari (storm aniqlash)
+
+    def connecting(self):
+        """Ulanish urinishi boshlandi: coverage shu paytdan hisoblanadi, uptime esa hali yo'q."""
+        if self.first_start is None:
+            self.first_start = time.time()
+        self.state = "connecting"
+        self.next_restart_at = None
+
+    def begin(self):
+        """Client haqiqatan ishga tushdi (start/auth muvaffaqiyatli)."""
+        now = time.time()
+        if self.first_start is None:
+            self.first_start = now
+        self.up_since = now
+        self.starts += 1
+        self.state = "running"
+        self.next_restart_at = None
+
+    def end(self) -> float:
+        """Joriy ishlash davrini yopadi, uning davomiyligini qaytaradi."""
+        if self.up_since is None:
+            return 0.0
+        up = time.time() - self.up_since
+        self.uptime_total += up
+        self.up_since = None
+        return up
+
+    def uptime(self) -> float:
+        return self.uptime_total + (time.time() - self.up_since if self.up_since else 0.0)
+
+    def coverage(self) -> float:
+        """Birinchi ishga tushishdan beri ulangan vaqt ulushi."""
+        if self.first_start is None:
+            return 0.0
+        total = time.time() - self.first_start
+        return min(1.0, self.uptime() / total) if total > 0 else 1.0
+
+
+# ===================== ACCOUNT SUPERVISOR =====================
+class AccountSupervisor:
+    """
+    Har bir akkaunt uchun bitta uzoq yashovchi task: run(phone) tugasa (tarmoq uzilishi va h.k.)
+    eksponensial backoff + jitter bilan qayta ishga tushiriladi, FloodWait bo'lsa kamida Telegram
+    aytgan vaqt kutiladi. storm_window ichida storm_max ta restart bo'lsa akkaunt storm_cooldown
+    ga qo'yiladi. Uzoq (stable_after) ishlagan bo'lsa backoff boshidan boshlanadi. Uptime run()
+    mark_started(phone) chaqirgandan keyin hisoblanadi - ulanish/auth vaqti va muvaffaqiyatsiz
+    ulanishlar coverage'ga kirmaydi. should_run(phone) False bo'lsa (admin o'chirgan) akkaunt
+    qayta ulanmaydi.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[str], Awaitable[RunResult]],
+        base_delay: float = 5.0,
+        max_delay: float = 600.0,
+        jitter: float = 0.2,
+        storm_max: int = 5,
+        storm_window: float = 600.0,
+        storm_cooldown: float = 1800.0,
+        stable_after: float = 300.0,
+        on_storm: Optional[Callable[[str, str], Awaitable[None]]] = None,
+        on_backoff: Optional[Callable[[str, float], Awaitable[None]]] = None,
+        should_run: Optional[Callable[[str], bool]] = None,
+    ):
+        self.run = run
+        self.base_delay = max(0.0, base_delay)
+        self.max_delay = max(self.base_delay, max_delay)
+        self.jitter = min(1.0, max(0.0, jitter))
+        self.storm_max = max(1, storm_max)
+        self.storm_window = storm_window
+        self.storm_cooldown = storm_cooldown
+        self.stable_after = stable_after
+        self.on_storm = on_storm
+        self.on_backoff = on_backoff
+        self.should_run = should_run
+        self.accounts: Dict[str, AccountState] = {}
+
+    def state(self, phone: str) -> AccountState:
+        st = self.accounts.get(phone)
+        if st is None:
+            st = self.accounts[phone] = AccountState()
+        return st
+
+    def mark_started(self, phone: str):
+        """run(phone) client ulangandan keyin chaqiradi - uptime shundan boshlanadi."""
+        self.state(phone).begin()
+
+    def backoff(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _wanted(self, phone: str) -> bool:
+        if self.should_run is None or self.should_run(phone):
+            return True
+        st = self.state(phone)
+        st.state = "stopped"
+        st.next_restart_at = None
+        print(f"⏹ [{phone}] Akkaunt faol emas - qayta ulanmaydi")
+        return False
+
+    async def supervise(self, phone: str):
+        st = self.state(phone)
+        attempt = 0
+        while True:
+            if not self._wanted(phone):
+                return
+            st.connecting()
+            try:
+                result = await self.run(phone)
+            except asyncio.CancelledError:
+                st.end()
+                st.state = "stopped"
+                raise
+            except Exception as e:
+                result = RunResult(True, f"{type(e).__name__}: {e}")
+            up = st.end()
+            st.last_reason = result.reason
+
+            if not self._wanted(phone):
+                return
+            if not result.restart:
+                st.state = "fatal"
+                print(f"⛔ [{phone}] Qayta ishga tushirilmaydi: {result.reason}")
+                return
+
+            if up >= self.stable_after:
+                attempt = 0
+            delay = max(self.backoff(attempt), result.retry_after)
+            attempt += 1
+
+            now = time.time()
+            st.recent.append(now)
+            while st.recent and now - st.recent[0] > self.storm_window:
+                st.recent.popleft()
+            if len(st.recent) >= self.storm_max:
+                st.storms += 1
+                st.recent.clear()
+                delay = max(delay, self.storm_cooldown)
+                print(f"🌪 [{phone}] {self.storm_max} ta restart {int(self.storm_window)}s ichida - {int(delay)}s pauza")
+                if self.on_storm:
+                    try:
+                        await self.on_storm(phone, result.reason)
+                    except Exception as e:
+                        print(f"⚠️ [{phone}] on_storm xato: {e}")
+
+            st.restarts += 1
+            st.state = "backoff"
+            st.next_restart_at = now + delay
+            print(f"🔁 [{phone}] {delay:.0f}s dan keyin qayta ulanadi (restart #{st.restarts}): {result.reason}")
+            if self.on_backoff:
+                try:
+                    await self.on_backoff(phone, delay)
+                except Exception as e:
+                    print(f"⚠️ [{phone}] on_backoff xato: {e}")
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                st.state = "stopped"
+                st.next_restart_at = None
+                raise
+
+    def stats(self) -> Dict[str, dict]:
+        now = time.time()
+        return {
+            phone: {
+                "state": st.state,
+                "uptime_s": st.uptime(),
+                "coverage": st.coverage(),
+                "restarts": st.restarts,
+                "storms": st.storms,
+                "last_reason": st.last_reason,
+                "next_restart_in": max(0.0, st.next_restart_at - now) if st.next_restart_at else None,
+            }
+            for phone, st in self.accounts.items()
+        }
@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController
+from outbox import MemorySendQueue, SqliteSendQueue, make_item
+
+
+def _item(n, cache_key=None, priority=0):
+    return make_item(
+        cache_key=cache_key or (1, n),
+        text=f"t{n}",
+        group_link="",
+        message_link="",
+        urls=[],
+        group_name="g",
+        phone="+1",
+        priority=priority,
+    )
+
+
+def _setup(queue, budget=5, policy="drop_oldest"):
+    evicted = []
+
+    def remove(item):
+        evicted.append(item)
+        return queue.discard(item)
+
+    return AdmissionController(budget=budget, policy=policy, remove=remove), evicted
+
+
+async def _enqueue(adm, queue, item):
+    if not await adm.admit(item):
+        return False
+    queue.put_nowait(item)
+    return True
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def queue(request, tmp_path):
+    q = MemorySendQueue() if request.param == "memory" else SqliteSendQueue(str(tmp_path / "outbox.sqlite3"))
+    yield q
+    q.close()
+
+
+def test_drop_oldest_removes_evicted_from_queue(queue):
+    async def run():
+        adm, evicted = _setup(queue)
+        for n in range(12):
+            assert await _enqueue(adm, queue, _item(n))
+        assert adm.inflight == 5
+        assert queue.qsize() == 5
+        assert adm.evicted == 7 and len(evicted) == 7
+        assert [it.text for it in evicted] == [f"t{n}" for n in range(7)]
+
+        got = []
+        while queue.qsize():
+            item = await queue.get()
+            adm.take(item)
+            adm.release(item)
+            got.append(item.text)
+        assert got == [f"t{n}" for n in range(7, 12)]
+        assert adm.inflight == 0
+
+    asyncio.run(run())
+
+
+def test_duplicate_cache_keys_are_tracked_separately(queue):
+    async def run():
+        adm, evicted = _setup(queue, budget=2)
+        for n in range(4):
+            assert await _enqueue(adm, queue, _item(n, cache_key=(1, 1)))
+        assert adm.inflight == 2 and queue.qsize() == 2
+        assert len(evicted) == 2
+        while queue.qsize():
+            item = await queue.get()
+            adm.take(item)
+            adm.release(item)
+        assert adm.inflight == 0
+
+    asyncio.run(run())
+
+
+def test_taken_item_is_not_evicted():
+    async def run():
+        queue = MemorySendQueue()
+        adm, evicted = _setup(queue, budget=1)
+        await _enqueue(adm, queue, _item(0))
+        sending = await queue.get()
+        adm.take(sending)
+        # Yuborilayotgan xabar byudjetni band qiladi, lekin qurbon bo'lmaydi
+        assert not await adm.admit(_item(1))
+        assert evicted == [] and adm.shed == 1
+        adm.release(sending)
+        assert adm.inflight == 0
+        assert await adm.admit(_item(2))
+
+    asyncio.run(run())
+
+
+def test_drop_lowest_keeps_higher_priority():
+    async def run():
+        queue = MemorySendQueue()
+        adm, evicted = _setup(queue, budget=2, policy="drop_lowest")
+        await _enqueue(adm, queue, _item(0, priority=3))
+        await _enqueue(adm, queue, _item(1, priority=1))
+        assert not await adm.admit(_item(2, priority=1))
+        assert await _enqueue(adm, queue, _item(3, priority=5))
+        assert [it.text for it in evicted] == ["t1"]
+        assert queue.qsize() == 2 and adm.inflight == 2
+
+    asyncio.run(run())
+
+
+def test_block_times_out_and_sheds():
+    async def run():
+        adm = AdmissionController(budget=1, policy="block", block_timeout=0.05)
+        assert await adm.admit(_item(0))
+        assert not await adm.admit(_item(1))
+        assert adm.delayed == 1 and adm.shed == 1
+
+    asyncio.run(run())
+
+
+def test_reject_frees_budget():
+    async def run():
+        adm = AdmissionController(budget=1)
+        item = _item(0)
+        assert await adm.admit(item)
+        adm.reject(item)
+        assert adm.inflight == 0 and adm.shed == 1
+
+    asyncio.run(run())
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        AdmissionController(policy="random")
+
+
+def test_drop_lowest_heap_stays_bounded():
+    async def run():
+        adm = AdmissionController(budget=100, policy="drop_lowest")
+        for n in range(20000):
+            item = _item(n, priority=n % 7)
+            assert await adm.admit(item)
+            adm.take(item)
+            adm.release(item)
+        assert adm.inflight == 0
+        assert len(adm._heap) <= 2 * adm.budget + 64
+
+        # Budjet to'lib, qurbon tanlanadigan holatda ham
+        for n in range(5000):
+            await adm.admit(_item(n, priority=n % 7))
+        assert adm.inflight == adm.budget
+        assert len(adm._heap) <= 2 * adm.budget + 64
+
+    asyncio.run(run())
@@ -0,0 +1,132 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+
+from bot_transport import BotResponse, BotTransport, CircuitBreaker, CircuitOpen, RetryBudget
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_breaker_opens_after_threshold(clock):
+    b = CircuitBreaker(failure_threshold=3, reset_timeout=5)
+    for _ in range(2):
+        b.before()
+        b.on_failure()
+    assert b.state == "closed"
+    b.on_failure()
+    assert b.state == "open"
+    with pytest.raises(CircuitOpen) as exc:
+        b.before()
+    assert exc.value.retry_in == pytest.approx(5)
+    assert b.rejected == 1
+
+
+def test_half_open_single_probe_and_backoff(clock):
+    b = CircuitBreaker(failure_threshold=1, reset_timeout=5, max_reset_timeout=15)
+    b.on_failure()
+    clock[0] += 5
+    assert b.before() is True
+    assert b.state == "half_open"
+    # Probe javobini kutayotganda boshqalar o'tmaydi
+    with pytest.raises(CircuitOpen):
+        b.before()
+    b.on_failure()
+    assert b.state == "open" and b.reset_timeout == 10
+    clock[0] += 10
+    b.before()
+    b.on_failure()
+    assert b.reset_timeout == 15
+    clock[0] += 15
+    b.before()
+    b.on_success()
+    assert b.state == "closed" and b.reset_timeout == 5
+
+
+def test_check_does_not_change_state(clock):
+    b = CircuitBreaker(failure_threshold=1, reset_timeout=5)
+    b.check()
+    b.on_failure()
+    with pytest.raises(CircuitOpen):
+        b.check()
+    clock[0] += 5
+    b.check()
+    assert b.state == "open" and b.rejected == 0
+
+
+def test_release_frees_probe(clock):
+    b = CircuitBreaker(failure_threshold=1, reset_timeout=1)
+    b.on_failure()
+    clock[0] += 1
+    assert b.before() is True
+    b.release()
+    assert b.before() is True
+
+
+def test_retry_budget_ratio(clock):
+    budget = RetryBudget(ratio=0.5, min_retries=1, window=10)
+    for _ in range(4):
+        budget.record()
+    # 1 + 0.5 * 4 = 3 ta retry
+    assert [budget.can_retry() for _ in range(4)] == [True, True, True, False]
+    clock[0] += 11
+    assert budget.can_retry() is True
+    assert budget.denied == 1
+
+
+def test_pools_have_separate_breakers():
+    t = BotTransport(breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60))
+    assert t.pool_for("getUpdates") == "poll" and t.pool_for("sendMessage") == "send"
+    t.breakers["send"].on_failure()
+    with pytest.raises(CircuitOpen):
+        t.check("sendMessage")
+    t.check("getUpdates")
+    assert t.breakers["send"].name == "send"
+
+
+def test_response_helpers():
+    r = BotResponse(429, {"parameters": {"retry_after": "7"}, "description": "Too Many Requests"})
+    assert not r.ok and r.retry_after == 7 and r.description == "Too Many Requests"
+    assert BotResponse(200, {}).retry_after is None
+
+
+def test_request_5xx_counts_as_failure():
+    async def run():
+        statuses = [502, 502, 200]
+
+        async def handler(request):
+            status = statuses.pop(0)
+            return web.json_response({"ok": status == 200}, status=status)
+
+        app = web.Application()
+        app.router.add_post("/bottok/sendMessage", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        t = BotTransport(base_url=f"http://127.0.0.1:{port}",
+                         breaker=CircuitBreaker(failure_threshold=2, reset_timeout=0.05))
+        try:
+            for _ in range(2):
+                resp = await t.request("tok", "sendMessage", {"text": "x"})
+                assert resp.status == 502
+            with pytest.raises(CircuitOpen):
+                await t.request("tok", "sendMessage", {"text": "x"})
+            await asyncio.sleep(0.06)
+            resp = await t.request("tok", "sendMessage", {"text": "x"})
+            assert resp.ok and resp.data == {"ok": True}
+            assert t.breakers["send"].state == "closed"
+            assert t.stats()["endpoints"]["sendMessage"]["errors"] == 2
+        finally:
+            await t.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
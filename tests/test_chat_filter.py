@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from chat_filter import ChatGate
+
+
+def _msg(chat_id, text="yuk bor", service=None, caption=None):
+    chat = SimpleNamespace(id=chat_id) if chat_id is not None else None
+    return SimpleNamespace(chat=chat, text=text, caption=caption, service=service)
+
+
+def test_blocklist_mode():
+    gate = ChatGate("blocklist", always_blocked=[-1])
+    gate.load([{"group_id": -2, "is_blocked": True}, {"group_id": -3, "is_blocked": False}])
+    assert gate.reason(-1, True) == "blocked"
+    assert gate.reason(-2, True) == "blocked"
+    assert gate.reason(-3, True) is None
+    # blocklist rejimida kuzatilmagan guruh ham o'tadi
+    assert gate.reason(-4, True) is None
+    assert gate.reason(-3, False) == "no_text"
+
+
+def test_allowlist_mode():
+    gate = ChatGate("allowlist")
+    gate.load([{"group_id": "-3", "is_blocked": False}, {"group_id": None}])
+    assert gate.reason(-3, True) is None
+    assert gate.reason(-4, True) == "not_watched"
+    gate.allow([-4])
+    assert gate.reason(-4, True) is None
+
+
+def test_apply_delta_keeps_always_blocked():
+    gate = ChatGate("allowlist", always_blocked=[-1])
+    gate.load([{"group_id": -2, "is_blocked": False}, {"group_id": -5, "is_blocked": True}])
+    version = gate.version
+    gate.apply(
+        [{"group_id": -2, "is_blocked": True}, {"group_id": -1, "is_blocked": False},
+         {"group_id": -6, "is_blocked": False}],
+        deleted_ids=[-5, -1],
+    )
+    assert gate.version == version + 1
+    assert -2 in gate.blocked and -2 not in gate.allowed
+    # Haydovchilar guruhi deltadan qat'i nazar bloklangan
+    assert -1 in gate.blocked and -1 not in gate.allowed
+    assert -5 not in gate.blocked
+    assert -6 in gate.allowed
+
+
+def test_check_counts_reasons():
+    gate = ChatGate("blocklist", always_blocked=[-1])
+    assert gate.check(_msg(-2)) is True
+    assert gate.check(_msg(-2, text=None, caption="rasm ostida yuk")) is True
+    assert gate.check(_msg(-1)) is False
+    assert gate.check(_msg(-2, text=None)) is False
+    assert gate.check(_msg(-2, service=True)) is False
+    assert gate.check(_msg(None)) is False
+    stats = gate.stats()
+    assert stats["passed"] == 2
+    assert stats["filtered_by_reason"] == {"blocked": 1, "no_text": 2}
+    assert stats["filtered_by_chat"][0] == (-2, 2)
+
+
+def test_filter_runs_gate():
+    gate = ChatGate("blocklist", always_blocked=[-1])
+    f = gate.filter()
+    assert asyncio.run(f(None, _msg(-1))) is False
+    assert asyncio.run(f(None, _msg(-2))) is True
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        ChatGate("everything")
@@ -0,0 +1,135 @@
+import asyncio
+
+from config_sync import ConfigSync
+from repository import MemoryRepository
+
+
+class PollingRepository(MemoryRepository):
+    """Change stream yo'q backend (Supabase kabi): ConfigSync updated_at bo'yicha so'raydi."""
+
+    def subscribe(self, callback):
+        return False
+
+
+class Recorder:
+    def __init__(self):
+        self.full = []
+        self.upserts = []
+        self.deletes = []
+
+    def on_full(self, rows):
+        self.full = rows
+
+    def on_change(self, upserts, deletes):
+        self.upserts.extend(upserts)
+        self.deletes.extend(deletes)
+
+
+def _sync(repo, rec, table="keywords", columns="id, keyword, updated_at", key=("id",), page_size=1000):
+    sync = ConfigSync(repo, poll_interval=3600, page_size=page_size)
+    sync.watch(table, columns, list(key), rec.on_full, rec.on_change)
+    return sync
+
+
+def _bulk_stamp(repo, table, pred, stamp="2099-01-01T00:00:00+00:00"):
+    # Bitta UPDATE statement: trigger hamma qatorga bir xil now() qo'yadi
+    for row in repo.tables[table]:
+        if pred(row):
+            row["updated_at"] = stamp
+
+
+def test_poll_applies_only_changes():
+    async def run():
+        repo = PollingRepository({"keywords": [{"keyword": f"k{i}"} for i in range(3)]})
+        rec = Recorder()
+        sync = _sync(repo, rec)
+        await sync.start()
+        sync._task.cancel()
+        assert len(rec.full) == 3
+
+        feed = sync.feeds["keywords"]
+        await sync._poll(feed)
+        assert rec.upserts == []
+
+        await repo.update("keywords", {"keyword": "new"}, {"id": 2})
+        await sync._poll(feed)
+        assert [(r["id"], r["keyword"]) for r in rec.upserts] == [(2, "new")]
+
+        await sync._poll(feed)
+        assert len(rec.upserts) == 1
+
+    asyncio.run(run())
+
+
+def test_poll_does_not_stall_when_page_shares_one_stamp():
+    """page_size dan ko'p qator bir xil updated_at bilan - kursor oldinga siljishi kerak."""
+    async def run():
+        repo = PollingRepository({"keywords": [{"keyword": f"k{i}"} for i in range(5)]})
+        rec = Recorder()
+        sync = _sync(repo, rec, page_size=3)
+        await sync.start()
+        sync._task.cancel()
+
+        await repo.insert("keywords", [{"keyword": f"b{i}"} for i in range(10)])
+        _bulk_stamp(repo, "keywords", lambda r: r["keyword"].startswith("b"))
+        await repo.insert("keywords", [{"keyword": "after"}])
+
+        await sync._poll(sync.feeds["keywords"])
+        assert sorted(r["keyword"] for r in rec.upserts) == sorted([f"b{i}" for i in range(10)] + ["after"])
+
+        rec.upserts.clear()
+        await sync._poll(sync.feeds["keywords"])
+        assert rec.upserts == []
+
+    asyncio.run(run())
+
+
+def test_poll_pages_by_composite_key():
+    async def run():
+        repo = PollingRepository()
+        rec = Recorder()
+        sync = _sync(repo, rec, table="account_groups", columns="phone_number, group_id, updated_at",
+                     key=("phone_number", "group_id"), page_size=4)
+        await sync.start()
+        sync._task.cancel()
+
+        rows = [{"phone_number": p, "group_id": g} for p in ("+1", "+2", "+3") for g in range(5)]
+        await repo.insert("account_groups", rows)
+        _bulk_stamp(repo, "account_groups", lambda r: True)
+
+        await sync._poll(sync.feeds["account_groups"])
+        assert sorted((r["phone_number"], r["group_id"]) for r in rec.upserts) == \
+            sorted((r["phone_number"], r["group_id"]) for r in rows)
+
+    asyncio.run(run())
+
+
+def test_change_stream_events():
+    async def run():
+        repo = MemoryRepository({"keywords": [{"keyword": "a"}]})
+        rec = Recorder()
+        sync = _sync(repo, rec)
+        await sync.start()
+        sync._task.cancel()
+        assert sync.streaming
+
+        await repo.insert("keywords", [{"keyword": "b"}])
+        await repo.delete("keywords", {"keyword": "a"})
+        assert [r["keyword"] for r in rec.upserts] == ["b"]
+        assert [r["keyword"] for r in rec.deletes] == ["a"]
+
+    asyncio.run(run())
+
+
+def test_select_since_keyset():
+    async def run():
+        repo = MemoryRepository()
+        await repo.insert("keywords", [{"keyword": f"k{i}"} for i in range(6)])
+        _bulk_stamp(repo, "keywords", lambda r: True, stamp="2030-01-01T00:00:00+00:00")
+        since = "2030-01-01T00:00:00+00:00"
+        first = await repo.select_since("keywords", "id", "updated_at", since, limit=4, key=("id",))
+        assert [r["id"] for r in first] == [1, 2, 3, 4]
+        rest = await repo.select_since("keywords", "id", "updated_at", since, limit=4, key=("id",), after=(4,))
+        assert [r["id"] for r in rest] == [5, 6]
+
+    asyncio.run(run())
@@ -0,0 +1,102 @@
+import time
+
+from dedupe import MemoryDedupeStore, SqliteDedupeStore, create_dedupe_store
+
+
+def test_memory_store_marks_second_sighting():
+    store = MemoryDedupeStore(window=60)
+    assert store.seen((1, 10)) is False
+    assert store.seen((1, 10)) is True
+    assert store.seen((1, 11)) is False
+    assert store.stats()["hits"] == 1
+    assert not store.shared
+
+
+def test_empty_store_is_falsy_but_not_none():
+    # main.py None bilan solishtiradi: bo'sh store ham kalitni yozishi kerak
+    store = create_dedupe_store("memory", 60)
+    assert store is not None and len(store) == 0
+    assert store.seen((1, 1)) is False
+    assert len(store) == 1
+
+
+def test_memory_store_window_expires(monkeypatch):
+    store = MemoryDedupeStore(window=10)
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    assert store.seen("k") is False
+    now[0] += 11
+    assert store.seen("k") is False
+    assert store.seen("k") is True
+
+
+def test_memory_store_bounded():
+    store = MemoryDedupeStore(window=60, max_size=3)
+    for i in range(5):
+        store.seen(i)
+    assert len(store) == 3
+    assert store.seen(0) is False
+
+
+def test_memory_forget_lets_next_account_retry():
+    # Navbatga kirmagan hit belgisi olib tashlanadi - boshqa akkaunt uni qayta olib keladi
+    store = MemoryDedupeStore(window=60)
+    assert store.seen((1, 10)) is False
+    store.forget((1, 10))
+    assert store.seen((1, 10)) is False
+    assert store.seen((1, 10)) is True
+    store.forget((9, 9))
+
+
+def test_sqlite_forget_is_visible_to_other_shards(tmp_path):
+    path = str(tmp_path / "dedupe.sqlite3")
+    shard_a = SqliteDedupeStore(path, window=60)
+    shard_b = SqliteDedupeStore(path, window=60)
+    try:
+        assert shard_a.seen((5, 1)) is False
+        shard_a.forget((5, 1))
+        assert shard_b.seen((5, 1)) is False
+        assert shard_a.seen((5, 1)) is True
+    finally:
+        shard_a.close()
+        shard_b.close()
+
+
+def test_sqlite_store_shared_between_shards(tmp_path):
+    path = str(tmp_path / "dedupe.sqlite3")
+    shard_a = SqliteDedupeStore(path, window=60)
+    shard_b = SqliteDedupeStore(path, window=60)
+    try:
+        assert shard_a.shared and shard_b.shared
+        assert shard_a.seen((5, 1)) is False
+        # Boshqa shard (yoki hub) shu kalitni allaqachon ko'rilgan deb biladi
+        assert shard_b.seen((5, 1)) is True
+        assert shard_b.seen((5, 2)) is False
+    finally:
+        shard_a.close()
+        shard_b.close()
+
+
+def test_shared_store_is_checked_once_per_hit(tmp_path):
+    """Shard + sqlite: hub qayta tekshirsa har bir hit takror bo'lib qolardi."""
+    path = str(tmp_path / "dedupe.sqlite3")
+    shard = create_dedupe_store("sqlite", 60, path=path)
+    hub = create_dedupe_store("sqlite", 60, path=path)
+    try:
+        delivered = []
+        for key in [(1, 1), (1, 2), (1, 1)]:
+            if shard.seen(key):
+                continue
+            # hub on_item: shared store -> qayta tekshirilmaydi
+            if not hub.shared and hub.seen(key):
+                continue
+            delivered.append(key)
+        assert delivered == [(1, 1), (1, 2)]
+    finally:
+        shard.close()
+        hub.close()
+
+
+def test_off_backend():
+    assert create_dedupe_store("off", 60) is None
+    assert create_dedupe_store("memory", 0) is None
@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+from pyrogram import raw, utils
+from pyrogram.errors import FloodWait
+
+import dialog_sync
+from dialog_sync import DialogWalker, group_title
+
+
+def _channel(cid, title, megagroup=True, left=False):
+    return raw.types.Channel(id=cid, title=title, photo=raw.types.ChatPhotoEmpty(), date=0,
+                             megagroup=megagroup, left=left, access_hash=1)
+
+
+def _dialog(peer, top):
+    return raw.types.Dialog(peer=peer, top_message=top, read_inbox_max_id=0, read_outbox_max_id=0,
+                            unread_count=0, unread_mentions_count=0, unread_reactions_count=0,
+                            notify_settings=raw.types.PeerNotifySettings())
+
+
+def _page(cids, count):
+    """Har channel uchun bitta dialog va uning oxirgi xabari."""
+    dialogs, messages, chats = [], [], []
+    for cid in cids:
+        peer = raw.types.PeerChannel(channel_id=cid)
+        dialogs.append(_dialog(peer, top=cid * 10))
+        messages.append(raw.types.Message(id=cid * 10, peer_id=peer, date=1000 - cid, message=""))
+        chats.append(_channel(cid, f"G{cid}"))
+    return raw.types.messages.DialogsSlice(count=count, dialogs=dialogs, messages=messages, chats=chats, users=[])
+
+
+class FakeClient:
+    def __init__(self, pages, flood_at=()):
+        self.pages = pages
+        self.flood_at = set(flood_at)
+        self.requests = []
+
+    async def invoke(self, query):
+        self.requests.append((query.offset_id, query.offset_date))
+        n = len(self.requests)
+        if n in self.flood_at:
+            raise FloodWait(value=3)
+        page = next(p for off, p in self.pages if off == query.offset_id)
+        return page
+
+    async def resolve_peer(self, peer_id):
+        return raw.types.InputPeerChannel(channel_id=utils.get_channel_id(peer_id), access_hash=1)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls = []
+
+    async def fake_sleep(s):
+        calls.append(s)
+
+    monkeypatch.setattr(dialog_sync.asyncio, "sleep", fake_sleep)
+    return calls
+
+
+def _pages():
+    # offset_id 0 -> 1-sahifa (2 ta), 20 -> 2-sahifa (2 ta), 40 -> oxirgi (1 ta, limitdan kam)
+    return [(0, _page([1, 2], 5)), (20, _page([3, 4], 5)), (40, _page([5], 5))]
+
+
+def test_walk_pages_through_all_groups(sleeps):
+    client = FakeClient(_pages())
+    walker = DialogWalker(client, "+1", page_size=2)
+    groups = asyncio.run(walker.walk())
+    assert groups == {utils.get_channel_id(c): f"G{c}" for c in range(1, 6)}
+    # Keyingi sahifa oldingisining oxirgi dialogidan (top_message va uning sanasi)
+    assert client.requests == [(0, 0), (20, 998), (40, 996)]
+    assert walker.walks == 1 and not sleeps
+
+
+def test_floodwait_resumes_from_last_page(sleeps):
+    client = FakeClient(_pages(), flood_at=[2])
+    walker = DialogWalker(client, "+1", page_size=2)
+    groups = asyncio.run(walker.walk())
+    assert len(groups) == 5
+    assert sleeps == [4]
+    assert walker.flood_waits == 1
+    # 1-sahifa qayta so'ralmaydi
+    assert [off for off, _ in client.requests] == [0, 20, 20, 40]
+
+
+def test_too_many_floodwaits_keep_cursor_for_next_walk(sleeps):
+    client = FakeClient(_pages(), flood_at=[2, 3])
+    walker = DialogWalker(client, "+1", page_size=2, max_flood_waits=1)
+    with pytest.raises(FloodWait):
+        asyncio.run(walker.walk())
+    assert walker.cursor.pages == 1
+
+    groups = asyncio.run(walker.walk())
+    assert len(groups) == 5
+    assert walker.resumes == 1
+    assert [off for off, _ in client.requests] == [0, 20, 20, 20, 40]
+
+
+def test_group_title_filters_non_groups():
+    chats = {
+        1: _channel(1, "Guruh"),
+        2: _channel(2, "Kanal", megagroup=False),
+        3: _channel(3, "Chiqilgan", left=True),
+        4: raw.types.Chat(id=4, title="", photo=raw.types.ChatPhotoEmpty(), participants_count=3,
+                          date=0, version=1),
+        5: raw.types.Chat(id=5, title="Eski", photo=raw.types.ChatPhotoEmpty(), participants_count=3,
+                          date=0, version=1, deactivated=True),
+    }
+    assert group_title(raw.types.PeerChannel(channel_id=1), chats) == "Guruh"
+    assert group_title(raw.types.PeerChannel(channel_id=2), chats) is None
+    assert group_title(raw.types.PeerChannel(channel_id=3), chats) is None
+    assert group_title(raw.types.PeerChat(chat_id=4), chats) == "Guruh -4"
+    assert group_title(raw.types.PeerChat(chat_id=5), chats) is None
+    assert group_title(raw.types.PeerUser(user_id=9), chats) is None
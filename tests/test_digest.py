@@ -0,0 +1,61 @@
+from digest import TELEGRAM_TEXT_LIMIT, DigestController, build_digests, oldest_latency
+from outbox import make_item
+
+
+def _item(n, body="Toshkentdan Samarqandga yuk bor", group="Yuk <guruh>"):
+    return make_item(
+        cache_key=(-100, n),
+        text="",
+        group_link="",
+        message_link=f"https://t.me/c/100/{n}",
+        urls=[],
+        group_name=group,
+        sender_html='<a href="tg://user?id=1">Ali</a>',
+        body=body,
+    )
+
+
+def test_controller_hysteresis():
+    dc = DigestController(depth_on=100, depth_off=10, latency_on=30)
+    assert dc.update(50, 0) is False
+    assert dc.update(100, 0) is True
+    # depth_off dan pastga tushmaguncha yoqiq qoladi
+    assert dc.update(50, 0) is True
+    assert dc.update(10, 20) is True
+    assert dc.update(10, 5) is False
+    assert dc.switches == 2
+
+
+def test_controller_latency_trigger_and_disabled():
+    assert DigestController(latency_on=30).update(0, 31) is True
+    assert DigestController(enabled=False).update(10**6, 10**6) is False
+
+
+def test_digest_splits_by_item_count():
+    digests = build_digests([_item(i) for i in range(45)], max_items=20)
+    assert [len(items) for _, _, items in digests] == [20, 20, 5]
+    text, keyboard, items = digests[0]
+    assert text.startswith("📦 <b>Yangi buyurtmalar (20 ta)</b>")
+    assert len(keyboard) == 4 and all(len(row) <= 5 for row in keyboard)
+    assert keyboard[0][0]["url"] == items[0].message_link
+
+
+def test_digest_fits_telegram_limit():
+    items = [_item(i, body="x" * 390) for i in range(60)]
+    digests = build_digests(items, max_items=100)
+    assert sum(len(chunk) for _, _, chunk in digests) == 60
+    assert all(len(text) <= TELEGRAM_TEXT_LIMIT for text, _, _ in digests)
+    assert len(digests) > 1
+
+
+def test_digest_truncates_and_escapes_body():
+    text, _, _ = build_digests([_item(1, body="<b>" + "y" * 1000)], body_limit=100)[0]
+    assert "&lt;b&gt;" in text and "…" in text
+    assert "Yuk &lt;guruh&gt;" in text
+    assert len(text) < 400
+
+
+def test_oldest_latency():
+    item = _item(1)._replace(enqueued_at=100.0)
+    assert oldest_latency(item, now=130.0) == 30.0
+    assert oldest_latency(None) == 0.0
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+import main
+from chat_filter import ChatGate
+from repository import MemoryRepository
+from startup import GroupListCache
+
+DRIVERS = main.DRIVERS_GROUP_ID
+
+
+class FailingDeleteRepository(MemoryRepository):
+    async def delete_account_groups(self, phone, group_ids, chunk_size=200):
+        raise ConnectionError("db down")
+
+
+@pytest.fixture
+def repo(monkeypatch, tmp_path):
+    r = MemoryRepository()
+    monkeypatch.setattr(main, "repo", r)
+    monkeypatch.setattr(main, "account_groups_cache", {})
+    monkeypatch.setattr(main, "watched_groups_cache", set())
+    monkeypatch.setattr(main, "account_dialog_groups", {})
+    monkeypatch.setattr(main, "account_stats", {})
+    monkeypatch.setattr(main, "chat_gate", ChatGate("allowlist", always_blocked=[DRIVERS]))
+    monkeypatch.setattr(main, "group_list_cache", GroupListCache(str(tmp_path / "groups")))
+    monkeypatch.setattr(main, "GROUP_SYNC_CHUNK", 2)
+    return r
+
+
+def _groups(*ids):
+    return [{"group_id": gid, "group_name": f"G{gid}"} for gid in ids]
+
+
+def _account_rows(r, phone="+1"):
+    return sorted(row["group_id"] for row in r.tables.get("account_groups", []) if row["phone_number"] == phone)
+
+
+def test_account_groups_diff(repo):
+    counts = asyncio.run(main.sync_account_groups("+1", _groups(-1, -2, -3)))
+    assert counts == {"inserted": 3, "removed": 0, "unchanged": 0, "failed": 0}
+
+    # -1 dan chiqildi, -4 ga qo'shildi: faqat farq yoziladi
+    counts = asyncio.run(main.sync_account_groups("+1", _groups(-2, -3, -4)))
+    assert counts == {"inserted": 1, "removed": 1, "unchanged": 2, "failed": 0}
+    assert _account_rows(repo) == [-4, -3, -2]
+
+
+def test_partial_sync_never_removes(repo):
+    asyncio.run(main.sync_account_groups("+1", _groups(-1, -2)))
+    counts = asyncio.run(main.sync_account_groups("+1", _groups(-3), complete=False))
+    assert counts["removed"] == 0
+    assert _account_rows(repo) == [-3, -2, -1]
+
+
+def test_failed_delete_is_reported_and_retried(repo, monkeypatch):
+    asyncio.run(main.sync_account_groups("+1", _groups(-1, -2)))
+    monkeypatch.setattr(main, "repo", FailingDeleteRepository())
+    counts = asyncio.run(main.sync_account_groups("+1", _groups(-2)))
+    assert counts["failed"] == 1
+    # Kesh o'zgarmaydi - keyingi sync yana o'chirishga urinadi
+    assert main.account_groups_cache["+1"] == {-1, -2}
+
+
+def test_watched_groups_keep_admin_flags(repo):
+    asyncio.run(repo.upsert_watched_groups([{"group_id": -1, "group_name": "G-1", "is_blocked": True}]))
+    counts = asyncio.run(main.sync_watched_groups(_groups(-1, -2, DRIVERS, -2)))
+    assert counts == {"inserted": 3, "unchanged": 0, "failed": 0}
+    rows = {r["group_id"]: r["is_blocked"] for r in repo.tables["watched_groups"]}
+    # ignore_duplicates: admin bloklagan guruh bloklangan qoladi
+    assert rows == {-1: True, -2: False, DRIVERS: True}
+    assert main.chat_gate.reason(-2, True) is None
+    assert main.chat_gate.reason(DRIVERS, True) == "blocked"
+
+    counts = asyncio.run(main.sync_watched_groups(_groups(-1, -2)))
+    assert counts == {"inserted": 0, "unchanged": 2, "failed": 0}
+
+
+def test_membership_delta(repo):
+    asyncio.run(main.apply_group_delta("+1", {-1: "G-1", -2: "G-2"}, []))
+    assert _account_rows(repo) == [-2, -1]
+    assert main.account_stats["+1"]["groups_count"] == 2
+
+    # Guruh supergroup'ga ko'chdi: eski id o'chadi, yangisi qo'shiladi
+    asyncio.run(main.apply_group_delta("+1", {-3: "G-1"}, [-1]))
+    assert _account_rows(repo) == [-3, -2]
+    assert main.account_dialog_groups["+1"] == {-2: "G-2", -3: "G-1"}
+    assert main.group_list_cache.load("+1", max_age=60)[0] == {-2: "G-2", -3: "G-1"}
@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+from hit_sink import HitSink
+from repository import MemoryRepository
+
+
+class DownRepository(MemoryRepository):
+    """Baza ishlamayotgan holat."""
+
+    async def insert_keyword_hits(self, rows):
+        raise ConnectionError("db down")
+
+
+def _rows(n, start=0):
+    return [{"keyword_id": 1, "group_id": i, "phone_number": "+1"} for i in range(start, start + n)]
+
+
+def _spilled(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_flush_by_rows():
+    async def run():
+        repo = MemoryRepository()
+        sink = HitSink(repo, max_rows=10, flush_interval=60)
+        sink.start()
+        for row in _rows(25):
+            sink.add(row)
+        # flush_interval kutilmaydi: max_rows to'lishi yozuvchini uyg'otadi
+        await asyncio.sleep(0.05)
+        assert len(repo.tables.get("keyword_hits", [])) == 25
+        assert sink.pending == 0
+        await sink.close()
+        assert sink.written == 25
+
+    asyncio.run(run())
+
+
+def test_buffer_bounded():
+    sink = HitSink(MemoryRepository(), max_rows=5, max_buffer=10)
+    for row in _rows(15):
+        sink.add(row)
+    assert sink.pending == 10
+    assert sink.dropped == 5
+
+
+def test_spill_and_replay(tmp_path):
+    spill = str(tmp_path / "hits.jsonl")
+
+    async def run():
+        sink = HitSink(DownRepository(), max_rows=5, flush_interval=60, spill_path=spill, spill_after_failures=1)
+        sink.start()
+        for row in _rows(5):
+            sink.add(row)
+        await asyncio.sleep(0.05)
+        await sink.close()
+        assert sink.spilled == 5
+        assert len(_spilled(spill)) == 5
+
+        repo = MemoryRepository()
+        sink = HitSink(repo, max_rows=5, flush_interval=60, spill_path=spill)
+        sink.start()
+        for row in _rows(5, start=100):
+            sink.add(row)
+        await asyncio.sleep(0.05)
+        await sink.close()
+        assert len(repo.tables["keyword_hits"]) == 10
+        assert sink.replayed == 5
+
+    asyncio.run(run())
+
+
+def test_close_on_foreign_loop_spills(tmp_path):
+    """Task yopilgan loop'niki: close() ValueError bermasdan buferni diskka tushiradi."""
+    spill = str(tmp_path / "hits.jsonl")
+    sink = HitSink(MemoryRepository(), max_rows=100, flush_interval=60, spill_path=spill)
+
+    async def produce():
+        sink.start()
+        for row in _rows(7):
+            sink.add(row)
+
+    asyncio.run(produce())
+    asyncio.run(sink.close())
+    assert sink.pending == 0
+    assert sink.spilled == 7
+    assert [r["group_id"] for r in _spilled(spill)] == list(range(7))
+
+
+def test_close_without_spill_path_counts_dropped():
+    sink = HitSink(MemoryRepository(), max_rows=100)
+
+    async def produce():
+        sink.start()
+        sink.add(_rows(1)[0])
+
+    asyncio.run(produce())
+    asyncio.run(sink.close())
+    assert sink.dropped == 1
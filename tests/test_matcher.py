@@ -0,0 +1,59 @@
+from matcher import EMPTY_SNAPSHOT, KeywordMatcher, build_snapshot
+
+
+def test_finds_all_keywords_with_positions():
+    m = KeywordMatcher(["toshkent", "kent", "fargona"])
+    assert m.find("toshkentdan fargonaga") == [("toshkent", 0), ("kent", 4), ("fargona", 12)]
+
+
+def test_overlapping_and_suffix_keywords():
+    # "he" va "she" faqat fail havolasi orqali topiladi
+    m = KeywordMatcher(["he", "she", "his", "hers"])
+    assert m.matched_keywords("ushers") == ["she", "he", "hers"]
+
+
+def test_first_only_stops_early():
+    m = KeywordMatcher(["yuk", "pochta"])
+    assert m.find("pochta va yuk", first_only=True) == [("pochta", 0)]
+    assert m.first("pochta va yuk") == "pochta"
+    assert m.first("hech narsa") is None
+
+
+def test_duplicates_and_empty_keywords_skipped():
+    m = KeywordMatcher(["yuk", "", "yuk"])
+    assert len(m) == 1
+    assert m.matched_keywords("yuk yuk") == ["yuk"]
+
+
+def test_empty_matcher_and_text():
+    assert KeywordMatcher([]).find("har qanday matn") == []
+    assert KeywordMatcher(["a"]).find("") == []
+
+
+def test_snapshot_merges_spellings_last_id_wins():
+    snap = build_snapshot([
+        {"id": 1, "keyword": "Тошкентдан"},
+        {"id": 2, "keyword": "TOSHKENTDAN"},
+        {"id": 3, "keyword": "  "},
+        {"id": 4, "keyword": "Farg'ona"},
+    ], version=7)
+    assert snap.keywords == ("toshkentdan", "fargona")
+    assert snap.ids["toshkentdan"] == 2
+    assert snap.version == 7
+    assert snap.matcher.first("fargonaga") == "fargona"
+
+
+def test_snapshot_is_read_only():
+    snap = build_snapshot([{"id": 1, "keyword": "yuk"}], version=1)
+    try:
+        snap.ids["boshqa"] = 2
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("snapshot id map o'zgardi")
+
+
+def test_empty_snapshot_age():
+    assert EMPTY_SNAPSHOT.age() == float("inf")
+    snap = build_snapshot([], version=1)
+    assert snap.age(now=snap.loaded_at + 5) == 5
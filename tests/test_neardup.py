@@ -0,0 +1,72 @@
+from neardup import NearDupIndex, minhash, similarity
+from normalize import normalize_text
+
+ORDER = "Toshkentdan Samarqandga yuk bor 5 tonna tent kerak narxi kelishiladi tel 901234567"
+
+
+def _index(**kw):
+    kw.setdefault("window", 300)
+    return NearDupIndex(**kw)
+
+
+def test_repost_in_other_group_detected():
+    idx = _index()
+    eid, repost = idx.check(normalize_text(ORDER), sender=7, group_id=1, now=0)
+    assert eid and not repost
+    eid2, repost = idx.check(normalize_text(ORDER + " !!!"), sender=7, group_id=2, now=1)
+    assert repost and eid2 == eid
+    idx.check(normalize_text(ORDER), sender=7, group_id=3, now=2)
+    assert idx.also_posted(eid) == 2
+    assert len(idx) == 1
+
+
+def test_same_group_does_not_count_as_other_group():
+    idx = _index()
+    eid, _ = idx.check(normalize_text(ORDER), sender=7, group_id=1, now=0)
+    idx.check(normalize_text(ORDER), sender=7, group_id=1, now=1)
+    assert idx.also_posted(eid) == 0
+
+
+def test_by_sender_separates_senders():
+    idx = _index(by_sender=True)
+    assert not idx.check(normalize_text(ORDER), sender=1, group_id=1, now=0)[1]
+    assert not idx.check(normalize_text(ORDER), sender=2, group_id=2, now=1)[1]
+
+    shared = _index(by_sender=False)
+    assert not shared.check(normalize_text(ORDER), sender=1, group_id=1, now=0)[1]
+    assert shared.check(normalize_text(ORDER), sender=2, group_id=2, now=1)[1]
+
+
+def test_different_orders_are_not_merged():
+    idx = _index()
+    idx.check(normalize_text(ORDER), sender=7, group_id=1, now=0)
+    other = "Buxorodan Toshkentga odam olib ketamiz 3 joy bor Cobalt ertalab soat 6 da"
+    assert not idx.check(normalize_text(other), sender=7, group_id=2, now=1)[1]
+
+
+def test_short_text_skipped():
+    idx = _index(min_tokens=4)
+    assert idx.check("yuk bor", sender=7, group_id=1, now=0) == (0, False)
+    assert idx.check("yuk bor", sender=7, group_id=2, now=1) == (0, False)
+    assert idx.stats()["skipped_short"] == 2
+
+
+def test_window_expiry():
+    idx = _index(window=10)
+    idx.check(normalize_text(ORDER), sender=7, group_id=1, now=0)
+    assert not idx.check(normalize_text(ORDER), sender=7, group_id=2, now=11)[1]
+
+
+def test_max_entries_bounded():
+    idx = _index(max_entries=5)
+    for i in range(20):
+        idx.check(f"buyurtma raqami {i} yuk bor tonna {i * 7}", sender=1, group_id=i, now=i)
+    assert len(idx) <= 5
+
+
+def test_minhash_similarity():
+    a = minhash(normalize_text(ORDER).split(), 32)
+    b = minhash(normalize_text(ORDER + " tez").split(), 32)
+    assert len(a) == 32
+    assert similarity(a, a) == 1.0
+    assert similarity(a, b) > 0.5
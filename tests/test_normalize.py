@@ -0,0 +1,39 @@
+from normalize import TRANSLATION_TABLE, TABLE_SIZE, normalize_text
+
+
+def test_latin_and_cyrillic_spellings_match():
+    assert normalize_text("Тошкентдан  Фарғонага") == "toshkentdan fargonaga"
+    assert normalize_text("TOSHKENTDAN fargonaga") == "toshkentdan fargonaga"
+
+
+def test_apostrophe_variants_removed():
+    variants = ["Farg'ona", "Fargʻona", "Farg`ona", "Farg’ona", "Fargʼona"]
+    assert {normalize_text(v) for v in variants} == {"fargona"}
+    assert normalize_text("Ўзбекистон") == "ozbekiston"
+
+
+def test_russian_digraphs():
+    assert normalize_text("Москва Щёлково") == "moskva shyolkovo"
+    assert normalize_text("объём") == "obyom"
+
+
+def test_invisible_and_homoglyphs():
+    # zero-width va soft hyphen ichida, grekcha "ο" lotin "o" bo'ladi
+    assert normalize_text("to\u200bsh\u00adkent") == "toshkent"
+    assert normalize_text("t\u03bfshkent") == "toshkent"
+    assert normalize_text("İstanbul") == "istanbul"
+
+
+def test_whitespace_collapsed():
+    assert normalize_text("  yuk \n\t bor  ") == "yuk bor"
+    assert normalize_text("") == ""
+
+
+def test_ascii_fast_path_matches_table():
+    text = "Yuk BOR o'zim g`ozal"
+    assert normalize_text(text) == " ".join(text.translate(TRANSLATION_TABLE).split())
+
+
+def test_symbols_above_table_untouched():
+    assert TABLE_SIZE == len(TRANSLATION_TABLE)
+    assert normalize_text("🚚 Юк") == "🚚 yuk"
@@ -0,0 +1,120 @@
+import asyncio
+import threading
+
+import pytest
+
+from repository import MemoryRepository, SupabaseRepository, _keyset_filter, chunked, create_repository, db_account
+
+
+def test_chunked():
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunked([], 3)) == []
+
+
+def test_memory_crud_and_unique_keys():
+    async def run():
+        repo = MemoryRepository()
+        await repo.insert_account({"phone_number": "+1", "status": "pending"})
+        with pytest.raises(ValueError):
+            await repo.insert_account({"phone_number": "+1", "status": "pending"})
+        await repo.update_account("+1", {"status": "active"})
+        assert await repo.fetch_accounts() == [{"phone_number": "+1", "status": "active"}]
+
+        await repo.upsert_account({"phone_number": "+1", "status": "disabled"})
+        await repo.upsert_account({"phone_number": "+2", "status": "pending"})
+        rows = await repo.select("userbot_accounts", "phone_number, status")
+        assert sorted((r["phone_number"], r["status"]) for r in rows) == [("+1", "disabled"), ("+2", "pending")]
+
+        await repo.delete_account("+1")
+        assert [r["phone_number"] for r in await repo.fetch_accounts()] == ["+2"]
+        assert repo.errors == 1
+
+    asyncio.run(run())
+
+
+def test_memory_watched_groups_keep_admin_flags():
+    async def run():
+        repo = MemoryRepository({"watched_groups": [{"group_id": 1, "is_blocked": True}]})
+        await repo.upsert_watched_groups([{"group_id": 1, "is_blocked": False}, {"group_id": 2, "is_blocked": False}])
+        rows = {r["group_id"]: r["is_blocked"] for r in await repo.fetch_watched_groups()}
+        assert rows == {1: True, 2: False}
+
+    asyncio.run(run())
+
+
+def test_memory_account_groups_delete_in_chunks():
+    async def run():
+        repo = MemoryRepository()
+        await repo.upsert_account_groups([{"phone_number": "+1", "group_id": g} for g in range(10)], chunk_size=3)
+        assert await repo.delete_account_groups("+1", list(range(7)), chunk_size=2) == 7
+        assert sorted(r["group_id"] for r in await repo.fetch_account_groups()) == [7, 8, 9]
+
+    asyncio.run(run())
+
+
+def test_memory_stamps_strictly_increase():
+    repo = MemoryRepository()
+    stamps = [repo._stamp() for _ in range(1000)]
+    assert stamps == sorted(stamps) and len(set(stamps)) == len(stamps)
+
+
+def test_memory_rollups_add_up():
+    async def run():
+        repo = MemoryRepository()
+        row = {"keyword_id": 1, "group_id": 2, "phone_number": "+1", "granularity": "minute",
+               "bucket": "2030-01-01T00:00:00+00:00", "hits": 2}
+        await repo.add_hit_rollups([row])
+        await repo.add_hit_rollups([dict(row, hits=3)])
+        assert [r["hits"] for r in repo.tables["keyword_hit_rollups"]] == [5]
+
+    asyncio.run(run())
+
+
+def test_keyset_filter():
+    assert _keyset_filter(["updated_at", "id"], ["2030-01-01T00:00:00+00:00", 5]) == (
+        'updated_at.gt."2030-01-01T00:00:00+00:00",'
+        'and(updated_at.eq."2030-01-01T00:00:00+00:00",id.gt.5)'
+    )
+
+
+def test_create_repository_memory():
+    assert create_repository("memory").name == "memory"
+
+
+def test_errors_attributed_to_account():
+    async def run():
+        repo = MemoryRepository({"keywords": [{"keyword": "a"}]})
+        db_account.set("+7")
+        with pytest.raises(ValueError):
+            await repo.insert("keywords", [{"keyword": "a"}])
+        return repo
+
+    assert asyncio.run(run()).errors_by_account == {"+7": 1}
+
+
+def test_supabase_slot_held_until_thread_finishes():
+    """Timeout'dan keyin ham ishlayotgan thread semaphore slotini band qilib turadi."""
+    gate = threading.Event()
+    running = []
+
+    def blocking():
+        running.append(1)
+        gate.wait(5)
+        running.pop()
+
+    async def run():
+        repo = SupabaseRepository(client=None, max_workers=1, timeout=0.05)   # 2 ta slot
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await repo._run(blocking)
+        assert repo.timeouts == 2
+        # Ikkala slot ham osilgan thread'lar bilan band -> yangi so'rov kutadi
+        assert repo._sem.locked()
+        third = asyncio.create_task(repo._run(lambda: None))
+        await asyncio.sleep(0.1)
+        assert not third.done()
+        gate.set()
+        assert await asyncio.wait_for(third, 2) == []
+        await repo.close()
+
+    asyncio.run(run())
@@ -0,0 +1,119 @@
+import asyncio
+
+from repository import MemoryRepository
+from rollup import HitRollup, RawHitPolicy, bucket_start
+
+
+class SlowRepository(MemoryRepository):
+    """Yozish sekin: close() flush o'rtasida chaqiriladi."""
+
+    def __init__(self):
+        super().__init__()
+        self.started = asyncio.Event()
+
+    async def add_hit_rollups(self, rows):
+        self.started.set()
+        await asyncio.sleep(0.05)
+        return await super().add_hit_rollups(rows)
+
+
+class DownRepository(MemoryRepository):
+    async def add_hit_rollups(self, rows):
+        raise ConnectionError("db down")
+
+
+def _hits(repo):
+    return sum(r["hits"] for r in repo.tables.get("keyword_hit_rollups", []))
+
+
+def test_add_aggregates_by_minute_bucket():
+    rollup = HitRollup(MemoryRepository())
+    rollup.add(1, -100, "+1", 120.0)
+    rollup.add(1, -100, "+1", 179.0)
+    rollup.add(1, -100, "+1", 180.0)
+    rollup.add(None, -100, "+1", 180.0)
+    assert rollup.pending == 2
+    assert rollup.hits == 3
+    assert rollup.unattributed == 1
+    assert bucket_start(179.0) == 120
+
+
+def test_flush_adds_to_existing_bucket():
+    async def run():
+        repo = MemoryRepository()
+        rollup = HitRollup(repo)
+        rollup.add(1, -100, "+1", 120.0)
+        assert await rollup.flush() == 1
+        rollup.add(1, -100, "+1", 130.0)
+        await rollup.flush()
+        rows = repo.tables["keyword_hit_rollups"]
+        assert len(rows) == 1 and rows[0]["hits"] == 2
+
+    asyncio.run(run())
+
+
+def test_close_mid_flush_keeps_swapped_counts():
+    async def run():
+        repo = SlowRepository()
+        rollup = HitRollup(repo, flush_interval=0.01)
+        for i in range(10):
+            rollup.add(1, -100, "+1", 60.0 * i)
+        rollup.start()
+        await repo.started.wait()
+        # Flush Counter'ni almashtirib bo'lgan, yozish hali tugamagan
+        rollup.add(2, -100, "+1", 0.0)
+        await rollup.close()
+        assert _hits(repo) == 11
+        assert rollup.pending == 0
+        assert rollup._task.done() and not rollup._task.cancelled()
+
+    asyncio.run(run())
+
+
+def test_close_timeout_restores_unwritten_counts():
+    async def run():
+        repo = SlowRepository()
+        rollup = HitRollup(repo, flush_interval=0.01)
+        rollup.add(1, -100, "+1", 0.0)
+        rollup.start()
+        await repo.started.wait()
+        # Kutish tugasa task bekor qilinadi, lekin hitlar Counter'ga qaytib yoziladi
+        await rollup.close(timeout=0.001)
+        assert _hits(repo) == 1
+
+    asyncio.run(run())
+
+
+def test_failed_flush_restores_counts():
+    async def run():
+        rollup = HitRollup(DownRepository())
+        rollup.add(1, -100, "+1", 0.0)
+        rollup.add(1, -100, "+1", 0.0)
+        assert await rollup.flush() == 0
+        assert rollup.flush_errors == 1
+        assert rollup.pending == 1
+        assert rollup._counts[(1, -100, "+1", 0)] == 2
+
+    asyncio.run(run())
+
+
+def test_max_keys_drops_new_keys():
+    rollup = HitRollup(MemoryRepository(), max_keys=2)
+    for gid in range(4):
+        rollup.add(1, gid, "+1", 0.0)
+    rollup.add(1, 0, "+1", 0.0)
+    assert rollup.pending == 2
+    assert rollup.dropped == 2
+
+
+def test_raw_policy_modes():
+    assert RawHitPolicy("all").keep()
+    off = RawHitPolicy("off")
+    assert not off.keep() and off.skipped == 1
+    assert not RawHitPolicy("sample", rate=0.0).keep()
+    try:
+        RawHitPolicy("bogus")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("noto'g'ri mode qabul qilindi")
@@ -0,0 +1,143 @@
+import asyncio
+import time
+
+import pytest
+
+from scheduler import NoBotTokens, SendScheduler, TokenBucket
+
+
+def test_token_bucket_refill():
+    b = TokenBucket(rate=2.0, capacity=2)
+    now = b.updated
+    b.take(now)
+    b.take(now)
+    assert b.delay(now) == pytest.approx(0.5)
+    assert b.delay(now + 0.5) == 0.0
+    assert b.headroom(now + 10) == 2
+
+
+def test_token_bucket_pause():
+    b = TokenBucket(rate=100.0, capacity=10)
+    b.pause(5)
+    now = time.monotonic()
+    assert b.delay(now) > 4
+    assert b.headroom(now) == 0.0
+
+
+def test_acquire_spreads_across_tokens():
+    sched = SendScheduler(["1:a", "2:b"], global_rate=100, global_burst=2, chat_rate=100, chat_burst=10)
+
+    async def run():
+        return [(await sched.acquire(-100)).label for _ in range(4)]
+
+    labels = asyncio.run(run())
+    assert sorted(labels) == ["bot1", "bot1", "bot2", "bot2"]
+
+
+def test_chat_bucket_paces_one_chat_only():
+    sched = SendScheduler(["1:a"], global_rate=1000, global_burst=100, chat_rate=1000, chat_burst=1)
+
+    async def run():
+        await sched.acquire(-1)
+        tok = sched.tokens[0]
+        now = time.monotonic()
+        assert tok.delay(-1, now) > 0
+        assert tok.delay(-2, now) == 0
+        await sched.acquire(-2)
+
+    asyncio.run(run())
+
+
+def test_429_moves_traffic_to_other_token():
+    sched = SendScheduler(["1:a", "2:b"], global_rate=100, global_burst=10, chat_rate=100, chat_burst=10)
+
+    async def run():
+        sched.on_429(sched.tokens[0], -1, 30)
+        return {(await sched.acquire(-1)).label for _ in range(5)}
+
+    assert asyncio.run(run()) == {"bot2"}
+    assert sched.rate_limited == 1
+
+
+def test_permanent_disable_raises_when_no_tokens_left():
+    sched = SendScheduler(["1:a"])
+    sched.disable(sched.tokens[0], "401: Unauthorized", permanent=True)
+    with pytest.raises(NoBotTokens):
+        asyncio.run(sched.acquire(-1))
+
+
+def test_cooldown_reprobe_restores_token():
+    probed = []
+
+    async def probe(tok):
+        probed.append(tok.label)
+        return True
+
+    sched = SendScheduler(["1:a"], disable_cooldown=0.05, probe=probe)
+    sched.disable(sched.tokens[0], "403: Forbidden")
+
+    async def run():
+        return await asyncio.wait_for(sched.acquire(-1), 2)
+
+    assert asyncio.run(run()).label == "bot1"
+    assert probed == ["bot1"]
+    assert sched.tokens[0].disabled is None
+
+
+def test_failed_probe_extends_cooldown():
+    async def probe(tok):
+        return False
+
+    sched = SendScheduler(["1:a", "2:b"], disable_cooldown=0.01, probe=probe)
+    tok = sched.tokens[0]
+    sched.disable(tok, "403: Forbidden")
+
+    async def run():
+        await asyncio.sleep(0.02)
+        await sched.acquire(-1)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert tok.disabled and tok.disabled_until > time.monotonic() - 0.01
+    assert not tok.probing
+
+
+def test_slow_probe_does_not_block_healthy_token():
+    """getMe probe fon task'da: boshqa workerlar shu vaqtda yuboraveradi."""
+    release = None
+
+    async def probe(tok):
+        await release.wait()
+        return True
+
+    sched = SendScheduler(["1:a", "2:b"], global_rate=100, global_burst=10, chat_rate=100, chat_burst=10,
+                          disable_cooldown=0.0, probe=probe)
+    sched.disable(sched.tokens[0], "403: Forbidden")
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        first = await asyncio.wait_for(sched.acquire(-1), 0.5)
+        assert sched.tokens[0].probing
+        second = await asyncio.wait_for(sched.acquire(-2), 0.5)
+        release.set()
+        await asyncio.sleep(0.01)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first.label == second.label == "bot2"
+    assert sched.tokens[0].disabled is None
+
+
+def test_waiting_chat_does_not_block_other_chats():
+    sched = SendScheduler(["1:a"], global_rate=1000, global_burst=100, chat_rate=0.5, chat_burst=1)
+
+    async def run():
+        await sched.acquire(-1)
+        slow = asyncio.create_task(sched.acquire(-1))   # ~2 s kutadi
+        await asyncio.sleep(0.01)
+        await asyncio.wait_for(sched.acquire(-2), 0.2)
+        slow.cancel()
+
+    asyncio.run(run())
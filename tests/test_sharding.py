@@ -0,0 +1,110 @@
+import asyncio
+import socket
+
+from outbox import make_item
+from sharding import ShardHub, ShardLink, assign_shards
+
+
+def _item(n):
+    return make_item(cache_key=(-100, n), text="t", group_link="", message_link="", urls=[], phone="+1")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_assign_balances_new_accounts():
+    out = assign_shards([f"+{i}" for i in range(7)], 3, {})
+    loads = sorted(list(out.values()).count(s) for s in range(3))
+    assert loads == [2, 2, 3]
+
+
+def test_assign_keeps_existing_placement():
+    current = {"+1": 2, "+2": 0, "+3": 1}
+    out = assign_shards(["+1", "+2", "+3", "+4"], 3, current)
+    assert {p: out[p] for p in current} == current
+    assert out["+4"] in (0, 1, 2)
+
+
+def test_assign_moves_only_to_fix_imbalance():
+    # +1 o'chirildi: shard 0 bo'shadi, farq 2 -> bitta akkaunt ko'chadi
+    current = {"+2": 1, "+3": 1, "+4": 2}
+    out = assign_shards(["+2", "+3", "+4"], 3, current)
+    assert sorted(out.values()) == [0, 1, 2]
+    assert sum(out[p] != current[p] for p in current) == 1
+
+
+def test_assign_drops_out_of_range_and_duplicates():
+    out = assign_shards(["+1", "+1", "+2"], 2, {"+1": 5})
+    assert set(out) == {"+1", "+2"}
+    assert sorted(out.values()) == [0, 1]
+
+
+def test_link_buffers_while_disconnected_and_drops_oldest():
+    async def run():
+        dropped = []
+        link = ShardLink(0, "127.0.0.1", 1, None, lambda: [], buffer_max=2, on_drop=dropped.append)
+        for n in range(3):
+            assert await link.send_item(_item(n)) is False
+        assert link.buffered_dropped == 1
+        assert len(dropped) == 1 and '"cache_key": [-100, 0]' in dropped[0]
+        assert link.stats()["buffered"] == 2
+
+    asyncio.run(run())
+
+
+def test_hub_and_link_roundtrip():
+    async def run():
+        port = _free_port()
+        received = []
+
+        async def on_item(item):
+            received.append(item.cache_key)
+
+        hub = ShardHub(on_item)
+        await hub.start("127.0.0.1", port)
+
+        running = set()
+
+        async def on_assign(phones):
+            running.clear()
+            running.update(phones)
+
+        link = ShardLink(1, "127.0.0.1", port, on_assign, lambda: running)
+        # Ulanishdan oldingi hit buferdan yetkaziladi
+        await link.send_item(_item(1))
+        hub.assign(1, ["+1", "+2"])
+
+        stop = asyncio.Event()
+        task = asyncio.create_task(link.run(stop))
+        try:
+            for _ in range(100):
+                if hub.running.get(1) == {"+1", "+2"} and received:
+                    break
+                await asyncio.sleep(0.01)
+            assert received == [(-100, 1)]
+            assert hub.running_elsewhere(0) == {"+1", "+2"}
+            assert hub.running_elsewhere(1) == set()
+
+            assert await link.send_item(_item(2)) is True
+            for _ in range(100):
+                if len(received) == 2:
+                    break
+                await asyncio.sleep(0.01)
+            assert received[-1] == (-100, 2)
+            assert hub.stats()["items_by_shard"] == {1: 2}
+        finally:
+            stop.set()
+            task.cancel()
+            await hub.close()
+
+        # Shard uzilsa uning akkauntlari hech qayerda ishlamayapti
+        for _ in range(100):
+            if 1 not in hub.running:
+                break
+            await asyncio.sleep(0.01)
+        assert 1 not in hub.running
+
+    asyncio.run(run())
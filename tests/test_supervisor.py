@@ -0,0 +1,105 @@
+import asyncio
+
+from supervisor import AccountState, AccountSupervisor, RunResult
+
+
+def test_backoff_exponential_and_capped():
+    sup = AccountSupervisor(lambda p: None, base_delay=5, max_delay=60, jitter=0)
+    assert [sup.backoff(a) for a in range(6)] == [5, 10, 20, 40, 60, 60]
+
+
+def test_backoff_jitter_range():
+    sup = AccountSupervisor(lambda p: None, base_delay=10, jitter=0.2)
+    for _ in range(100):
+        assert 8 <= sup.backoff(0) <= 12
+
+
+def _supervisor(results, **kw):
+    calls = []
+
+    async def run(phone):
+        calls.append(phone)
+        await asyncio.sleep(0)
+        result = results.pop(0)
+        if result == "up":
+            sup.mark_started(phone)
+            return RunResult(False, "done")
+        return result
+
+    kw.setdefault("base_delay", 0)
+    kw.setdefault("jitter", 0)
+    sup = AccountSupervisor(run, **kw)
+    return sup, calls
+
+
+def test_restarts_until_fatal():
+    sup, calls = _supervisor([RunResult(True, "net"), RunResult(True, "net"), RunResult(False, "AUTH_KEY_UNREGISTERED")])
+    asyncio.run(sup.supervise("+1"))
+    st = sup.accounts["+1"]
+    assert len(calls) == 3
+    assert st.state == "fatal" and st.restarts == 2
+    assert st.last_reason == "AUTH_KEY_UNREGISTERED"
+
+
+def test_failed_connects_do_not_count_as_uptime():
+    sup, _ = _supervisor([RunResult(True, "connect failed"), RunResult(True, "connect failed")] + ["up"])
+    asyncio.run(sup.supervise("+1"))
+    st = sup.accounts["+1"]
+    assert st.starts == 1
+    assert st.first_start is not None
+
+
+def test_uptime_starts_at_mark_started():
+    st = AccountState()
+    st.connecting()
+    assert st.state == "connecting" and st.up_since is None and st.uptime() == 0.0
+    st.begin()
+    assert st.state == "running" and st.up_since is not None
+    assert st.end() >= 0.0 and st.up_since is None
+
+
+def test_floodwait_delay_respected():
+    delays = []
+
+    async def on_backoff(phone, delay):
+        delays.append(delay)
+
+    sup, _ = _supervisor([RunResult(True, "FloodWait", 0.05), RunResult(False, "stop")], on_backoff=on_backoff)
+    asyncio.run(sup.supervise("+1"))
+    assert delays == [0.05]
+
+
+def test_storm_cooldown():
+    storms = []
+
+    async def on_storm(phone, reason):
+        storms.append(reason)
+
+    results = [RunResult(True, "net")] * 3 + [RunResult(False, "stop")]
+    sup, _ = _supervisor(list(results), storm_max=3, storm_cooldown=0.01, on_storm=on_storm)
+    asyncio.run(sup.supervise("+1"))
+    assert sup.accounts["+1"].storms == 1
+    assert storms == ["net"]
+
+
+def test_should_run_stops_disabled_account():
+    wanted = {"+1": True}
+    results = [RunResult(True, "net")] * 10
+    sup, calls = _supervisor(results, should_run=lambda p: wanted[p])
+
+    async def run():
+        task = asyncio.create_task(sup.supervise("+1"))
+        while len(calls) < 2:
+            await asyncio.sleep(0)
+        wanted["+1"] = False
+        await asyncio.wait_for(task, 1)
+
+    asyncio.run(run())
+    assert sup.accounts["+1"].state == "stopped"
+    assert len(calls) <= 3
+
+
+def test_should_run_checked_before_first_attempt():
+    sup, calls = _supervisor([], should_run=lambda p: False)
+    asyncio.run(sup.supervise("+1"))
+    assert calls == []